@@ -0,0 +1,76 @@
+"""
+Cold-start cost of importing the application.
+
+Every run imports `app` in a fresh interpreter. The median wall time is
+checked against a budget, and the slowest top-level imports are listed
+from `python -X importtime` so a new eager heavy import is easy to find.
+Exits with status 1 when the median is over budget.
+
+    cd backend && python benchmarks/import_time.py [budget_ms]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+RUNS = 7
+DEFAULT_BUDGET_MS = 800
+# Must stay lazy: only loaded by the endpoints that need them
+LAZY_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'qrcode', 'PIL', 'mysql.connector')
+
+
+def import_app(*flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, '-c', 'import app'],
+        cwd=SRC_DIR, check=True, capture_output=True, text=True
+    )
+
+
+def wall_times_ms():
+    # Warm the bytecode and OS file caches first; a cold disk is not what is measured
+    import_app()
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        import_app()
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def slowest_imports(limit: int = 15):
+    """(cumulative ms, module) of the slowest imports, plus every module name seen"""
+    rows = []
+    for line in import_app('-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    modules = {name.strip() for _, name in rows}
+    # Only top-level and first-level imports, nested ones are counted in their parents
+    shallow = [row for row in rows if len(row[1]) - len(row[1].lstrip()) <= 3]
+    return sorted(shallow, reverse=True)[:limit], modules
+
+
+def main() -> None:
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+
+    top, modules = slowest_imports()
+    print(f"{'cumulative ms':>13}  module")
+    for cumulative_ms, name in top:
+        print(f"{cumulative_ms:>13.1f}  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"\nimported eagerly: {', '.join(eager)}")
+
+    times = wall_times_ms()
+    median = statistics.median(times)
+    print(f"\nimport app: median {median:.0f} ms, min {min(times):.0f} ms over {RUNS} runs (budget {budget_ms:.0f} ms)")
+    if median > budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
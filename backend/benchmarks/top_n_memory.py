@@ -0,0 +1,122 @@
+"""
+Peak memory of the all-accounts inbox merge.
+
+Accounts are fetched concurrently, as in MessageService._fetch_inbox_page:
+each account is a task that finishes after its own latency and returns its
+whole batch. Three merges are compared:
+
+- full sort: gather() every batch, concatenate and sort (the original code)
+- gather + TopN: gather() every batch, then push them into the bounded TopN
+- as_finished + TopN: push each batch as its account finishes and drop it
+  (what production does)
+
+Each configuration runs in a fresh interpreter so its peak RSS is measured
+on its own.
+
+    cd backend && python benchmarks/top_n_memory.py
+"""
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.fan_out import as_finished  # noqa: E402
+from utils.top_n import TopN  # noqa: E402
+
+PAGE_SIZE = 50
+OFFSET = 100
+CONTENT_BYTES = 8 * 1024
+CONFIGURATIONS = [(accounts, per_account) for accounts in (2, 8, 32) for per_account in (100, 400)]
+STRATEGIES = ('full_sort', 'gather_top_n', 'as_finished_top_n')
+
+
+def account_batch(account: int, per_account: int):
+    rng = random.Random(account)
+    return [
+        {
+            'id': f'{account}-{i}',
+            'timestamp': rng.randrange(1_600_000_000_000, 1_700_000_000_000),
+            'content': 'x' * CONTENT_BYTES
+        }
+        for i in range(per_account)
+    ]
+
+
+async def fetch_account(account: int, per_account: int):
+    # Accounts answer at different times; the batch exists once the response is parsed
+    await asyncio.sleep(random.Random(-account).uniform(0, 0.05))
+    return account_batch(account, per_account)
+
+
+def fetches(accounts: int, per_account: int):
+    return [fetch_account(account, per_account) for account in range(accounts)]
+
+
+async def run_full_sort(accounts: int, per_account: int):
+    all_messages = []
+    for batch in await asyncio.gather(*fetches(accounts, per_account)):
+        all_messages.extend(batch)
+    all_messages.sort(key=lambda x: x['timestamp'], reverse=True)
+    return all_messages[OFFSET:OFFSET + PAGE_SIZE]
+
+
+async def run_gather_top_n(accounts: int, per_account: int):
+    top_messages = TopN(OFFSET + PAGE_SIZE, key=lambda x: x['timestamp'])
+    for batch in await asyncio.gather(*fetches(accounts, per_account)):
+        top_messages.extend(batch)
+    return top_messages.page(OFFSET)
+
+
+async def run_as_finished_top_n(accounts: int, per_account: int):
+    top_messages = TopN(OFFSET + PAGE_SIZE, key=lambda x: x['timestamp'])
+    async for batch in as_finished(fetches(accounts, per_account)):
+        top_messages.extend(batch)
+    return top_messages.page(OFFSET)
+
+
+RUNNERS = {
+    'full_sort': run_full_sort,
+    'gather_top_n': run_gather_top_n,
+    'as_finished_top_n': run_as_finished_top_n,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def child(strategy: str, accounts: int, per_account: int) -> None:
+    baseline = peak_rss_mb()
+    page = asyncio.run(RUNNERS[strategy](accounts, per_account))
+    assert len(page) == min(PAGE_SIZE, max(accounts * per_account - OFFSET, 0))
+    print(f"{peak_rss_mb() - baseline:.1f}")
+
+
+def main() -> None:
+    print(f"{'accounts':>8} {'per acct':>8} {'messages':>8} {'full sort MB':>13} {'gather+top-n MB':>16} {'as_finished+top-n MB':>21}")
+    for accounts, per_account in CONFIGURATIONS:
+        results = []
+        for strategy in STRATEGIES:
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', strategy, str(accounts), str(per_account)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(float(output.strip()))
+        print(f"{accounts:>8} {per_account:>8} {accounts * per_account:>8} {results[0]:>13.1f} {results[1]:>16.1f} {results[2]:>21.1f}")
+
+    # Every strategy must return the same page
+    pages = [asyncio.run(RUNNERS[strategy](4, 200)) for strategy in STRATEGIES]
+    assert pages[0] == pages[1] == pages[2]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
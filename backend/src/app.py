@@ -8,6 +8,9 @@ from controllers.auth_controller import auth_bp
 from controllers.mail_account_controller import mail_account_bp
 from controllers.outlook_controller import outlook_bp
 from middlewares.auth_middleware import auth_middleware
+from middlewares.request_context_middleware import release_request_context, request_context_middleware
+from middlewares.response_cache_middleware import invalidate_after_mutation, response_cache_middleware
+from middlewares.compression_middleware import compression_middleware
 from controllers.gmail_controller import gmail_bp
 from controllers.email_controller import email_bp
 from controllers.user_controller import user_bp
@@ -16,6 +19,10 @@ from controllers.password_manager_controller import password_manager_bp
 from controllers.translation_controller import translation_bp
 from controllers.auto_response_controller import auto_response_bp
 from controllers.system_mail_controller import system_mail_bp
+from controllers.metrics_controller import metrics_bp
+from config.app_config import APP_CONFIG
+from utils.lifecycle import run_shutdown, run_startup
+from utils.codec import json_dumps
 
 # Add src directory to Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -26,7 +33,9 @@ logging.getLogger('sanic').setLevel(logging.WARNING)
 logging.getLogger('sanic_cors').setLevel(logging.ERROR)
 logging.getLogger('sanic.access').setLevel(logging.ERROR)
 
-app = Sanic("MailManagement")
+# json_dumps (orjson) is the response encoder for every blueprint: datetimes, models and
+# attachment bytes are serialized natively when the response is written
+app = Sanic("MailManagement", dumps=json_dumps)
 
 # Configure CORS with minimal logging
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173"]}}, automatic_options=True, log_level='ERROR')
@@ -43,13 +52,40 @@ app.blueprint(password_manager_bp)
 app.blueprint(translation_bp)
 app.blueprint(auto_response_bp)
 app.blueprint(system_mail_bp)
+app.blueprint(metrics_bp)
 
 # Add middleware
 app.middleware('request')(auth_middleware)
+app.middleware('request')(request_context_middleware)
+# Runs after auth so cached pages are keyed by user
+app.middleware('request')(response_cache_middleware)
+app.middleware('response')(compression_middleware)
+app.middleware('response')(invalidate_after_mutation)
+app.middleware('response')(release_request_context)
 
 @app.get("/")
 async def test(request):
     return json({"message": "Hello World"})
 
+# Every worker process opens its own DB pool and HTTP session before serving and
+# closes them after it stops; modules register their hooks via utils.lifecycle
+@app.before_server_start
+async def setup_worker(app, loop):
+    await run_startup()
+
+@app.after_server_stop
+async def teardown_worker(app, loop):
+    await run_shutdown()
+
+def run_server():
+    host, port = APP_CONFIG['SERVER_HOST'], APP_CONFIG['SERVER_PORT']
+    if APP_CONFIG['APP_ENV'] == 'production' or '--production' in sys.argv:
+        workers = APP_CONFIG['SERVER_WORKERS']
+        # fast=True starts one worker per CPU core
+        scaling = {'workers': workers} if workers > 0 else {'fast': True}
+        app.run(host=host, port=port, debug=False, auto_reload=False, access_log=False, **scaling)
+    else:
+        app.run(host=host, port=port, debug=True, access_log=False)
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True, access_log=False)
\ No newline at end of file
+    run_server()
@@ -0,0 +1,81 @@
+import os
+from config.settings import settings
+
+APP_CONFIG = {
+    'PUBLIC_URL': settings.get('BACKEND_PUBLIC_URL', 'http://localhost:8000'),  # Absolute URL the browser uses to reach the API
+    'INLINE_IMAGE_SECRET': settings.get('INLINE_IMAGE_SECRET', 'your-inline-image-secret-key'),  # Signs inline image URLs; must differ from the session token key
+    'INLINE_IMAGE_MAX_AGE': int(settings.get('INLINE_IMAGE_MAX_AGE', 31536000)),  # Browser cache lifetime in seconds
+    'ATTACHMENT_STORE_DIR': settings.get(
+        'ATTACHMENT_STORE_DIR',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'attachments')
+    ),  # Root of the content-addressed attachment blob store
+    'ATTACHMENT_STORE_MAX_BYTES': int(settings.get('ATTACHMENT_STORE_MAX_BYTES', 1024 * 1024 * 1024)),  # LRU size cap for stored blobs
+    'COMPRESSION_MIN_BYTES': int(settings.get('COMPRESSION_MIN_BYTES', 1024)),  # Smaller responses are sent uncompressed
+    'COMPRESSION_GZIP_LEVEL': int(settings.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'COMPRESSION_BROTLI_QUALITY': int(settings.get('COMPRESSION_BROTLI_QUALITY', 5)),
+    'RESPONSE_CACHE_TTL': float(settings.get('RESPONSE_CACHE_TTL', 30)),  # Seconds a listing page is served from cache
+    'RESPONSE_CACHE_SIZE': int(settings.get('RESPONSE_CACHE_SIZE', 512)),  # Cached pages across all users
+    'MESSAGE_COUNT_TTL': float(settings.get('MESSAGE_COUNT_TTL', 300)),  # Seconds a folder/mailbox message count is reused for paging
+    'INBOX_PREFETCH_TTL': float(settings.get('INBOX_PREFETCH_TTL', 60)),  # Seconds a speculatively fetched next page is kept
+    'INBOX_PREFETCH_PER_USER': int(settings.get('INBOX_PREFETCH_PER_USER', 1)),  # Prefetches in flight per user; 0 disables prefetching
+    'UPSTREAM_DEADLINE': float(settings.get('UPSTREAM_DEADLINE', 20)),  # Seconds a fan-out request may spend on provider calls; 0 disables it
+    'CIRCUIT_FAILURE_RATE': float(settings.get('CIRCUIT_FAILURE_RATE', 0.5)),  # Upstream failure rate that opens a provider/account circuit
+    'CIRCUIT_MIN_CALLS': int(settings.get('CIRCUIT_MIN_CALLS', 5)),  # Outcomes needed before the failure rate is trusted
+    'CIRCUIT_WINDOW': int(settings.get('CIRCUIT_WINDOW', 20)),  # Recent outcomes the failure rate is computed over
+    'CIRCUIT_OPEN_SECONDS': float(settings.get('CIRCUIT_OPEN_SECONDS', 30)),  # Time an open circuit rejects calls before a trial call
+    'METRICS_TOKEN': settings.get('METRICS_TOKEN'),  # Bearer token for /api/metrics; unset disables the endpoint unless METRICS_ALLOW_LOCAL is on
+    'METRICS_ALLOW_LOCAL': settings.get('METRICS_ALLOW_LOCAL', 'false').lower() == 'true',  # Serve /api/metrics without a token to direct, non-proxied local requests
+    'PROVIDER_HEDGING': settings.get('PROVIDER_HEDGING', 'false').lower() == 'true',  # Hedge slow Gmail message fetches with a duplicate request
+    'HEDGE_MIN_DELAY': float(settings.get('HEDGE_MIN_DELAY', 0.05)),  # Lower bound of the p95-based hedge delay, in seconds
+    'HEDGE_MIN_SAMPLES': int(settings.get('HEDGE_MIN_SAMPLES', 50)),  # Latencies needed per endpoint before hedging starts
+    'HEDGE_BUDGET_RATIO': float(settings.get('HEDGE_BUDGET_RATIO', 0.05)),  # Hedges allowed per primary call (5% extra traffic)
+    'HEDGE_BUDGET_BURST': float(settings.get('HEDGE_BUDGET_BURST', 10)),  # Unused hedge budget kept for bursts
+    'HEDGE_THROTTLE_SECONDS': float(settings.get('HEDGE_THROTTLE_SECONDS', 30)),  # No hedging on an endpoint this long after a 429
+    'UPSTREAM_CONCURRENCY': int(settings.get('UPSTREAM_CONCURRENCY', 64)),  # Provider requests in flight per worker, shared fairly between users
+    'FAIR_QUEUE_QUANTUM': float(settings.get('FAIR_QUEUE_QUANTUM', 1)),  # Requests each waiting user may start per round-robin turn
+    # Admission control per endpoint class: concurrent requests, queue length and requests one user may hold
+    'ADMISSION_CLASSES': {
+        'inbox': {
+            'concurrency': int(settings.get('ADMISSION_INBOX_CONCURRENCY', 32)),
+            'queue': int(settings.get('ADMISSION_INBOX_QUEUE', 64)),
+            'per_user': int(settings.get('ADMISSION_INBOX_PER_USER', 4)),
+        },
+        'sent': {
+            'concurrency': int(settings.get('ADMISSION_SENT_CONCURRENCY', 8)),
+            'queue': int(settings.get('ADMISSION_SENT_QUEUE', 16)),
+            'per_user': int(settings.get('ADMISSION_SENT_PER_USER', 2)),
+        },
+        'deleted': {
+            'concurrency': int(settings.get('ADMISSION_DELETED_CONCURRENCY', 8)),
+            'queue': int(settings.get('ADMISSION_DELETED_QUEUE', 16)),
+            'per_user': int(settings.get('ADMISSION_DELETED_PER_USER', 2)),
+        },
+        'translation': {
+            'concurrency': int(settings.get('ADMISSION_TRANSLATION_CONCURRENCY', 8)),
+            'queue': int(settings.get('ADMISSION_TRANSLATION_QUEUE', 32)),
+            'per_user': int(settings.get('ADMISSION_TRANSLATION_PER_USER', 4)),
+        },
+    },
+    'ADMISSION_QUEUE_TIMEOUT': float(settings.get('ADMISSION_QUEUE_TIMEOUT', 5)),  # Seconds a request may wait for admission before a 503
+    'APP_ENV': settings.get('APP_ENV', 'development'),  # 'production' runs multiple workers without debug
+    'SERVER_HOST': settings.get('SERVER_HOST', '0.0.0.0'),
+    'SERVER_PORT': int(settings.get('SERVER_PORT', 8000)),
+    'SERVER_WORKERS': int(settings.get('SERVER_WORKERS', 0)),  # Production worker processes; 0 = one per CPU core
+    'HTTP_CONNECTION_LIMIT': int(settings.get('HTTP_CONNECTION_LIMIT', 100)),  # Pooled provider connections per worker
+    # Cache shared by the workers: 'local' (in-process) or 'sqlite' (one file per host); production defaults to sqlite
+    'CACHE_BACKEND': settings.get('CACHE_BACKEND', 'sqlite' if settings.get('APP_ENV') == 'production' else 'local'),
+    'CACHE_SQLITE_PATH': settings.get(
+        'CACHE_SQLITE_PATH',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'shared_cache.sqlite3')
+    ),
+    'CACHE_EVENT_POLL_INTERVAL': float(settings.get('CACHE_EVENT_POLL_INTERVAL', 0.25)),  # Seconds until other workers see an invalidation
+    'ACCOUNT_CACHE_TTL': float(settings.get('ACCOUNT_CACHE_TTL', 300)),  # Seconds a worker reuses a user's mail account rows
+    # Requests under these prefixes share one DB connection for all their queries. Provider-bound
+    # endpoints are left out so they don't hold an idle connection while waiting on Gmail/Graph.
+    'DB_REQUEST_SCOPE_PREFIXES': tuple(
+        prefix.strip() for prefix in settings.get(
+            'DB_REQUEST_SCOPE_PREFIXES',
+            '/api/auth,/api/users,/api/email-groups,/api/password-manager,/api/systemmail'
+        ).split(',') if prefix.strip()
+    ),
+}
@@ -1,35 +1,405 @@
-import os
-from dotenv import load_dotenv
+from config.settings import settings
+import asyncio
+import time
 import aiomysql
 import traceback
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
 from aiomysql.cursors import DictCursor
-
-# Load environment variables
-load_dotenv()
+from utils.lifecycle import on_shutdown, on_startup
+from utils.metrics import metrics
 
 MYSQL_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', 3306)),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD'),  # Use password from .env
-    'db': os.getenv('DB_NAME', 'mail_management'),
+    'host': settings.get('DB_HOST', 'localhost'),
+    'port': int(settings.get('DB_PORT', 3306)),
+    'user': settings.get('DB_USER', 'root'),
+    'password': settings.get('DB_PASSWORD'),  # Use password from .env
+    'db': settings.get('DB_NAME', 'mail_management'),
     'charset': 'utf8mb4',
     'autocommit': True,
-    'cursorclass': DictCursor
+    'cursorclass': DictCursor,
+    'connect_timeout': float(settings.get('DB_CONNECT_TIMEOUT', 5)),  # Seconds to open one connection
+}
+
+POOL_CONFIG = {
+    'minsize': int(settings.get('DB_POOL_MIN_SIZE', 5)),  # Connections opened at startup and kept per worker
+    'maxsize': int(settings.get('DB_POOL_MAX_SIZE', 20)),  # Upper bound per worker; mind max_connections x workers
+    'pool_recycle': int(settings.get('DB_POOL_RECYCLE', 1800)),  # Seconds before a connection is replaced; keep below MySQL wait_timeout
+}
+
+# Seconds between liveness checks of idle connections; 0 disables them
+HEALTH_CHECK_INTERVAL = float(settings.get('DB_HEALTH_CHECK_INTERVAL', 30))
+
+# Read replicas as "host" or "host:port", comma separated; empty means every query goes to the primary
+REPLICA_HOSTS = [host.strip() for host in (settings.get('DB_REPLICA_HOSTS') or '').split(',') if host.strip()]
+REPLICA_CONFIG = {
+    **MYSQL_CONFIG,
+    'user': settings.get('DB_REPLICA_USER', MYSQL_CONFIG['user']),
+    'password': settings.get('DB_REPLICA_PASSWORD', MYSQL_CONFIG['password']),
 }
+REPLICA_POOL_CONFIG = {
+    **POOL_CONFIG,
+    'minsize': int(settings.get('DB_REPLICA_POOL_MIN_SIZE', POOL_CONFIG['minsize'])),
+    'maxsize': int(settings.get('DB_REPLICA_POOL_MAX_SIZE', POOL_CONFIG['maxsize'])),
+}
+# Seconds a replica that could not be reached is skipped before it is tried again
+REPLICA_RETRY_SECONDS = 30
+# Seconds a user's reads stay on the primary after they changed something, covering replica lag
+REPLICA_STICKY_SECONDS = float(settings.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+
+class _TimedAcquire:
+    """Result of InstrumentedPool.acquire(): awaitable, or an async context manager that releases on exit"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __await__(self):
+        return self._pool._timed_acquire().__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._timed_acquire()
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
+
+
+class InstrumentedPool:
+    """
+    aiomysql pool that records how long callers wait for a connection.
+    Wraps the public acquire(); `pool` is the plain aiomysql pool, used
+    directly by the liveness checks so they stay out of the metrics.
+    """
+
+    def __init__(self, pool: aiomysql.Pool, name: str = 'primary'):
+        self.pool = pool
+        self.name = name
+        self.waiting = 0
+        self.avg_wait = 0.0
+        self.healthy = True
+
+    def acquire(self) -> _TimedAcquire:
+        return _TimedAcquire(self)
+
+    async def _timed_acquire(self):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            conn = await self.pool.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.avg_wait = 0.9 * self.avg_wait + 0.1 * waited
+        metrics.inc('db_pool_acquire_wait_seconds_total', {'pool': self.name}, value=waited, help_text='Total time spent waiting for a pooled connection')
+        metrics.inc('db_pool_acquires_total', {'pool': self.name}, help_text='Connections handed out by the pool')
+        return conn
+
+    def __getattr__(self, name):
+        # release, close, wait_closed, size, freesize, minsize, maxsize
+        return getattr(self.pool, name)
+
 
 _pool = None
+_pool_lock = asyncio.Lock()
+_health_tasks = []
+# host -> pool, and host -> time it failed
+_replica_pools = {}
+_replica_failures = {}
+_replica_turn = 0
+
+async def _create_pool(name: str = 'primary', pool_config=None, connect_config=None) -> InstrumentedPool:
+    # create_pool opens the minsize connections before returning
+    pool = await aiomysql.create_pool(**(pool_config or POOL_CONFIG), **(connect_config or MYSQL_CONFIG))
+    return InstrumentedPool(pool, name=name)
 
 async def get_pool():
     global _pool
     try:
         if _pool is None:
-            print("Creating new database connection pool with config:", MYSQL_CONFIG)
-            _pool = await aiomysql.create_pool(**MYSQL_CONFIG)
-            print("Database connection pool created successfully")
+            async with _pool_lock:
+                if _pool is None:
+                    _pool = await _create_pool()
+                    print(f"Database connection pool created for {MYSQL_CONFIG['host']}:{MYSQL_CONFIG['port']}/{MYSQL_CONFIG['db']} "
+                          f"({POOL_CONFIG['minsize']}-{POOL_CONFIG['maxsize']} connections)")
         return _pool
     except Exception as e:
         print(f"Database connection error: {str(e)}")
         print("Full traceback:")
         print(traceback.format_exc())
-        raise 
\ No newline at end of file
+        raise
+
+async def _replica_pool(host: str) -> Optional[InstrumentedPool]:
+    pool = _replica_pools.get(host)
+    if pool is not None:
+        return pool
+    if time.monotonic() - _replica_failures.get(host, -REPLICA_RETRY_SECONDS) < REPLICA_RETRY_SECONDS:
+        return None
+    async with _pool_lock:
+        if host not in _replica_pools:
+            name, _, port = host.partition(':')
+            try:
+                _replica_pools[host] = await _create_pool(
+                    f'replica:{host}', REPLICA_POOL_CONFIG,
+                    {**REPLICA_CONFIG, 'host': name, 'port': int(port or REPLICA_CONFIG['port'])}
+                )
+                print(f"Database replica pool created for {host}")
+            except Exception as e:
+                _replica_failures[host] = time.monotonic()
+                print(f"Database replica {host} unavailable, reading from the primary: {str(e)}")
+                return None
+    return _replica_pools[host]
+
+async def get_read_pool():
+    """
+    Pool for read-only queries: the replicas in turn, or the primary when
+    none is configured or reachable.
+    """
+    global _replica_turn
+    for _ in range(len(REPLICA_HOSTS)):
+        _replica_turn = (_replica_turn + 1) % len(REPLICA_HOSTS)
+        pool = await _replica_pool(REPLICA_HOSTS[_replica_turn])
+        if pool is not None and pool.healthy:
+            return pool
+    return await get_pool()
+
+def _all_pools():
+    return ([_pool] if _pool is not None else []) + list(_replica_pools.values())
+
+async def check_pool_health(pool: InstrumentedPool) -> bool:
+    """
+    Ping every idle connection once and drop the dead ones, so requests do
+    not find out about a restarted server or a dropped link. Skipped while
+    requests are waiting for connections. Connections are taken from the
+    plain pool, so the checks do not count as acquires or waits.
+    """
+    healthy = True
+    for _ in range(pool.freesize):
+        if pool.waiting:
+            break
+        async with pool.pool.acquire() as conn:
+            try:
+                await conn.ping(reconnect=False)
+            except Exception as e:
+                healthy = False
+                metrics.inc('db_health_check_failures_total', {'pool': pool.name}, help_text='Pooled connections that failed a liveness ping')
+                print(f"Dropping dead database connection: {str(e)}")
+                # A closed connection is discarded on release; the pool opens a new one when needed
+                conn.close()
+    if pool.size < pool.minsize and not pool.waiting:
+        # Top the pool back up to its minimum so the next request does not pay for the connect
+        async with pool.pool.acquire():
+            pass
+    pool.healthy = healthy
+    return healthy
+
+async def _health_loop(pool: InstrumentedPool):
+    while True:
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+        try:
+            await check_pool_health(pool)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            pool.healthy = False
+            print(f"Database health check failed: {str(e)}")
+
+@on_startup
+async def init_pool():
+    """Open the worker's pools before it serves requests, verify their connections and start the liveness checks"""
+    await get_pool()
+    for host in REPLICA_HOSTS:
+        await _replica_pool(host)
+    for pool in _all_pools():
+        await check_pool_health(pool)
+        if HEALTH_CHECK_INTERVAL > 0:
+            _health_tasks.append(asyncio.ensure_future(_health_loop(pool)))
+
+@on_shutdown
+async def close_pool():
+    global _pool
+    while _health_tasks:
+        _health_tasks.pop().cancel()
+    for pool in _all_pools():
+        pool.close()
+        await pool.wait_closed()
+    _pool = None
+    _replica_pools.clear()
+
+
+class RequestConnection:
+    """
+    One pooled connection shared by the queries of a request. It is taken
+    from the pool on the first query and given back when the request ends,
+    so a handler running several queries acquires only once.
+    """
+
+    def __init__(self, get_pool_fn):
+        self.conn = None
+        self.closed = False
+        # Task currently using the connection and how deeply it is nested
+        self.owner = None
+        self.depth = 0
+        self.in_transaction = False
+        self._get_pool = get_pool_fn
+        self._pool = None
+
+    async def acquire(self):
+        if self.conn is None:
+            self._pool = await self._get_pool()
+            self.conn = await self._pool.acquire()
+        return self.conn
+
+    def release(self) -> None:
+        """End the scope; a query still running on the connection gives it back when it finishes"""
+        self.closed = True
+        if self.depth == 0:
+            self._give_back()
+
+    def _give_back(self) -> None:
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            # aiomysql closes instead of reusing a connection left inside a transaction
+            self._pool.release(conn)
+
+    def __del__(self):
+        # Safety net for requests that never reached the response middleware (client went away)
+        if self.conn is not None:
+            try:
+                self._give_back()
+            except Exception:
+                pass
+
+
+class RequestScope:
+    """
+    Database state of one request. `shared` requests run all their queries
+    on one primary and one replica connection. Once the request has used
+    the primary (`wrote`), its read-only queries go there as well, so it
+    reads its own writes.
+    """
+
+    def __init__(self, shared: bool = True, wrote: bool = False):
+        self.shared = shared
+        self.wrote = wrote
+        self.primary = RequestConnection(get_pool)
+        self.replica = RequestConnection(get_read_pool)
+
+    def release(self) -> None:
+        self.primary.release()
+        self.replica.release()
+
+
+class _TransactionConnection:
+    """Connection handed out inside transaction(); commits wait for the end of the block"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def commit(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+_request_scope: ContextVar[Optional[RequestScope]] = ContextVar('request_scope', default=None)
+
+def bind_request_scope(shared: bool = True, wrote: bool = False) -> RequestScope:
+    """Track the current request's queries; release the scope when the request ends"""
+    scope = RequestScope(shared=shared, wrote=wrote)
+    _request_scope.set(scope)
+    return scope
+
+@asynccontextmanager
+async def connection(read_only: bool = False):
+    """
+    Connection for a block of queries. `read_only` blocks go to a replica
+    until the request has used the primary; everything else counts as a
+    write. In a shared request scope the scope's connection is reused,
+    unless a concurrent task of the same request is using it; outside a
+    scope the connection comes from the pool for this block.
+    """
+    scope = _request_scope.get()
+    use_replica = read_only and (scope is None or not scope.wrote)
+    if scope is not None and not use_replica:
+        scope.wrote = True
+    shared = None
+    if scope is not None and scope.shared:
+        shared = scope.replica if use_replica else scope.primary
+
+    task = asyncio.current_task()
+    if shared is None or shared.closed or shared.owner not in (None, task):
+        pool = await (get_read_pool() if use_replica else get_pool())
+        async with pool.acquire() as conn:
+            yield conn
+        return
+
+    shared.owner = task
+    shared.depth += 1
+    try:
+        conn = await shared.acquire()
+        yield _TransactionConnection(conn) if shared.in_transaction else conn
+    finally:
+        shared.depth -= 1
+        if shared.depth == 0:
+            shared.owner = None
+            if shared.closed:
+                shared._give_back()
+
+@asynccontextmanager
+async def transaction():
+    """
+    Run the repository calls of the block in one transaction on one primary
+    connection: committed when the block ends, rolled back if it raises.
+    A nested transaction() joins the outer one.
+    """
+    outer = _request_scope.get()
+    scope, token = outer, None
+    if scope is None or not scope.shared or scope.primary.closed or scope.primary.owner not in (None, asyncio.current_task()):
+        if outer is not None:
+            outer.wrote = True
+        scope = RequestScope()
+        token = _request_scope.set(scope)
+    try:
+        if scope.primary.in_transaction:
+            yield
+            return
+        async with connection() as conn:
+            await conn.begin()
+            scope.primary.in_transaction = True
+            try:
+                yield
+            except BaseException:
+                scope.primary.in_transaction = False
+                try:
+                    await conn.rollback()
+                except Exception as e:
+                    print(f"Rollback failed: {str(e)}")
+                raise
+            scope.primary.in_transaction = False
+            await conn.commit()
+    finally:
+        if token is not None:
+            _request_scope.reset(token)
+            scope.release()
+
+
+def _pool_connections():
+    for pool in _all_pools():
+        yield {'pool': pool.name, 'state': 'in_use'}, pool.size - pool.freesize
+        yield {'pool': pool.name, 'state': 'free'}, pool.freesize
+
+
+def _per_pool(attribute):
+    return lambda: [({'pool': pool.name}, getattr(pool, attribute)) for pool in _all_pools()]
+
+
+metrics.register_gauge('db_pool_connections', _pool_connections, 'Pooled MySQL connections by pool and state')
+metrics.register_gauge('db_pool_max_connections', _per_pool('maxsize'), 'Upper bound of each MySQL pool')
+metrics.register_gauge('db_pool_waiting', _per_pool('waiting'), 'Callers waiting for a MySQL connection')
+metrics.register_gauge('db_pool_acquire_wait_seconds', _per_pool('avg_wait'), 'Recent average wait for a MySQL connection')
+metrics.register_gauge('db_pool_healthy', lambda: [({'pool': pool.name}, int(pool.healthy)) for pool in _all_pools()], 'Whether the last liveness check found every idle connection alive')
@@ -1,11 +1,7 @@
-import os
-from dotenv import load_dotenv
+from config.settings import settings
 
-# Load environment variables
-load_dotenv()
-
-GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
-GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
+GOOGLE_CLIENT_ID = settings.get('GOOGLE_CLIENT_ID')
+GOOGLE_CLIENT_SECRET = settings.get('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = "http://localhost:8000/api/mail-accounts/gmail/callback"
 GOOGLE_AUTH_URI = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
@@ -20,4 +16,4 @@ GOOGLE_SCOPE = [
 ]
 
 # Frontend URL for redirecting after OAuth process
-FRONTEND_URL = os.getenv('FRONTEND_URL', "http://localhost:5173") 
\ No newline at end of file
+FRONTEND_URL = settings.get('FRONTEND_URL', "http://localhost:5173") 
\ No newline at end of file
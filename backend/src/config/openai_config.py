@@ -1,11 +1,7 @@
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from config.settings import settings
 
 OPENAI_CONFIG = {
-    'API_KEY': os.getenv('OPENAI_API_KEY'),  # API key from environment variable
+    'API_KEY': settings.get('OPENAI_API_KEY'),  # API key from environment variable
     'MODEL': 'gpt-3.5-turbo',  # Default model
     'MAX_TOKENS': 1000,  # Maximum response length
     'TEMPERATURE': 0.7,  # Controls randomness (0: deterministic, 1: creative)
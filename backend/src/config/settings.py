@@ -0,0 +1,29 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+class Settings:
+    """
+    Process environment with the .env file applied exactly once. Config
+    modules read their values through the shared `settings` instead of
+    calling load_dotenv() themselves.
+    """
+
+    def __init__(self):
+        self._loaded = False
+
+    def load(self) -> None:
+        if not self._loaded:
+            # Real environment variables win over .env entries
+            load_dotenv()
+            self._loaded = True
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        self.load()
+        return os.getenv(name, default)
+
+
+# Shared instance; the first read loads .env
+settings = Settings()
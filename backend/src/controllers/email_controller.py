@@ -1,11 +1,16 @@
 from sanic import Blueprint
-from sanic.response import json
+from sanic.response import json, raw
 from sanic.exceptions import SanicException
 import traceback
 import re
 import base64
+from urllib.parse import unquote
 
 from services.email_service import EmailService
+from config.app_config import APP_CONFIG
+from middlewares.admission_control import admission_controlled
+from middlewares.response_cache_middleware import skip_incomplete_page
+from utils.field_projection import FieldSelection
 
 # Define the blueprint for email related endpoints
 email_bp = Blueprint('email', url_prefix='/api/emails')
@@ -101,6 +106,7 @@ async def send_email_handler(request):
         return json({'error': 'Internal server error', 'details': str(e)}, status=500)
 
 @email_bp.get('/sent')
+@admission_controlled('sent')
 async def get_sent_emails_handler(request):
     """API Endpoint to get sent emails for the authenticated user."""
     try:
@@ -108,9 +114,13 @@ async def get_sent_emails_handler(request):
         limit = int(request.args.get('limit', '50'))
         offset = int(request.args.get('offset', '0'))
 
+        # e.g. fields=message_id,subject,sent_at skips body and attachment handling upstream
+        fields = FieldSelection.parse(request.args.get('fields'))
+
         print(f"Fetching sent emails for user {user_id} with limit={limit}, offset={offset}")
-        result = await email_service.get_sent_emails(user_id, limit, offset)
+        result = await email_service.get_sent_emails(user_id, limit, offset, fields)
 
+        skip_incomplete_page(request, result)
         return json(result)  # Return the entire result object which includes sent_emails and total_count
 
     except Exception as e:
@@ -138,6 +148,7 @@ async def delete_email_handler(request, account_id: int, message_id: str):
         return json({'error': 'Internal server error', 'details': str(e)}, status=500)
 
 @email_bp.get('/deleted')
+@admission_controlled('deleted')
 async def get_deleted_emails_handler(request):
     """API Endpoint to get deleted emails for the authenticated user."""
     try:
@@ -145,9 +156,13 @@ async def get_deleted_emails_handler(request):
         limit = int(request.args.get('limit', '50'))
         offset = int(request.args.get('offset', '0'))
 
+        # e.g. fields=message_id,subject,sent_at skips body and attachment handling upstream
+        fields = FieldSelection.parse(request.args.get('fields'))
+
         print(f"Fetching deleted emails for user {user_id} with limit={limit}, offset={offset}")
-        result = await email_service.get_deleted_emails(user_id, limit, offset)
+        result = await email_service.get_deleted_emails(user_id, limit, offset, fields)
 
+        skip_incomplete_page(request, result)
         return json(result)  # Return the entire result object which includes deleted_emails and total_count
 
     except Exception as e:
@@ -191,4 +206,31 @@ async def permanent_delete_email_handler(request, account_id: int, message_id: s
     except Exception as e:
         print(f"Error permanently deleting email: {str(e)}")
         print(traceback.format_exc())
-        return json({'error': 'Internal server error', 'details': str(e)}, status=500) 
\ No newline at end of file
+        return json({'error': 'Internal server error', 'details': str(e)}, status=500) 
+
+@email_bp.get('/inline/<account_id:int>/<message_id>/<content_id>')
+async def inline_image_handler(request, account_id: int, message_id: str, content_id: str):
+    """API Endpoint to serve an inline (cid:) image of a message."""
+    try:
+        user_id = request.ctx.user_id
+
+        # Signed image URLs are scoped to a single account
+        token_account_id = getattr(request.ctx, 'inline_account_id', None)
+        if token_account_id is not None and token_account_id != account_id:
+            return json({'error': 'Invalid token'}, status=401)
+
+        image = await email_service.get_inline_image(user_id, account_id, unquote(message_id), unquote(content_id))
+        if not image:
+            return json({'error': 'Image not found'}, status=404)
+
+        data, mime_type = image
+        return raw(
+            data,
+            content_type=mime_type,
+            headers={'Cache-Control': f"private, max-age={APP_CONFIG['INLINE_IMAGE_MAX_AGE']}, immutable"}
+        )
+
+    except Exception as e:
+        print(f"Error serving inline image: {str(e)}")
+        print(traceback.format_exc())
+        return json({'error': 'Internal server error', 'details': str(e)}, status=500)
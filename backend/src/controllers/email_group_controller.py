@@ -18,8 +18,8 @@ async def create_group(request) -> HTTPResponse:
             'group_id': group.group_id,
             'user_id': group.user_id,
             'group_name': group.group_name,
-            'created_at': group.created_at.isoformat() if group.created_at else None,
-            'updated_at': group.updated_at.isoformat() if group.updated_at else None,
+            'created_at': group.created_at,
+            'updated_at': group.updated_at,
             'members': []
         })
     except Exception as e:
@@ -43,7 +43,7 @@ async def add_member(request, group_id: int) -> HTTPResponse:
             'member_id': member.member_id,
             'group_id': member.group_id,
             'email': member.email,
-            'created_at': member.created_at.isoformat() if member.created_at else None
+            'created_at': member.created_at
         })
     except Exception as e:
         return json({'error': str(e)}, status=500)
@@ -59,13 +59,13 @@ async def get_user_groups(request) -> HTTPResponse:
                 'group_id': group.group_id,
                 'user_id': group.user_id,
                 'group_name': group.group_name,
-                'created_at': group.created_at.isoformat() if group.created_at else None,
-                'updated_at': group.updated_at.isoformat() if group.updated_at else None,
+                'created_at': group.created_at,
+                'updated_at': group.updated_at,
                 'members': [{
                     'member_id': member.member_id,
                     'group_id': member.group_id,
                     'email': member.email,
-                    'created_at': member.created_at.isoformat() if member.created_at else None
+                    'created_at': member.created_at
                 } for member in group.members] if group.members else []
             } for group in groups]
         })
@@ -84,13 +84,13 @@ async def get_group(request, group_id: int) -> HTTPResponse:
             'group_id': group.group_id,
             'user_id': group.user_id,
             'group_name': group.group_name,
-            'created_at': group.created_at.isoformat() if group.created_at else None,
-            'updated_at': group.updated_at.isoformat() if group.updated_at else None,
+            'created_at': group.created_at,
+            'updated_at': group.updated_at,
             'members': [{
                 'member_id': member.member_id,
                 'group_id': member.group_id,
                 'email': member.email,
-                'created_at': member.created_at.isoformat() if member.created_at else None
+                'created_at': member.created_at
             } for member in group.members] if group.members else []
         })
     except Exception as e:
@@ -7,9 +7,14 @@ import traceback
 from config.oauth_config import FRONTEND_URL
 import os
 import jwt
-from datetime import datetime
 from urllib.parse import quote
 from models.mail_account import MailAccount
+from config.app_config import APP_CONFIG
+from middlewares.admission_control import admission_controlled
+from middlewares.response_cache_middleware import skip_incomplete_page
+from utils.codec import ndjson_line
+from utils.deadline import Deadline
+from utils.field_projection import FieldSelection
 
 mail_account_bp = Blueprint('mail_account', url_prefix='/api/mail-accounts')
 
@@ -22,11 +27,6 @@ message_service = MessageService(
     authentication_service=authentication_service
 )
 
-def serialize_datetime(obj):
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    return str(obj)
-
 def serialize_account(account):
     # No need for specialized serialization function anymore, just use to_dict
     # Keeping interface compatibility for now
@@ -35,10 +35,11 @@ def serialize_account(account):
             'account_id': account['account_id'],
             'email': account['email'],
             'account_type': account['account_type'],
-            'created_at': serialize_datetime(account['created_at']),
-            'token_expiry': serialize_datetime(account['token_expiry']) if account.get('token_expiry') else None,
+            # Datetimes are written as ISO 8601 by the response encoder
+            'created_at': account['created_at'],
+            'token_expiry': account.get('token_expiry'),
             'unread_count': account.get('unread_count', 0),
-            'last_checked': serialize_datetime(account['last_checked']) if account.get('last_checked') else None
+            'last_checked': account.get('last_checked')
         }
     elif isinstance(account, MailAccount):
         return account.to_dict()
@@ -141,12 +142,15 @@ async def get_user_accounts(request):
         return json({'error': 'Internal server error', 'details': str(e)}, status=500)
 
 @mail_account_bp.get('/inbox')
+@admission_controlled('inbox')
 async def get_inbox(request):
     try:
         user_id = request.ctx.user_id
         account_id = request.args.get('account_id')
         page_token = request.args.get('pageToken')
         page_size = int(request.args.get('pageSize', '50'))
+        # e.g. fields=id,subject,sender,date,read skips body decoding and attachments upstream
+        fields = FieldSelection.parse(request.args.get('fields'))
         
         print(f"Inbox request - user_id: {user_id}, account_id: {account_id}, page_token: {page_token}, page_size: {page_size}")
         
@@ -154,7 +158,10 @@ async def get_inbox(request):
             user_id=user_id,
             account_id=account_id,
             page_token=page_token,
-            page_size=page_size
+            page_size=page_size,
+            fields=fields,
+            # Upstream work stops here; slow accounts come back as partial/timed out
+            deadline=Deadline(APP_CONFIG['UPSTREAM_DEADLINE'])
         )
         
         print(f"Inbox response - messages count: {len(result.get('messages', []))}, total: {result.get('totalCount', 0)}, current_page: {result.get('currentPage', 1)}, next_token: {result.get('nextPageToken')}")
@@ -162,9 +169,45 @@ async def get_inbox(request):
         # Eğer tüm hesaplar seçiliyse ek bilgi ver
         if not account_id:
             print(f"All accounts mode - Calculated total pages: {(result.get('totalCount', 0) + page_size - 1) // page_size}")
-        
+
+        skip_incomplete_page(request, result)
         return json(result)
     except Exception as e:
         print(f"Error fetching inbox: {str(e)}")
         print(traceback.format_exc())
-        return json({'error': 'Internal server error', 'details': str(e)}, status=500) 
\ No newline at end of file
+        return json({'error': 'Internal server error', 'details': str(e)}, status=500)
+
+@mail_account_bp.get('/inbox/stream')
+@admission_controlled('inbox')
+async def stream_inbox(request):
+    """
+    Streaming variant of /inbox: newline-delimited JSON events, one
+    'messages' event per account as it finishes and a final 'done' event
+    with the merged order and pagination
+    """
+    try:
+        user_id = request.ctx.user_id
+        account_id = request.args.get('account_id')
+        page_token = request.args.get('pageToken')
+        page_size = int(request.args.get('pageSize', '50'))
+        fields = FieldSelection.parse(request.args.get('fields'))
+    except Exception as e:
+        return json({'error': 'Invalid request', 'details': str(e)}, status=400)
+
+    response = await request.respond(content_type='application/x-ndjson')
+    try:
+        async for event in message_service.stream_inbox_messages(
+            user_id=user_id,
+            account_id=account_id,
+            page_token=page_token,
+            page_size=page_size,
+            fields=fields,
+            deadline=Deadline(APP_CONFIG['UPSTREAM_DEADLINE'])
+        ):
+            await response.send(ndjson_line(event))
+    except Exception as e:
+        # Headers are already sent; report the failure in-band
+        print(f"Error streaming inbox: {str(e)}")
+        print(traceback.format_exc())
+        await response.send(ndjson_line({'type': 'error', 'error': 'Internal server error', 'details': str(e)}))
+    await response.eof()
@@ -0,0 +1,37 @@
+import hmac
+
+from sanic import Blueprint
+from sanic.response import json, text
+
+from config.app_config import APP_CONFIG
+from utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', url_prefix='/api/metrics')
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+# Set by a reverse proxy; behind one every request arrives from a local address
+FORWARDING_HEADERS = ('Forwarded', 'X-Forwarded-For', 'X-Real-IP')
+
+
+def is_direct_local_request(request) -> bool:
+    return request.ip in LOCAL_ADDRESSES and not any(header in request.headers for header in FORWARDING_HEADERS)
+
+
+def is_metrics_request_allowed(request) -> bool:
+    """
+    Scrapers authenticate with METRICS_TOKEN. Without a token the endpoint
+    is closed, unless METRICS_ALLOW_LOCAL opts in to direct local requests.
+    """
+    token = APP_CONFIG['METRICS_TOKEN']
+    if not token:
+        return APP_CONFIG['METRICS_ALLOW_LOCAL'] and is_direct_local_request(request)
+    auth_header = request.headers.get('Authorization', '')
+    return auth_header.startswith('Bearer ') and hmac.compare_digest(auth_header[7:], token)
+
+
+@metrics_bp.get('/')
+async def get_metrics(request):
+    """Process metrics in the Prometheus text format"""
+    if not is_metrics_request_allowed(request):
+        return json({'error': 'Unauthorized'}, status=401)
+    return text(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -3,6 +3,7 @@ from sanic.response import json
 import traceback
 
 from services.translation_service import TranslationService
+from middlewares.admission_control import admission_controlled
 
 # Create blueprint for translation API
 translation_bp = Blueprint('translation', url_prefix='/api/translation')
@@ -11,6 +12,7 @@ translation_bp = Blueprint('translation', url_prefix='/api/translation')
 translation_service = TranslationService()
 
 @translation_bp.post('/translate')
+@admission_controlled('translation')
 async def translate_text_handler(request):
     """API Endpoint to translate text."""
     try:
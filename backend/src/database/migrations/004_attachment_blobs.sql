@@ -0,0 +1,17 @@
+USE mail_management;
+
+-- Attachment blob index: maps a provider attachment to the SHA-256 digest of its content
+-- stored in the on-disk blob store. attachment_key is the SHA-256 of the provider's
+-- attachment reference, since Gmail attachment ids are longer than an index allows.
+CREATE TABLE IF NOT EXISTS AttachmentBlobs (
+    account_id INT NOT NULL,
+    message_id VARCHAR(255) NOT NULL,
+    attachment_key CHAR(64) NOT NULL,
+    digest CHAR(64) NOT NULL,
+    size BIGINT NOT NULL,
+    mime_type VARCHAR(255),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (account_id, message_id, attachment_key),
+    INDEX idx_attachment_blobs_digest (digest),
+    FOREIGN KEY (account_id) REFERENCES MailAccounts(account_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,170 @@
+import asyncio
+import math
+import time
+from collections import deque
+from functools import wraps
+from typing import Deque, Dict, Optional
+
+from sanic.response import json
+
+from config.app_config import APP_CONFIG
+from utils.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a bounded FIFO queue for one class of expensive
+    endpoints. Requests beyond `concurrency` wait in a queue of at most
+    `queue_depth`. If the queue is full, or a request waits longer than
+    `queue_timeout`, it is refused with 503. A single user holding or
+    waiting for `per_user` requests of the class is refused with 429. Retry-After is
+    estimated from recent request durations and the current queue.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int, per_user: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.queue_depth = max(queue_depth, 0)
+        self.per_user = max(per_user, 1)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._per_user: Dict[int, int] = {}
+        self._avg_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead to drain through the available slots
+        estimate = self._avg_seconds * (self.queued + 1) / self.concurrency
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def _reject(self, status: int, reason: str) -> AdmissionRejected:
+        metrics.inc('admission_rejections_total', {'class': self.name, 'reason': reason}, help_text='Requests refused by admission control')
+        return AdmissionRejected(status, reason, self.retry_after())
+
+    async def acquire(self, user_id: Optional[int]) -> None:
+        if user_id is not None:
+            if self._per_user.get(user_id, 0) >= self.per_user:
+                raise self._reject(429, 'per_user')
+            # Counted before queueing, so one user cannot fill the queue while the class is saturated
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+        if self.in_flight >= self.concurrency or self._waiters:
+            if len(self._waiters) >= self.queue_depth:
+                self._forget_user(user_id)
+                raise self._reject(503, 'queue_full')
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                # The slot is handed over by release(), so in_flight already counts us
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                self._forget_user(user_id)
+                raise self._reject(503, 'queue_timeout')
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                self._forget_user(user_id)
+                raise
+        else:
+            self.in_flight += 1
+
+    def _forget_user(self, user_id: Optional[int]) -> None:
+        if user_id is None:
+            return
+        remaining = self._per_user.get(user_id, 1) - 1
+        if remaining:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Granted at the last moment; pass the slot on
+            self._release_slot()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def release(self, user_id: Optional[int], seconds: float) -> None:
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+        self._forget_user(user_id)
+        self._release_slot()
+
+
+def _build_limiters() -> Dict[str, AdmissionLimiter]:
+    return {
+        name: AdmissionLimiter(
+            name,
+            concurrency=limits['concurrency'],
+            queue_depth=limits['queue'],
+            per_user=limits['per_user'],
+            queue_timeout=APP_CONFIG['ADMISSION_QUEUE_TIMEOUT']
+        )
+        for name, limits in APP_CONFIG['ADMISSION_CLASSES'].items()
+    }
+
+
+admission_limiters = _build_limiters()
+
+metrics.register_gauge(
+    'admission_in_flight',
+    lambda: [({'class': name}, limiter.in_flight) for name, limiter in admission_limiters.items()],
+    'Admitted requests running per endpoint class'
+)
+metrics.register_gauge(
+    'admission_queue_depth',
+    lambda: [({'class': name}, limiter.queued) for name, limiter in admission_limiters.items()],
+    'Requests waiting for admission per endpoint class'
+)
+
+
+def admission_controlled(endpoint_class: str):
+    """
+    Run the handler only after its endpoint class admits the request.
+    Saturation is answered with 429/503 and Retry-After instead of piling up.
+    Cached responses are returned by middleware before this runs, so they
+    never take a slot.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            limiter = admission_limiters[endpoint_class]
+            user_id = getattr(request.ctx, 'user_id', None)
+            try:
+                await limiter.acquire(user_id)
+            except AdmissionRejected as rejected:
+                return json(
+                    {'error': 'Too many requests' if rejected.status == 429 else 'Service busy', 'reason': rejected.reason},
+                    status=rejected.status,
+                    headers={'Retry-After': str(rejected.retry_after)}
+                )
+            started = time.monotonic()
+            try:
+                return await handler(request, *args, **kwargs)
+            finally:
+                limiter.release(user_id, time.monotonic() - started)
+        return wrapper
+    return decorator
@@ -1,6 +1,7 @@
 from sanic.response import json
 import jwt
 from functools import wraps
+from services.inline_image_service import INLINE_IMAGE_ROUTE, INLINE_TOKEN_SCOPE, InlineImageService
 
 PUBLIC_PATHS = [
     '/api/auth/login',
@@ -19,6 +20,10 @@ async def auth_middleware(request):
     if request.path.startswith('/api/mail-accounts/outlook/callback'):
         return None
         
+    # Metrics are scraped with their own token (see metrics_controller)
+    if request.path.rstrip('/') == '/api/metrics':
+        return None
+
     # Skip authentication for verify-reset-token with any token 
     if request.path.startswith('/api/auth/verify-reset-token/'):
         return None
@@ -35,6 +40,15 @@ async def auth_middleware(request):
                     pass
         return
 
+    # Inline images are loaded by <img> tags, which cannot send headers; they carry a signed token
+    if request.path.startswith(INLINE_IMAGE_ROUTE + '/') and request.args.get('token'):
+        payload = InlineImageService.verify_access_token(request.args.get('token'))
+        if not payload:
+            return json({'error': 'Invalid token'}, status=401)
+        request.ctx.user_id = payload['user_id']
+        request.ctx.inline_account_id = payload['account_id']
+        return None
+
     # Get token from header
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
@@ -44,6 +58,9 @@ async def auth_middleware(request):
     try:
         # Verify token
         decoded = jwt.decode(token, 'your-secret-key', algorithms=['HS256'])
+        # Scoped tokens (inline image URLs) are only valid on their own route
+        if decoded.get('scope') == INLINE_TOKEN_SCOPE:
+            return json({'error': 'Invalid token'}, status=401)
         request.ctx.user_id = decoded['user_id']
         return None
     except jwt.InvalidTokenError:
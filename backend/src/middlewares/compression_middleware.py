@@ -0,0 +1,52 @@
+import asyncio
+
+from config.app_config import APP_CONFIG
+from middlewares.response_cache_middleware import response_cache
+from utils.compression import compress, is_compressible, negotiate_encoding
+
+# Bodies above this size are compressed in a worker thread to keep the event loop free
+EXECUTOR_THRESHOLD = 256 * 1024
+
+
+async def compression_middleware(request, response):
+    """
+    Compress JSON/text responses with brotli or gzip, as negotiated through
+    Accept-Encoding. Cacheable listing pages are stored first, so the
+    compressed bytes are kept with the cache entry and reused on later hits.
+    """
+    if getattr(request.ctx, 'response_cache_hit', False):
+        return None
+
+    body = response.body
+    if not body or 'Content-Encoding' in response.headers:
+        return None
+
+    cache_key = getattr(request.ctx, 'response_cache_key', None)
+    entry = None
+    if cache_key is not None and response.status == 200:
+        entry = response_cache.store(cache_key, response)
+
+    if len(body) < APP_CONFIG['COMPRESSION_MIN_BYTES'] or not is_compressible(response.content_type):
+        return None
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return None
+
+    try:
+        if entry is not None:
+            compress_body = entry.body_for
+        else:
+            compress_body = lambda enc: compress(body, enc)
+        if len(body) > EXECUTOR_THRESHOLD:
+            compressed = await asyncio.get_running_loop().run_in_executor(None, compress_body, encoding)
+        else:
+            compressed = compress_body(encoding)
+    except Exception as e:
+        print(f"Error compressing response for {request.path}: {str(e)}")
+        return None
+
+    response.body = compressed
+    response.headers['Content-Encoding'] = encoding
+    return None
@@ -0,0 +1,42 @@
+from config.app_config import APP_CONFIG
+from config.database import REPLICA_HOSTS, REPLICA_STICKY_SECONDS, bind_request_scope
+from services.shared_cache_service import ACCOUNTS_CHANGED, USER_DATA_CHANGED, shared_cache
+from utils.lru_cache import LRUCache
+from utils.request_context import current_user_id
+
+# Users who changed data in the last REPLICA_STICKY_SECONDS, in any worker; their reads skip the replicas
+_recent_writers = LRUCache(max_entries=65536, ttl=REPLICA_STICKY_SECONDS)
+
+
+def _mark_writer(payload) -> None:
+    _recent_writers.set(payload['user_id'], True)
+
+
+if REPLICA_HOSTS:
+    shared_cache.subscribe(USER_DATA_CHANGED, _mark_writer)
+    # Account rows (tokens) must not be re-read from a lagging replica either
+    shared_cache.subscribe(ACCOUNTS_CHANGED, _mark_writer)
+
+
+async def request_context_middleware(request):
+    """
+    Expose the authenticated user to code below the controllers and track
+    the request's database use: database-bound endpoints share one
+    connection between their queries, and reads follow the request's (and
+    the user's recent) writes to the primary. Must run after auth_middleware.
+    """
+    user_id = getattr(request.ctx, 'user_id', None)
+    current_user_id.set(user_id)
+    request.ctx.db_scope = bind_request_scope(
+        shared=request.path.startswith(APP_CONFIG['DB_REQUEST_SCOPE_PREFIXES']),
+        wrote=user_id is not None and user_id in _recent_writers
+    )
+    return None
+
+
+async def release_request_context(request, response):
+    """Give the request's DB connections back to the pool"""
+    scope = getattr(request.ctx, 'db_scope', None)
+    if scope is not None:
+        scope.release()
+    return None
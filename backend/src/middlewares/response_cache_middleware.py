@@ -0,0 +1,140 @@
+from typing import Dict, Optional
+
+from sanic.response import HTTPResponse
+
+from config.app_config import APP_CONFIG
+from services.inbox_prefetch_service import inbox_prefetch_service
+from services.shared_cache_service import USER_DATA_CHANGED, shared_cache
+from utils.compression import compress, negotiate_encoding
+from utils.listing_page import is_complete_page
+from utils.lru_cache import LRUCache
+
+# GET listings served from the short-lived page cache
+CACHEABLE_PATHS = frozenset({
+    '/api/mail-accounts/inbox',
+    '/api/emails/sent',
+    '/api/emails/deleted',
+})
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+class CachedResponse:
+    """A serialized page plus its compressed variants, built on first use"""
+
+    __slots__ = ('status', 'content_type', 'body', 'encoded')
+
+    def __init__(self, status: int, content_type: str, body: bytes):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.encoded: Dict[str, bytes] = {}
+
+    def body_for(self, encoding: Optional[str]) -> bytes:
+        if not encoding:
+            return self.body
+        encoded = self.encoded.get(encoding)
+        if encoded is None:
+            encoded = self.encoded[encoding] = compress(self.body, encoding)
+        return encoded
+
+
+class ResponseCache:
+    """
+    Per-user cache of listing responses. Entries keep the JSON bytes and
+    their compressed forms, so a hit skips the provider calls, the
+    serialization and the compression. A mutating request from a user
+    starts a new generation for that user when it arrives and again once it
+    has succeeded, which makes older pages unreachable; a listing that was
+    in flight at any point during the mutation is stored under an old
+    generation and never served. Error fallbacks and pages with missing
+    accounts are not stored at all.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self._entries = LRUCache(
+            max_entries=max_entries or APP_CONFIG['RESPONSE_CACHE_SIZE'],
+            ttl=ttl if ttl is not None else APP_CONFIG['RESPONSE_CACHE_TTL']
+        )
+        self._generations: Dict[int, int] = {}
+
+    def key_for(self, request):
+        return (request.ctx.user_id, self._generations.get(request.ctx.user_id, 0), request.path, request.query_string)
+
+    def get(self, key) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def store(self, key, response) -> CachedResponse:
+        entry = CachedResponse(response.status, response.content_type, bytes(response.body))
+        self._entries.set(key, entry)
+        return entry
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+response_cache = ResponseCache()
+
+
+def _drop_user_pages(payload) -> None:
+    response_cache.invalidate_user(payload['user_id'])
+    inbox_prefetch_service.invalidate_user(payload['user_id'])
+
+
+# Pages stay per worker (they live seconds); a mutation in any worker drops them in all
+shared_cache.subscribe(USER_DATA_CHANGED, _drop_user_pages)
+
+
+def skip_incomplete_page(request, page) -> None:
+    """Keep an error fallback or a page some accounts are missing from out of the cache"""
+    if not is_complete_page(page):
+        request.ctx.response_cache_key = None
+
+
+def build_cached_response(entry: CachedResponse, encoding: Optional[str]) -> HTTPResponse:
+    headers = {'Vary': 'Accept-Encoding', 'X-Cache': 'HIT'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return HTTPResponse(
+        body=entry.body_for(encoding),
+        status=entry.status,
+        headers=headers,
+        content_type=entry.content_type
+    )
+
+
+async def response_cache_middleware(request):
+    """Serve cached listing pages; must run after auth_middleware has set the user"""
+    user_id = getattr(request.ctx, 'user_id', None)
+    if user_id is None:
+        return None
+
+    if request.method not in SAFE_METHODS:
+        # Pages that start during the mutation are dropped again in invalidate_after_mutation
+        await shared_cache.publish(USER_DATA_CHANGED, user_id=user_id)
+        return None
+
+    if request.method != 'GET' or request.path not in CACHEABLE_PATHS:
+        return None
+
+    key = response_cache.key_for(request)
+    if 'no-cache' not in request.headers.get('Cache-Control', ''):
+        entry = response_cache.get(key)
+        if entry is not None:
+            request.ctx.response_cache_hit = True
+            return build_cached_response(entry, negotiate_encoding(request.headers.get('Accept-Encoding')))
+
+    # compression_middleware stores the response under this key
+    request.ctx.response_cache_key = key
+    return None
+
+
+async def invalidate_after_mutation(request, response):
+    """
+    Start another generation once a mutation has been applied, so a listing
+    that began after the request-time bump but read the old data before the
+    write committed is never served
+    """
+    user_id = getattr(request.ctx, 'user_id', None)
+    if user_id is not None and request.method not in SAFE_METHODS and response.status < 400:
+        await shared_cache.publish(USER_DATA_CHANGED, user_id=user_id)
+    return None
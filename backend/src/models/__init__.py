@@ -9,5 +9,6 @@ from models.email_group import EmailGroup
 from models.password_manager import PasswordEntry
 from models.base_model import BaseModel
 from models.system_mail import SystemMail
+from models.message import Message, MessageAttachment, MessageRecipient
 
-__all__ = ['User', 'MailAccount', 'Email', 'EmailGroup', 'PasswordEntry', 'BaseModel', 'SystemMail']
\ No newline at end of file
+__all__ = ['User', 'MailAccount', 'Email', 'EmailGroup', 'PasswordEntry', 'BaseModel', 'SystemMail', 'Message', 'MessageAttachment', 'MessageRecipient']
\ No newline at end of file
@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import getaddresses, parseaddr
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from utils.field_projection import ALL_FIELDS, FieldSelection
+
+BinaryData = Union[bytes, memoryview]
+
+
+@dataclass(slots=True)
+class MessageRecipient:
+    """An address from a From/To header or a Graph emailAddress object"""
+
+    address: str
+    name: str = ''
+    # Header text as the provider sent it, returned unchanged to the client
+    display: str = ''
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> 'MessageRecipient':
+        value = value or ''
+        name, address = parseaddr(value)
+        return cls(address=address or value, name=name, display=value)
+
+    @classmethod
+    def parse_list(cls, value: Optional[str]) -> List['MessageRecipient']:
+        return [cls(address=address, name=name, display=address) for name, address in getaddresses([value or '']) if address]
+
+    @classmethod
+    def split_header(cls, value: Optional[str]) -> List['MessageRecipient']:
+        """Comma separated To/Cc/Bcc header; each entry keeps its text as written"""
+        return [cls.parse(entry.strip()) for entry in (value or '').split(',') if entry.strip()]
+
+    @classmethod
+    def from_graph(cls, data: Optional[Dict[str, Any]], default: str = '') -> 'MessageRecipient':
+        email_address = (data or {}).get('emailAddress', {})
+        address = email_address.get('address') or default
+        return cls(address=address, name=email_address.get('name', ''), display=address)
+
+    @classmethod
+    def from_graph_list(cls, items: Optional[Iterable[Dict[str, Any]]]) -> List['MessageRecipient']:
+        """Graph toRecipients/ccRecipients/bccRecipients, without entries that have no address"""
+        return [recipient for recipient in (cls.from_graph(item) for item in items or ()) if recipient.address]
+
+    def __str__(self) -> str:
+        return self.display or self.address
+
+
+@dataclass(slots=True)
+class MessageAttachment:
+    """Attachment metadata plus its bytes when they were downloaded"""
+
+    filename: str
+    mime_type: str
+    id: Optional[str] = None
+    inline: bool = False
+    content_id: Optional[str] = None
+    size: Optional[int] = None
+    data: Optional[BinaryData] = None
+    # Provider download URL, listed by the sent and deleted views
+    url: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            'filename': self.filename,
+            'mimeType': self.mime_type,
+            'inline': self.inline
+        }
+        if self.id is not None:
+            result['id'] = self.id
+        if self.content_id:
+            result['contentId'] = self.content_id
+        if self.data is not None:
+            result['data'] = self.data
+        return result
+
+    def to_mailbox_dict(self) -> Dict[str, Any]:
+        """Attachment shape of the sent and deleted views"""
+        result = {
+            'id': self.id or '',
+            'name': self.filename,
+            'contentType': self.mime_type,
+            'size': self.size or 0,
+            'isInline': self.inline
+        }
+        if self.url:
+            result['url'] = self.url
+        return result
+
+
+# (response key, getter) pairs in the order the inbox API has always returned them
+_MESSAGE_FIELDS: Tuple[Tuple[str, Callable[['Message'], Any]], ...] = (
+    ('id', lambda m: m.id),
+    ('subject', lambda m: m.subject),
+    ('sender', lambda m: str(m.sender) if m.sender else ''),
+    ('preview', lambda m: m.preview),
+    ('date', lambda m: m.date),
+    ('timestamp', lambda m: m.timestamp),
+    ('content', lambda m: m.content),
+    ('hasHtml', lambda m: m.has_html),
+    ('read', lambda m: m.read),
+    ('starred', lambda m: m.starred),
+    ('recipientEmail', lambda m: str(m.recipient) if m.recipient else ''),
+    ('attachments', lambda m: [attachment.to_dict() for attachment in m.attachments]),
+)
+
+# (response key, getter, field that must be set for the key to appear) of the sent and deleted views
+_MAILBOX_FIELDS: Tuple[Tuple[str, Callable[['Message'], Any], Optional[str]], ...] = (
+    ('message_id', lambda m: m.id, None),
+    ('account_id', lambda m: m.account_id, None),
+    ('user_id', lambda m: m.user_id, None),
+    ('from', lambda m: str(m.sender) if m.sender else '', None),
+    ('to_recipients', lambda m: [str(recipient) for recipient in m.to], None),
+    ('cc_recipients', lambda m: [str(recipient) for recipient in m.cc], None),
+    ('bcc_recipients', lambda m: [str(recipient) for recipient in m.bcc], None),
+    ('subject', lambda m: m.subject, None),
+    ('body', lambda m: m.content, None),
+    ('body_type', lambda m: m.body_type, 'body_type'),
+    ('sent_at', lambda m: m.date, None),
+    ('timestamp', lambda m: m.timestamp, None),
+    ('created_date', lambda m: datetime.now(timezone.utc).isoformat(), None),
+    ('account_email', lambda m: m.account_email, 'account_email'),
+    ('has_attachments', lambda m: m.has_attachments, 'has_attachments'),
+    ('attachments', lambda m: [attachment.to_mailbox_dict() for attachment in m.attachments], 'has_attachments'),
+    ('access_token', lambda m: m.access_token, 'access_token'),
+)
+
+
+@dataclass(slots=True)
+class Message:
+    """
+    A mailbox message as it moves through parsing, merging and sorting.
+    Slotted so large multi-account listings carry no per-message __dict__;
+    to_dict() (inbox) and to_mailbox_dict() (sent, deleted) are the only
+    places the wire formats are built.
+    """
+
+    id: str
+    account_id: Optional[int] = None
+    subject: str = ''
+    sender: Optional[MessageRecipient] = None
+    recipient: Optional[MessageRecipient] = None
+    date: str = ''
+    # Epoch milliseconds, parsed once at ingest; merges and sorts compare this
+    timestamp: int = 0
+    preview: str = ''
+    content: str = ''
+    has_html: bool = True
+    read: bool = False
+    starred: bool = False
+    attachments: List[MessageAttachment] = field(default_factory=list)
+    # Sent and deleted views only; left unset on the inbox path
+    user_id: Optional[int] = None
+    to: Sequence[MessageRecipient] = ()
+    cc: Sequence[MessageRecipient] = ()
+    bcc: Sequence[MessageRecipient] = ()
+    body_type: Optional[str] = None
+    account_email: Optional[str] = None
+    has_attachments: Optional[bool] = None
+    # The deleted view hands the client the token it downloads attachments with
+    access_token: Optional[str] = None
+
+    def to_dict(self, fields: Optional[FieldSelection] = None) -> Dict[str, Any]:
+        """Serialize to the inbox response shape, building only the selected fields"""
+        fields = fields or ALL_FIELDS
+        return {key: getter(self) for key, getter in _MESSAGE_FIELDS if fields.wants(key)}
+
+    def to_mailbox_dict(self, fields: Optional[FieldSelection] = None) -> Dict[str, Any]:
+        """
+        Serialize to the sent/deleted view shape, building only the selected
+        fields. Keys a provider path never filled in are left out, as they
+        always have been.
+        """
+        fields = fields or ALL_FIELDS
+        return {
+            key: getter(self)
+            for key, getter, required in _MAILBOX_FIELDS
+            if fields.wants(key) and (required is None or getattr(self, required) is not None)
+        }
@@ -0,0 +1,46 @@
+from config.database import connection
+from typing import Optional, Dict, Any
+
+class AttachmentBlobRepository:
+    @staticmethod
+    async def get_blob(account_id: int, message_id: str, attachment_key: str) -> Optional[Dict[str, Any]]:
+        """Ekin blob store'daki özetini (digest) döndürür"""
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT digest, size, mime_type
+                    FROM AttachmentBlobs
+                    WHERE account_id = %s AND message_id = %s AND attachment_key = %s
+                    """,
+                    (account_id, message_id, attachment_key)
+                )
+                return await cur.fetchone()
+
+    @staticmethod
+    async def save_blob(account_id: int, message_id: str, attachment_key: str, digest: str, size: int, mime_type: Optional[str] = None) -> bool:
+        """Ek ile blob özeti arasındaki eşlemeyi kaydeder"""
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO AttachmentBlobs (account_id, message_id, attachment_key, digest, size, mime_type)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE digest = VALUES(digest), size = VALUES(size), mime_type = VALUES(mime_type)
+                    """,
+                    (account_id, message_id, attachment_key, digest, size, mime_type)
+                )
+                await conn.commit()
+                return cur.rowcount > 0
+
+    @staticmethod
+    async def delete_by_digest(digest: str) -> int:
+        """Diskten silinen bir blob'a ait tüm eşlemeleri kaldırır"""
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "DELETE FROM AttachmentBlobs WHERE digest = %s",
+                    (digest,)
+                )
+                await conn.commit()
+                return cur.rowcount
@@ -1,4 +1,4 @@
-from config.database import get_pool
+from config.database import connection
 
 class BaseRepository:
     """
@@ -9,26 +9,23 @@ class BaseRepository:
     def __init__(self):
         pass
         
-    async def fetch_one(self, query, params=None):
-        """Tek bir sonuç döndüren sorgular için"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+    async def fetch_one(self, query, params=None, read_only=False):
+        """Tek bir sonuç döndüren sorgular için; read_only=True ise replika üzerinden okunabilir"""
+        async with connection(read_only=read_only) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(query, params or ())
                 return await cur.fetchone()
                 
-    async def fetch_all(self, query, params=None):
-        """Çoklu sonuç döndüren sorgular için"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+    async def fetch_all(self, query, params=None, read_only=False):
+        """Çoklu sonuç döndüren sorgular için; read_only=True ise replika üzerinden okunabilir"""
+        async with connection(read_only=read_only) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(query, params or ())
                 return await cur.fetchall()
                 
     async def execute(self, query, params=None):
         """INSERT, UPDATE, DELETE sorguları için"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(query, params or ())
                 await conn.commit()
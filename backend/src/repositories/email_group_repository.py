@@ -1,12 +1,11 @@
-from config.database import get_pool
+from config.database import connection
 from models.email_group import EmailGroup, EmailGroupMember
 from typing import List, Optional
 
 class EmailGroupRepository:
     @staticmethod
     async def create_group(user_id: int, group_name: str) -> EmailGroup:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -31,8 +30,7 @@ class EmailGroupRepository:
 
     @staticmethod
     async def add_member(group_id: int, email: str) -> EmailGroupMember:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -57,8 +55,7 @@ class EmailGroupRepository:
 
     @staticmethod
     async def get_user_groups(user_id: int) -> List[EmailGroup]:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(read_only=True) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -92,8 +89,7 @@ class EmailGroupRepository:
 
     @staticmethod
     async def get_group(group_id: int) -> Optional[EmailGroup]:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(read_only=True) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -125,8 +121,7 @@ class EmailGroupRepository:
 
     @staticmethod
     async def delete_group(group_id: int) -> bool:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     "DELETE FROM EmailGroups WHERE group_id = %s",
@@ -137,8 +132,7 @@ class EmailGroupRepository:
 
     @staticmethod
     async def delete_member(member_id: int) -> bool:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     "DELETE FROM EmailGroupMembers WHERE member_id = %s",
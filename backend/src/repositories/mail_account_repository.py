@@ -1,13 +1,30 @@
-from config.database import get_pool
+import copy
+from config.app_config import APP_CONFIG
+from config.database import connection
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, List
 from models.mail_account import MailAccount
+from services.shared_cache_service import ACCOUNTS_CHANGED, invalidate_accounts, shared_cache
+from utils.lru_cache import LRUCache
+
+# Account rows carry OAuth tokens, so they are cached per worker only; the
+# shared tier just carries ACCOUNTS_CHANGED to evict them in every worker
+_account_cache = LRUCache(max_entries=4096, ttl=APP_CONFIG['ACCOUNT_CACHE_TTL'])
+
+
+def _drop_accounts(payload) -> None:
+    _account_cache.delete(('user', payload['user_id']))
+    for account_id in payload.get('account_ids', ()):
+        _account_cache.delete(('id', account_id))
+
+
+shared_cache.subscribe(ACCOUNTS_CHANGED, _drop_accounts)
+
 
 class MailAccountRepository:
     @staticmethod
     async def check_account_exists(user_id: int, email: str) -> bool:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -23,8 +40,7 @@ class MailAccountRepository:
     @staticmethod
     async def delete_account(user_id: int, account_id: int) -> bool:
         """Kullanıcının mail hesabını siler"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -34,13 +50,14 @@ class MailAccountRepository:
                     (user_id, account_id)
                 )
                 await conn.commit()
-                return cur.rowcount > 0
+                deleted = cur.rowcount > 0
+        await invalidate_accounts(user_id, account_id)
+        return deleted
 
     @staticmethod
     async def update_account_tokens(account_id: int, access_token: str, token_expiry: datetime) -> bool:
         """Mail hesabının token bilgilerini günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -51,12 +68,17 @@ class MailAccountRepository:
                     (access_token, token_expiry, account_id)
                 )
                 await conn.commit()
-                return cur.rowcount > 0
+                updated = cur.rowcount > 0
+                await cur.execute("SELECT user_id FROM MailAccounts WHERE account_id = %s", (account_id,))
+                owner = await cur.fetchone()
+        # Other workers must not keep using the cached, replaced token
+        if owner:
+            await invalidate_accounts(owner['user_id'], account_id)
+        return updated
 
     @staticmethod
     async def create_mail_account(account: MailAccount) -> MailAccount:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 # Önce hesabın var olup olmadığını kontrol et
                 exists = await MailAccountRepository.check_account_exists(
@@ -83,12 +105,21 @@ class MailAccountRepository:
                 )
                 await conn.commit()
                 account.account_id = cur.lastrowid
-                return account
+        await invalidate_accounts(account.user_id)
+        return account
 
     @staticmethod
     async def get_user_accounts(user_id: int) -> List[MailAccount]:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        accounts = _account_cache.get(('user', user_id))
+        if accounts is None:
+            accounts = await MailAccountRepository._fetch_user_accounts(user_id)
+            _account_cache.set(('user', user_id), accounts)
+        # Callers update tokens on the accounts they get; the cached ones stay as read
+        return [copy.copy(account) for account in accounts]
+
+    @staticmethod
+    async def _fetch_user_accounts(user_id: int) -> List[MailAccount]:
+        async with connection(read_only=True) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -120,9 +151,18 @@ class MailAccountRepository:
     @staticmethod
     async def get_account_by_id(account_id: int) -> Optional[MailAccount]:
         """Get a specific mail account by its ID."""
+        account = _account_cache.get(('id', account_id))
+        if account is None:
+            account = await MailAccountRepository._fetch_account_by_id(account_id)
+            if account is None:
+                return None
+            _account_cache.set(('id', account_id), account)
+        return copy.copy(account)
+
+    @staticmethod
+    async def _fetch_account_by_id(account_id: int) -> Optional[MailAccount]:
         try:
-            pool = await get_pool()
-            async with pool.acquire() as conn:
+            async with connection(read_only=True) as conn:
                 async with conn.cursor() as cur:
                     query = """
                         SELECT account_id, user_id, email, account_type, created_at,
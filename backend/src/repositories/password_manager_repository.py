@@ -1,11 +1,10 @@
 from models.password_manager import PasswordEntry
-from config.database import get_pool
+from config.database import connection
 
 class PasswordManagerRepository:
     @staticmethod
     async def create_entry(entry: PasswordEntry) -> PasswordEntry:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 # Insert the entry
                 await cur.execute(
@@ -35,8 +34,7 @@ class PasswordManagerRepository:
 
     @staticmethod
     async def get_entries_by_user_id(user_id: int) -> list[PasswordEntry]:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection(read_only=True) as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -53,8 +51,7 @@ class PasswordManagerRepository:
 
     @staticmethod
     async def delete_entry(entry_id: int, user_id: int) -> bool:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
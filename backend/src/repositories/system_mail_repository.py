@@ -1,6 +1,5 @@
 from typing import Optional, List
 from models.system_mail import SystemMail
-import mysql.connector
 from repositories.base_repository import BaseRepository
 
 class SystemMailRepository(BaseRepository):
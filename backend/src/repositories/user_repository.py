@@ -1,12 +1,11 @@
 from models.user import User
-from config.database import get_pool
+from config.database import connection
 from datetime import datetime
 
 class UserRepository:
     @staticmethod
     async def get_by_email(email: str) -> User:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -21,8 +20,7 @@ class UserRepository:
 
     @staticmethod
     async def get_by_email_or_username(identifier: str) -> User:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -38,8 +36,7 @@ class UserRepository:
 
     @staticmethod
     async def create_user(user: User) -> User:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 # otp_secret ve otp_enabled alanlarının boş olmamasını sağla
                 otp_secret = user.otp_secret or ""
@@ -58,8 +55,7 @@ class UserRepository:
 
     @staticmethod
     async def get_by_username(username: str) -> User:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -75,8 +71,7 @@ class UserRepository:
     @staticmethod
     async def get_by_id(user_id: int) -> User:
         """ID'ye göre kullanıcı bilgilerini getirir"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -93,8 +88,7 @@ class UserRepository:
     @staticmethod
     async def update_password(user_id: int, new_password_hash: str) -> None:
         """Kullanıcının şifresini günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -111,8 +105,7 @@ class UserRepository:
     @staticmethod
     async def update_profile(user_id: int, name: str = None, email: str = None) -> None:
         """Kullanıcı profil bilgilerini günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 update_fields = []
                 params = []
@@ -141,8 +134,7 @@ class UserRepository:
     @staticmethod
     async def update_avatar(user_id: int, image_data: str) -> None:
         """Kullanıcının profil fotoğrafını günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -159,8 +151,7 @@ class UserRepository:
     @staticmethod
     async def update_otp_secret(user_id: int, otp_secret: str) -> None:
         """Kullanıcının OTP sırrını günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -177,8 +168,7 @@ class UserRepository:
     @staticmethod
     async def enable_otp(user_id: int, enabled: bool = True) -> None:
         """Kullanıcının OTP durumunu aktif/deaktif yapar"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -195,8 +185,7 @@ class UserRepository:
     @staticmethod
     async def update_recovery_code(user_id: int, recovery_code: str) -> None:
         """Kullanıcının kurtarma kodunu günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -213,8 +202,7 @@ class UserRepository:
     @staticmethod
     async def get_by_recovery_code(recovery_code: str) -> User:
         """Kurtarma koduna göre kullanıcı bulur"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -231,8 +219,7 @@ class UserRepository:
     @staticmethod
     async def update_last_activity(user_id: int) -> None:
         """Kullanıcının son aktivite zamanını günceller"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -247,8 +234,7 @@ class UserRepository:
     @staticmethod
     async def log_login_activity(user_id: int, success: bool, ip_address: str = "", user_agent: str = "") -> None:
         """Kullanıcının giriş aktivitesini kaydeder"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -263,8 +249,7 @@ class UserRepository:
     @staticmethod
     async def log_otp_activity(user_id: int, activity_type: str, success: bool, ip_address: str = "") -> None:
         """Kullanıcının OTP ile ilgili aktivitelerini kaydeder"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -279,8 +264,7 @@ class UserRepository:
     @staticmethod
     async def set_password_reset_token(user_id: int, reset_token: str, expires_at: datetime) -> None:
         """Kullanıcının şifre sıfırlama token'ını ve geçerlilik süresini kaydeder"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -297,8 +281,7 @@ class UserRepository:
     @staticmethod
     async def get_user_by_reset_token(reset_token: str) -> dict:
         """Token'a göre kullanıcıyı döndürür"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
@@ -321,8 +304,7 @@ class UserRepository:
     @staticmethod
     async def clear_reset_token(user_id: int) -> None:
         """Kullanıcının şifre sıfırlama token'ını temizler"""
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with connection() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     """
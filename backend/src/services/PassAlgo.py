@@ -1,29 +1,23 @@
-import os
+from functools import lru_cache
+
 from cryptography.fernet import Fernet
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from config.settings import settings
 
-# Generate a new master key if not set
-MASTER_KEY = os.getenv("MASTER_KEY")
-if not MASTER_KEY:
-    MASTER_KEY = Fernet.generate_key().decode()
-    
-else:
-    # Ensure MASTER_KEY is properly formatted
-    try:
-        Fernet(MASTER_KEY.encode())
-    except ValueError:
-        print("Invalid MASTER_KEY format. Generating new key...")
-        MASTER_KEY = Fernet.generate_key().decode()
-        
 
-#Bir tane master key oluşturmak için kullan.
-key = Fernet.generate_key()
+@lru_cache(maxsize=1)
+def _master_fernet() -> Fernet:
+    """Master key from MASTER_KEY, created on first use; an ephemeral key if it is missing or invalid"""
+    master_key = settings.get("MASTER_KEY")
+    if master_key:
+        try:
+            return Fernet(master_key.encode())
+        except ValueError:
+            print("Invalid MASTER_KEY format. Generating new key...")
+    return Fernet(Fernet.generate_key())
 
 #master key üretip onu .env içerisine kaydedilecek.
-#master_key = os.getenv("MASTER_KEY") ile dosya içerisinden çağırılacak.
+#master_key = settings.get("MASTER_KEY") ile dosya içerisinden çağırılacak.
 
 # --- User Key işlemleri ---
 
@@ -31,13 +25,11 @@ def generate_user_key() -> str:
     return Fernet.generate_key().decode()
 
 def encrypt_user_key(user_key: str) -> str:
-    f = Fernet(MASTER_KEY.encode())
-    encrypted = f.encrypt(user_key.encode())
+    encrypted = _master_fernet().encrypt(user_key.encode())
     return encrypted.decode()
 
 def decrypt_user_key(encrypted_user_key: str) -> str:
-    f = Fernet(MASTER_KEY.encode())
-    decrypted = f.decrypt(encrypted_user_key.encode())
+    decrypted = _master_fernet().decrypt(encrypted_user_key.encode())
     return decrypted.decode()
 
 # --- Parola işlemleri ---
@@ -51,23 +43,3 @@ def decrypt_password(encrypted_password: str, user_key: str) -> str:
     return f.decrypt(encrypted_password.encode()).decode()
 
 # sonra db'ye encrypted_password ve encrypted_user_key kaydedilir
-
-# parola kaydetme
-benimsifrem = "fatihbenimşifrem"
-
-# 1. Kullanıcı anahtarı oluştur
-user_key = generate_user_key()
-
-# 2. Anahtarı master key ile şifrele
-encrypted_user_key = encrypt_user_key(user_key)
-
-# 3. Şifreyi kullanıcı anahtarı ile şifrele
-encrypted_password = encrypt_password(benimsifrem, user_key)
-
-# parola görüntüleme
-# 4. Kullanıcı anahtarını çöz
-decrypted_user_key = decrypt_user_key(encrypted_user_key)
-
-# 5. Parolayı çöz
-plain_password = decrypt_password(encrypted_password, decrypted_user_key)
-
@@ -2,14 +2,30 @@
 # This file makes the services directory a Python package
 
 # Services package initialization
+# Classes are imported on first access, so importing one service module
+# does not load every other service (and its dependencies) with it.
 
-from services.user_service import UserService
-from services.mail_account_service import MailAccountService
-from services.email_service import EmailService
-from services.password_manager_service import PasswordManagerService
+_EXPORTS = {
+    'UserService': 'services.user_service',
+    'MailAccountService': 'services.mail_account_service',
+    'EmailService': 'services.email_service',
+    'PasswordManagerService': 'services.password_manager_service',
 
-# New refactored services
-from services.base_service import BaseService
-from services.authentication_service import AuthenticationService
-from services.account_management_service import AccountManagementService
-from services.message_service import MessageService
\ No newline at end of file
+    # New refactored services
+    'BaseService': 'services.base_service',
+    'AuthenticationService': 'services.authentication_service',
+    'AccountManagementService': 'services.account_management_service',
+    'MessageService': 'services.message_service',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'services' has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -3,8 +3,10 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 import traceback
 
+from config.settings import settings
 from services.base_service import BaseService
 from services.authentication_service import AuthenticationService
+from services.provider_client import provider_client
 from repositories.mail_account_repository import MailAccountRepository
 from models.mail_account import MailAccount
 
@@ -105,16 +107,13 @@ class AccountManagementService(BaseService):
         """Handle Outlook OAuth callback and create a new mail account"""
         try:
             # Exchange code for tokens
-            import os
-            import aiohttp
-            
             session = await self.get_aiohttp_session()
             
             data = {
-                'client_id': os.getenv('OUTLOOK_CLIENT_ID'),
-                'client_secret': os.getenv('OUTLOOK_CLIENT_SECRET'),
+                'client_id': settings.get('OUTLOOK_CLIENT_ID'),
+                'client_secret': settings.get('OUTLOOK_CLIENT_SECRET'),
                 'code': code,
-                'redirect_uri': os.getenv('OUTLOOK_REDIRECT_URI'),
+                'redirect_uri': settings.get('OUTLOOK_REDIRECT_URI'),
                 'grant_type': 'authorization_code'
             }
             
@@ -131,7 +130,8 @@ class AccountManagementService(BaseService):
                 print("Received tokens from Outlook")
 
             # Get user info from Outlook
-            async with session.get(
+            async with provider_client.get(
+                session,
                 "https://graph.microsoft.com/v1.0/me", 
                 headers={'Authorization': f'Bearer {tokens["access_token"]}'}
             ) as response:
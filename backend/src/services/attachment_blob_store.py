@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from config.app_config import APP_CONFIG
+from repositories.attachment_blob_repository import AttachmentBlobRepository
+from services.provider_client import provider_client
+from utils.codec import decode_base64url
+from utils.lru_cache import LRUCache
+
+
+class StoredBlob(NamedTuple):
+    data: memoryview
+    mime_type: Optional[str]
+
+
+class AttachmentBlobStore:
+    """
+    Content-addressed on-disk store for attachment bytes.
+
+    Blobs are named by the SHA-256 of their content and sharded as
+    <root>/ab/cd/<digest>, so the same logo or PDF seen in many messages is
+    stored once. The AttachmentBlobs table maps (account, message, attachment)
+    to a digest; repeat downloads are served from disk through mmap without
+    calling Gmail or Graph. Total size is capped with LRU eviction by last use.
+    The size accounting is per process, so with several workers the cap is
+    approximate.
+    """
+
+    def __init__(
+        self,
+        root_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        blob_repository: Optional[AttachmentBlobRepository] = None
+    ):
+        self.root_dir = root_dir or APP_CONFIG['ATTACHMENT_STORE_DIR']
+        self.max_bytes = max_bytes or APP_CONFIG['ATTACHMENT_STORE_MAX_BYTES']
+        self.blob_repository = blob_repository or AttachmentBlobRepository()
+        # (account_id, message_id, attachment_key) -> (digest, mime type), saves a DB round trip on hot attachments
+        self._index = LRUCache(max_entries=4096)
+        # digest -> size, oldest use first
+        self._usage: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._usage_loaded = False
+        self._in_flight = {}
+        # Writes run in executor threads; guards the usage bookkeeping
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def attachment_key(reference: str) -> str:
+        """Fixed-length key for a provider attachment reference (Gmail ids exceed index limits)"""
+        return hashlib.sha256(reference.encode('utf-8')).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], digest)
+
+    # --- Disk operations (blocking, run in the default executor) ---
+
+    def _load_usage(self) -> None:
+        entries = []
+        if os.path.isdir(self.root_dir):
+            for dir_path, _, file_names in os.walk(self.root_dir):
+                for name in file_names:
+                    if len(name) != 64:
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(dir_path, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        for _, digest, size in entries:
+            self._usage[digest] = size
+            self._total_bytes += size
+        self._usage_loaded = True
+
+    def _touch(self, digest: str) -> None:
+        with self._lock:
+            if digest in self._usage:
+                self._usage.move_to_end(digest)
+        try:
+            os.utime(self._path(digest))
+        except OSError:
+            pass
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._usage) > 1:
+            digest, size = self._usage.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+            evicted.append(digest)
+        return evicted
+
+    def _write(self, data: bytes) -> Tuple[str, List[str]]:
+        """Store the bytes, returning their digest and the digests evicted to make room"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            if not self._usage_loaded:
+                self._load_usage()
+            exists = digest in self._usage
+        if exists or os.path.exists(path):
+            self._touch(digest)
+            return digest, []
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if digest not in self._usage:
+                self._usage[digest] = len(data)
+                self._total_bytes += len(data)
+            return digest, self._evict()
+
+    def _read(self, digest: str) -> Optional[memoryview]:
+        """Memory-map a stored blob; returns None if it has been evicted"""
+        try:
+            with open(self._path(digest), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b'')
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(digest)
+        return memoryview(mapped)
+
+    # --- Public API ---
+
+    async def read(self, digest: str) -> Optional[memoryview]:
+        """
+        Stored blob as an mmap-backed memoryview, or None if it has been
+        evicted. Opening, mapping and the mtime update run in the executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read, digest)
+
+    async def put(self, data: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        digest, evicted = await loop.run_in_executor(None, self._write, data)
+        for evicted_digest in evicted:
+            try:
+                await self.blob_repository.delete_by_digest(evicted_digest)
+            except Exception as e:
+                print(f"Error removing evicted blob {evicted_digest} from index: {str(e)}")
+        return digest
+
+    async def get_or_fetch(
+        self,
+        account_id: int,
+        message_id: str,
+        reference: str,
+        fetch: Callable[[], Awaitable[Optional[Tuple[bytes, Optional[str]]]]]
+    ) -> Optional[StoredBlob]:
+        """
+        Return an attachment's bytes and mime type, downloading it with `fetch`
+        only when it is not already on disk. `fetch` returns (bytes, mime type)
+        or None. Concurrent requests for the same attachment share one download.
+        """
+        key = (account_id, message_id, self.attachment_key(reference))
+
+        entry = self._index.get(key)
+        if entry is None:
+            try:
+                row = await self.blob_repository.get_blob(*key)
+                entry = (row['digest'], row['mime_type']) if row else None
+            except Exception as e:
+                print(f"Error reading attachment blob index: {str(e)}")
+        if entry:
+            data = await self.read(entry[0])
+            if data is not None:
+                self._index.set(key, entry)
+                return StoredBlob(data, entry[1])
+
+        in_flight = self._in_flight.get(key)
+        if in_flight:
+            return await asyncio.shield(in_flight)
+
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key, fetch) -> Optional[StoredBlob]:
+        fetched = await fetch()
+        if not fetched:
+            return None
+        data, mime_type = fetched
+        try:
+            digest = await self.put(data)
+            self._index.set(key, (digest, mime_type))
+            await self.blob_repository.save_blob(*key, digest, len(data), mime_type)
+        except Exception as e:
+            print(f"Error storing attachment blob: {str(e)}")
+            print(traceback.format_exc())
+        return StoredBlob(memoryview(data), mime_type)
+
+    # --- Provider downloads ---
+
+    async def get_gmail_attachment(
+        self,
+        session,
+        headers,
+        account_id: int,
+        message_id: str,
+        attachment_id: str,
+        part_id: Optional[str] = None,
+        mime_type: Optional[str] = None
+    ) -> Optional[memoryview]:
+        """
+        Gmail attachment bytes, from disk when possible. Gmail issues a new
+        attachmentId on every messages.get call, so the stable part id is the
+        index key when available.
+        """
+        async def fetch():
+            try:
+                async with provider_client.get(
+                    session,
+                    f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}/attachments/{attachment_id}',
+                    headers=headers
+                ) as response:
+                    if response.status != 200:
+                        print(f"Error fetching Gmail attachment for {message_id}: Status {response.status}")
+                        return None
+                    attachment_data = await response.json()
+                return decode_base64url(attachment_data.get('data', '')), mime_type
+            except Exception as e:
+                print(f"Error fetching attachment {attachment_id}: {str(e)}")
+                return None
+
+        blob = await self.get_or_fetch(account_id, message_id, f"part:{part_id or attachment_id}", fetch)
+        return blob.data if blob else None
+
+    async def get_outlook_attachment(
+        self,
+        session,
+        headers,
+        account_id: int,
+        message_id: str,
+        attachment_id: str,
+        mime_type: Optional[str] = None
+    ) -> Optional[memoryview]:
+        """Outlook attachment bytes, from disk when possible"""
+        async def fetch():
+            try:
+                async with provider_client.get(
+                    session,
+                    f'https://graph.microsoft.com/v1.0/me/messages/{message_id}/attachments/{attachment_id}/$value',
+                    headers=headers
+                ) as response:
+                    if response.status != 200:
+                        print(f"Error fetching Outlook attachment for {message_id}: Status {response.status}")
+                        return None
+                    return await response.read(), mime_type
+            except Exception as e:
+                print(f"Error fetching attachment {attachment_id}: {str(e)}")
+                return None
+
+        blob = await self.get_or_fetch(account_id, message_id, f"attachment:{attachment_id}", fetch)
+        return blob.data if blob else None
+
+
+# Shared instance so every service deduplicates into the same store
+attachment_blob_store = AttachmentBlobStore()
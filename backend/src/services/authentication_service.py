@@ -11,7 +11,7 @@ from config.oauth_config import (
     GOOGLE_TOKEN_URI,
     GOOGLE_SCOPE
 )
-import os
+from config.settings import settings
 from typing import Dict, Any, Optional
 
 from services.base_service import BaseService
@@ -48,9 +48,9 @@ class AuthenticationService(BaseService):
         
         # Build authorization URL with prompt parameter
         params = {
-            'client_id': os.getenv('OUTLOOK_CLIENT_ID'),
+            'client_id': settings.get('OUTLOOK_CLIENT_ID'),
             'response_type': 'code',
-            'redirect_uri': os.getenv('OUTLOOK_REDIRECT_URI'),
+            'redirect_uri': settings.get('OUTLOOK_REDIRECT_URI'),
             'scope': 'Mail.Read Mail.Send offline_access',
             'state': state,
             'prompt': 'select_account'  # Force account selection
@@ -77,8 +77,8 @@ class AuthenticationService(BaseService):
         try:
             session = await self.get_aiohttp_session()
             data = {
-                'client_id': os.getenv('OUTLOOK_CLIENT_ID'),
-                'client_secret': os.getenv('OUTLOOK_CLIENT_SECRET'),
+                'client_id': settings.get('OUTLOOK_CLIENT_ID'),
+                'client_secret': settings.get('OUTLOOK_CLIENT_SECRET'),
                 'refresh_token': refresh_token,
                 'grant_type': 'refresh_token',
                 'scope': 'Mail.Read Mail.Send offline_access'
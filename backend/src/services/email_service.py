@@ -5,29 +5,33 @@ from datetime import datetime, timezone, timedelta
 import os
 import json
 import traceback
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import asyncio
-from bs4 import BeautifulSoup
+from yarl import URL
 
 from repositories.mail_account_repository import MailAccountRepository
+from models.message import Message, MessageAttachment, MessageRecipient
 from services.mail_account_service import MailAccountService
+from services.http_client import get_http_session
+from services.inline_image_service import inline_image_service
+from services.provider_breaker_service import provider_breakers
+from services.provider_client import provider_client
+from services.shared_cache_service import MAILBOX_CHANGED, shared_cache
+from utils.codec import decode_base64url_text
+from utils.fan_out import as_finished
+from utils.field_projection import ALL_FIELDS, FieldSelection
+from utils.timestamps import epoch_ms_from_internal_date, epoch_ms_from_iso
+from utils.page_token import decode_cursor, encode_cursor
+from utils.top_n import TopN
 
 class EmailService:
     def __init__(self):
         self.mail_account_repo = MailAccountRepository()
         self.mail_account_service = MailAccountService()
-        self._session = None
 
     async def get_aiohttp_session(self):
-        """Mevcut bir aiohttp oturumunu döndürür veya yenisini oluşturur."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
-        return self._session
-
-    async def close_aiohttp_session(self):
-        """Aiohttp oturumunu kapatır."""
-        if self._session and not self._session.closed:
-            await self._session.close()
+        """Worker'ın paylaşılan aiohttp oturumunu döndürür (services.http_client)."""
+        return await get_http_session()
 
     async def _ensure_valid_token(self, account) -> bool:
         """Checks if the token is valid and refreshes it if necessary."""
@@ -314,16 +318,16 @@ class EmailService:
             print(traceback.format_exc())
             return False
 
-    async def get_sent_emails(self, user_id: int, limit: int = 50, offset: int = 0) -> dict:
+    async def get_sent_emails(self, user_id: int, limit: int = 50, offset: int = 0, fields: Optional[FieldSelection] = None) -> dict:
         """Kullanıcının gönderilen maillerini getirir (MailAccountService'teki implementasyonu kullanır)."""
         try:
-            result = await self.mail_account_service.get_sent_emails(user_id, limit, offset)
+            result = await self.mail_account_service.get_sent_emails(user_id, limit, offset, fields)
             return result
 
         except Exception as e:
             print(f"Error in EmailService get_sent_emails (calling MailAccountService): {str(e)}")
             print(traceback.format_exc())
-            return {'sent_emails': [], 'total_count': 0}
+            return {'sent_emails': [], 'total_count': 0, 'error': 'Sent emails could not be loaded'}
 
     async def delete_email(self, user_id: int, account_id: int, message_id: str) -> bool:
         """Delete an email from the specified account."""
@@ -346,6 +350,9 @@ class EmailService:
             else:
                 return False
 
+            if success:
+                # Folder counts changed; no worker should serve the cached ones
+                await shared_cache.publish(MAILBOX_CHANGED, account_id=account_id)
             return success
 
         except Exception as e:
@@ -404,8 +411,9 @@ class EmailService:
             print(f"Error in _delete_via_outlook: {str(e)}")
             return False
 
-    async def get_deleted_emails(self, user_id: int, limit: int = 50, offset: int = 0) -> dict:
-        """Get deleted emails for a user by fetching from provider APIs."""
+    async def get_deleted_emails(self, user_id: int, limit: int = 50, offset: int = 0, fields: Optional[FieldSelection] = None) -> dict:
+        """Get deleted emails for a user by fetching from provider APIs, limited to the selected fields."""
+        fields = fields or ALL_FIELDS
         try:
             accounts = await self.mail_account_repo.get_user_accounts(user_id)
             if not accounts:
@@ -414,46 +422,51 @@ class EmailService:
 
             fetch_tasks = []
             for account in accounts:
-                fetch_tasks.append(self._fetch_deleted_for_account(session, account, user_id, limit, offset))
-
-            results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
-
-            all_messages = []
-            for result in results:
+                # Accounts behind an open circuit are skipped instead of waited on
+                if not provider_breakers.allow(account.account_type, account.account_id):
+                    continue
+                fetch_tasks.append(self._fetch_deleted_for_account(session, account, user_id, limit, offset, fields))
+
+            # Only the newest offset + limit messages are kept; each account's
+            # batch is merged as soon as it arrives and then dropped
+            top_messages = TopN(offset + limit, key=lambda message: message.timestamp)
+            async for result in as_finished(fetch_tasks, return_exceptions=True):
                 if isinstance(result, Exception):
                     print(f"Error fetching deleted emails for one account: {result}")
                 elif isinstance(result, list):
-                    all_messages.extend(result)
-
-            all_messages.sort(key=lambda x: self.mail_account_service._parse_email_date(x.get('sent_at', '')), reverse=True)
+                    top_messages.extend(result)
 
-            total_count = len(all_messages)
-            paginated_messages = all_messages[offset : offset + limit]
+            total_count = top_messages.seen
+            paginated_messages = top_messages.page(offset)
 
             # Add account_email to each message
+            account_emails = {
+                (acc.account_id if hasattr(acc, 'account_id') else acc['account_id']): (acc.email if hasattr(acc, 'email') else acc.get('email', 'Bilinmiyor'))
+                for acc in accounts
+            }
             for message in paginated_messages:
-                account_id = message.get('account_id')
-                account = next((acc for acc in accounts if (hasattr(acc, 'account_id') and acc.account_id == account_id) or 
-                                                        (not hasattr(acc, 'account_id') and acc['account_id'] == account_id)), None)
-                if account:
-                    message['account_email'] = account.email if hasattr(account, 'email') else account.get('email', 'Bilinmiyor')
+                if message.account_id in account_emails:
+                    message.account_email = account_emails[message.account_id]
 
             return {
-                'deleted_emails': paginated_messages,
+                # Each record on the page becomes its response dict once, with only the selected fields
+                'deleted_emails': [message.to_mailbox_dict(fields) for message in paginated_messages],
                 'total_count': total_count
             }
 
         except Exception as e:
             print(f"Critical Error in get_deleted_emails for user_id {user_id}: {str(e)}")
             print(f"Full traceback: {traceback.format_exc()}")
-            return {'deleted_emails': [], 'total_count': 0}
+            return {'deleted_emails': [], 'total_count': 0, 'error': 'Deleted emails could not be loaded'}
 
-    async def _fetch_deleted_for_account(self, session, account, user_id: int, limit: int, offset: int) -> list:
+    async def _fetch_deleted_for_account(self, session, account, user_id: int, limit: int, offset: int, fields: FieldSelection = ALL_FIELDS) -> list:
         """Helper function to fetch deleted emails for a single account from its API."""
         account_id = account.account_id if hasattr(account, 'account_id') else account['account_id']
         account_type = account.account_type if hasattr(account, 'account_type') else account['account_type']
 
         if not await self._ensure_valid_token(account):
+            # Allowed by get_deleted_emails; the call never went out
+            provider_breakers.release(account_type, account_id)
             return []
 
         account_messages = []
@@ -471,48 +484,56 @@ class EmailService:
                     'labelIds': ['TRASH'],
                     'includeSpamTrash': 'true'
                 }
-                async with session.get(
+                async with provider_client.get(
+                    session,
                     'https://gmail.googleapis.com/gmail/v1/users/me/messages',
                     headers=headers,
                     params=params
                 ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        messages_list = data.get('messages', [])
+                    provider_breakers.record_status(account_type, account_id, response.status)
+                    if response.status != 200:
+                        error_text = await response.text()
+                        print(f"ERROR fetching Gmail TRASH message list for account {account_id}: Status {response.status}, Response: {error_text}")
+                        return []
+                    data = await response.json()
 
-                        if not messages_list:
-                            return []
+                # Details are fetched after the listing has given its slot back
+                messages_list = data.get('messages', [])
 
-                        message_tasks = []
-                        for msg_ref in messages_list:
-                            message_id = msg_ref['id']
-                            task = self.mail_account_service.get_gmail_message_details(session, headers, message_id, account, user_id)
-                            message_tasks.append(task)
+                if not messages_list:
+                    return []
 
-                        if message_tasks:
-                            batch_results = await asyncio.gather(*message_tasks, return_exceptions=True)
-                            valid_messages = [msg for msg in batch_results if msg is not None and not isinstance(msg, Exception)]
-                            account_messages.extend(valid_messages)
-                        return account_messages
+                message_tasks = []
+                for msg_ref in messages_list:
+                    message_id = msg_ref['id']
+                    task = self.mail_account_service.get_gmail_message_details(session, headers, message_id, account, user_id, fields)
+                    message_tasks.append(task)
 
-                    else:
-                        error_text = await response.text()
-                        print(f"ERROR fetching Gmail TRASH message list for account {account_id}: Status {response.status}, Response: {error_text}")
-                        return []
+                if message_tasks:
+                    batch_results = await asyncio.gather(*message_tasks, return_exceptions=True)
+                    valid_messages = [msg for msg in batch_results if msg is not None and not isinstance(msg, Exception)]
+                    account_messages.extend(valid_messages)
+                return account_messages
 
             elif account_type == 'outlook':
                 outlook_limit = 200
+                include_body = fields.wants('body', 'body_type')
+                include_attachments = fields.wants('attachments')
+                select = 'id,subject,from,toRecipients,ccRecipients,bccRecipients,sentDateTime,hasAttachments,internetMessageId'
                 params = {
                     '$top': outlook_limit,
                     '$orderby': 'receivedDateTime desc',
-                    '$select': 'id,subject,from,toRecipients,ccRecipients,bccRecipients,sentDateTime,body,hasAttachments,internetMessageId',
-                    '$expand': 'attachments($select=id,name,contentType,size,isInline)'
+                    '$select': f'{select},body' if include_body else select
                 }
-                async with session.get(
+                if include_attachments:
+                    params['$expand'] = 'attachments($select=id,name,contentType,size,isInline)'
+                async with provider_client.get(
+                    session,
                     'https://graph.microsoft.com/v1.0/me/mailFolders/deleteditems/messages',
                     headers=headers,
                     params=params
                 ) as response:
+                    provider_breakers.record_status(account_type, account_id, response.status)
                     if response.status == 200:
                         data = await response.json()
                         messages_list = data.get('value', [])
@@ -521,57 +542,57 @@ class EmailService:
                             return []
 
                         for msg in messages_list:
-                            to_recipients_list = [r.get('emailAddress', {}).get('address', '') for r in msg.get('toRecipients', [])]
-                            cc_recipients_list = [r.get('emailAddress', {}).get('address', '') for r in msg.get('ccRecipients', [])]
-                            bcc_recipients_list = [r.get('emailAddress', {}).get('address', '') for r in msg.get('bccRecipients', [])]
-                            
                             # Get full message body and content type
                             body_content = msg.get('body', {}).get('content', '')
                             content_type = msg.get('body', {}).get('contentType', 'text')
                             
                             # Process attachments and inline images
                             attachments = []
-                            if msg.get('hasAttachments', False):
+                            if include_attachments and msg.get('hasAttachments', False):
                                 for attachment in msg.get('attachments', []):
-                                    attachment_data = {
-                                        'id': attachment.get('id', ''),
-                                        'name': attachment.get('name', ''),
-                                        'contentType': attachment.get('contentType', ''),
-                                        'size': attachment.get('size', 0),
-                                        'isInline': attachment.get('isInline', False)
-                                    }
+                                    attachment_data = MessageAttachment(
+                                        filename=attachment.get('name', ''),
+                                        mime_type=attachment.get('contentType', ''),
+                                        id=attachment.get('id', ''),
+                                        inline=attachment.get('isInline', False),
+                                        size=attachment.get('size', 0)
+                                    )
                                     
                                     # Generate a direct download URL for the attachment
-                                    attachment_url = f"https://graph.microsoft.com/v1.0/me/messages/{msg.get('id')}/attachments/{attachment_data['id']}/$value"
-                                    attachment_data['url'] = attachment_url
+                                    attachment_url = f"https://graph.microsoft.com/v1.0/me/messages/{msg.get('id')}/attachments/{attachment_data.id}/$value"
+                                    attachment_data.url = attachment_url
                                     
                                     # If it's an inline image, replace the source in HTML content
-                                    if attachment_data['isInline'] and 'image' in attachment_data['contentType'].lower():
+                                    if attachment_data.inline and 'image' in attachment_data.mime_type.lower():
                                         # Find the image reference in the HTML content
-                                        img_filename = attachment_data['name']
+                                        img_filename = attachment_data.filename
                                         body_content = body_content.replace(f'src="{img_filename}"', f'src="{attachment_url}"')
                                         body_content = body_content.replace(f"src='{img_filename}'", f"src='{attachment_url}'")
                                     
                                     attachments.append(attachment_data)
 
-                            message = {
-                                'message_id': msg.get('id', ''),
-                                'account_id': account_id,
-                                'user_id': user_id,
-                                'from': msg.get('from', {}).get('emailAddress', {}).get('address', account.email if hasattr(account, 'email') else account.get('email', 'Unknown')),
-                                'to_recipients': [addr for addr in to_recipients_list if addr],
-                                'cc_recipients': [addr for addr in cc_recipients_list if addr],
-                                'bcc_recipients': [addr for addr in bcc_recipients_list if addr],
-                                'subject': msg.get('subject', ''),
-                                'body': body_content,
-                                'body_type': content_type,
-                                'sent_at': msg.get('sentDateTime', ''),
-                                'created_date': datetime.now(timezone.utc).isoformat(),
-                                'has_attachments': msg.get('hasAttachments', False),
-                                'attachments': attachments,
-                                'access_token': access_token  # Include access token for attachment downloads
-                            }
-                            account_messages.append(message)
+                            # Point cid: references at the inline image endpoint
+                            if include_body:
+                                body_content = inline_image_service.rewrite_cid_references(body_content, user_id, account_id, msg.get('id', ''))
+
+                            account_messages.append(Message(
+                                id=msg.get('id', ''),
+                                account_id=account_id,
+                                user_id=user_id,
+                                sender=MessageRecipient.from_graph(msg.get('from'), default=account.email if hasattr(account, 'email') else account.get('email', 'Unknown')),
+                                to=MessageRecipient.from_graph_list(msg.get('toRecipients')),
+                                cc=MessageRecipient.from_graph_list(msg.get('ccRecipients')),
+                                bcc=MessageRecipient.from_graph_list(msg.get('bccRecipients')),
+                                subject=msg.get('subject', ''),
+                                content=body_content,
+                                has_html=content_type == 'html',
+                                body_type=content_type,
+                                date=msg.get('sentDateTime', ''),
+                                timestamp=epoch_ms_from_iso(msg.get('sentDateTime')),
+                                has_attachments=msg.get('hasAttachments', False),
+                                attachments=attachments,
+                                access_token=access_token  # Include access token for attachment downloads
+                            ))
                         return account_messages
                     else:
                         error_text = await response.text()
@@ -579,14 +600,17 @@ class EmailService:
                         return []
 
             else:
+                provider_breakers.release(account_type, account_id)
                 return []
 
         except aiohttp.ClientError as e:
             print(f"Network Error processing account {account_id} ({account_type}): {str(e)}")
+            provider_breakers.record_failure(account_type, account_id, e)
             return []
         except Exception as e:
             print(f"Unexpected Error processing account {account_id} ({account_type}): {str(e)}")
             print(f"Full traceback: {traceback.format_exc()}")
+            provider_breakers.record_failure(account_type, account_id, e)
             return []
 
     async def restore_email(self, user_id: int, account_id: int, message_id: str) -> bool:
@@ -608,6 +632,7 @@ class EmailService:
                 success = await self._restore_via_outlook(session, account, account.access_token, message_id)
 
             if success:
+                await shared_cache.publish(MAILBOX_CHANGED, account_id=account_id)
                 # Mail başarıyla geri getirildiğinde deleted_emails tablosundan sil
                 try:
                     await self.mail_account_repo.remove_from_deleted_emails(account_id, message_id)
@@ -766,6 +791,24 @@ class EmailService:
             print(f"Error in _permanent_delete_via_outlook: {str(e)}")
             return False
 
+    async def get_inline_image(self, user_id: int, account_id: int, message_id: str, content_id: str) -> Optional[Tuple[bytes, str]]:
+        """Get an inline (cid:) image of a message as (bytes, mime type)."""
+        try:
+            account = await self.mail_account_repo.get_account_by_id(account_id)
+            if not account or account.user_id != user_id:
+                return None
+
+            if not await self._ensure_valid_token(account):
+                return None
+
+            session = await self.get_aiohttp_session()
+            return await inline_image_service.get_image(session, account, message_id, content_id)
+
+        except Exception as e:
+            print(f"Error in get_inline_image: {str(e)}")
+            print(traceback.format_exc())
+            return None
+
     async def get_inbox_messages(self, user_id: int, account_id: str = None, page_token: str = None, page_size: int = 25) -> dict:
         """Get inbox messages for a user's account or all accounts."""
         try:
@@ -792,25 +835,17 @@ class EmailService:
                         messages = response.get('messages', [])
                         next_token = response.get('nextPageToken')
 
-                    # Her maile hesap bilgilerini ekle
-                    messages = [{
-                        **msg,
-                        'account_id': account.account_id,
-                        'account_email': account.email,
-                        'account_type': account.account_type
-                    } for msg in messages]
-
                     # Optimized filtering for specific account
                     filtered_messages = []
                     account_email_lower = account.email.lower()
                     
                     for msg in messages:
                         # Early skip for empty/invalid messages
-                        if not msg.get('id'):
+                        if not msg.id:
                             continue
 
                         # Optimized ID format checking
-                        msg_id = msg['id']
+                        msg_id = msg.id
                         is_outlook_format = len(msg_id) > 30 or '=' in msg_id or ':' in msg_id
                         
                         # Skip if message format doesn't match account type
@@ -820,20 +855,20 @@ class EmailService:
                             continue
 
                         # Priority: Direct recipient email match (most reliable)
-                        recipient_email = msg.get('recipientEmail', '').lower().strip()
+                        recipient_email = str(msg.recipient or '').lower().strip()
                         if recipient_email and recipient_email == account_email_lower:
                             filtered_messages.append(msg)
                             continue
 
                         # Fallback: Check if message belongs to this account via other means
                         # This is kept minimal to improve performance
-                        sender = msg.get('sender', '').lower()
+                        sender = str(msg.sender or '').lower()
                         if account_email_lower in sender:
                             filtered_messages.append(msg)
                             continue
 
                     return {
-                        "messages": filtered_messages,
+                        "messages": [self._inbox_message_dict(msg, account) for msg in filtered_messages],
                         "nextPageToken": next_token,
                         "totalMessages": len(filtered_messages)
                     }
@@ -845,14 +880,16 @@ class EmailService:
             else:
                 # Tüm hesaplar için mailleri getir
                 accounts = await self.mail_account_repo.get_accounts_by_user_id(user_id)
-                all_messages = []
                 
                 session = await self.get_aiohttp_session()
                 
                 # Her hesaptan paralel olarak mailleri çek
                 async def fetch_account_messages(account):
+                    if not provider_breakers.allow(account.account_type, account.account_id):
+                        return []
                     try:
                         if not await self._ensure_valid_token(account):
+                            provider_breakers.release(account.account_type, account.account_id)
                             return []
 
                         if account.account_type == 'gmail':
@@ -862,75 +899,36 @@ class EmailService:
                             response = await self._get_outlook_messages(session, account, None, page_size)
                             messages = response.get('messages', [])
                         else:
+                            provider_breakers.release(account.account_type, account.account_id)
                             return []
 
-                        # Her maile hesap bilgisini ekle
-                        return [{
-                            **msg,
-                            'account_id': account.account_id,
-                            'account_email': account.email,
-                            'account_type': account.account_type
-                        } for msg in messages]
+                        provider_breakers.record_success(account.account_type, account.account_id)
+                        return messages
                     except Exception as e:
                         print(f"Error fetching messages for account {account.email}: {str(e)}")
+                        provider_breakers.record_failure(account.account_type, account.account_id, e)
                         return []
 
                 # Tüm hesaplardan paralel olarak mail çek
                 tasks = [fetch_account_messages(account) for account in accounts]
                 message_lists = await asyncio.gather(*tasks)
                 
-                # Tüm mesajları birleştir
-                for messages in message_lists:
-                    all_messages.extend(messages)
-
-                # Tarihleri datetime objesine çevir ve sırala
-                def parse_date(date_str):
-                    try:
-                        if not date_str:
-                            return datetime.min.replace(tzinfo=timezone.utc)
-                        
-                        # Clean up the date string
-                        date_str = date_str.strip()
-                        
-                        # First try RFC 2822 format (Gmail format) - most common
-                        try:
-                            from email.utils import parsedate_to_datetime
-                            return parsedate_to_datetime(date_str)
-                        except:
-                            pass
-                        
-                        # Then try ISO format (Outlook format)
-                        if 'T' in date_str:
-                            # ISO format (Outlook)
-                            if date_str.endswith('Z'):
-                                return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                            elif '+' in date_str or date_str.count('-') > 2:
-                                return datetime.fromisoformat(date_str)
-                            else:
-                                # Add UTC timezone if missing
-                                return datetime.fromisoformat(date_str + '+00:00')
-                        
-                        # Fallback: try to parse as simple date
-                        return datetime.fromisoformat(date_str)
-                        
-                    except Exception as e:
-                        print(f"Error parsing date '{date_str}': {e}")
-                        return datetime.min.replace(tzinfo=timezone.utc)
-
-                # Tüm mesajları tarihe göre sırala
-                all_messages.sort(key=lambda x: parse_date(x.get('date', '')), reverse=True)
-                
-                # Sayfalama için mesajları böl
+                # Sayfalama için yalnızca en yeni start_idx + page_size mesaj tutulur
                 start_idx = 0 if not page_token else int(page_token)
                 end_idx = start_idx + page_size
-                paginated_messages = all_messages[start_idx:end_idx]
+                top_messages = TopN(end_idx, key=lambda message: message.timestamp)
+                for messages in message_lists:
+                    top_messages.extend(messages)
+                paginated_messages = top_messages.page(start_idx)
                 
-                next_token = str(end_idx) if end_idx < len(all_messages) else None
+                next_token = str(end_idx) if end_idx < top_messages.seen else None
 
+                # Her maile hesap bilgisini ekle; sayfadaki her kayıt bir kez dict olur
+                accounts_by_id = {account.account_id: account for account in accounts}
                 return {
-                    "messages": paginated_messages,
+                    "messages": [self._inbox_message_dict(msg, accounts_by_id[msg.account_id]) for msg in paginated_messages],
                     "nextPageToken": next_token,
-                    "totalMessages": len(all_messages)
+                    "totalMessages": top_messages.seen
                 }
 
         except Exception as e:
@@ -938,6 +936,17 @@ class EmailService:
             print(traceback.format_exc())
             return {"messages": [], "nextPageToken": None}
 
+    @staticmethod
+    def _inbox_message_dict(message: Message, account) -> dict:
+        """Inbox response dict of a message plus the account it came from"""
+        result = message.to_dict()
+        result.update({
+            'account_id': account.account_id,
+            'account_email': account.email,
+            'account_type': account.account_type
+        })
+        return result
+
     async def _get_gmail_messages(self, session, account, page_token: str = None, page_size: int = 25) -> dict:
         """Get Gmail messages with pagination."""
         try:
@@ -960,7 +969,8 @@ class EmailService:
             if page_token:
                 params['pageToken'] = page_token
 
-            async with session.get(
+            async with provider_client.get(
+                session,
                 'https://gmail.googleapis.com/gmail/v1/users/me/messages',
                 headers=headers,
                 params=params
@@ -968,60 +978,62 @@ class EmailService:
                 messages_response.raise_for_status()
                 messages_data = await messages_response.json()
                 
-                # Get message details
-                messages = []
-                for message in messages_data.get('messages', []):
-                    try:
-                        async with session.get(
-                            f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message["id"]}',
-                            headers=headers
-                        ) as detail_response:
-                            detail_response.raise_for_status()
-                            detail_data = await detail_response.json()
-                            
-                            # Extract message details
-                            headers_dict = {}
-                            for header in detail_data.get('payload', {}).get('headers', []):
-                                headers_dict[header['name']] = header['value']
-                            
-                            # Get body content
-                            body_content = ""
-                            payload = detail_data.get('payload', {})
-                            if 'parts' in payload:
-                                for part in payload['parts']:
-                                    if part.get('mimeType') == 'text/html' or part.get('mimeType') == 'text/plain':
-                                        body_data = part.get('body', {}).get('data', '')
-                                        if body_data:
-                                            body_content = base64.urlsafe_b64decode(body_data + '===').decode('utf-8', errors='ignore')
-                                            break
-                            else:
-                                body_data = payload.get('body', {}).get('data', '')
+            # Get message details; each detail call takes its own slot
+            messages = []
+            for message in messages_data.get('messages', []):
+                try:
+                    async with provider_client.get(
+                        session,
+                        f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message["id"]}',
+                        headers=headers
+                    ) as detail_response:
+                        detail_response.raise_for_status()
+                        detail_data = await detail_response.json()
+                    
+                    # Extract message details
+                    headers_dict = {}
+                    for header in detail_data.get('payload', {}).get('headers', []):
+                        headers_dict[header['name']] = header['value']
+                    
+                    # Get body content
+                    body_content = ""
+                    payload = detail_data.get('payload', {})
+                    if 'parts' in payload:
+                        for part in payload['parts']:
+                            if part.get('mimeType') == 'text/html' or part.get('mimeType') == 'text/plain':
+                                body_data = part.get('body', {}).get('data', '')
                                 if body_data:
-                                    body_content = base64.urlsafe_b64decode(body_data + '===').decode('utf-8', errors='ignore')
-                            
-                            message_obj = {
-                                'id': message['id'],
-                                'subject': headers_dict.get('Subject', 'No Subject'),
-                                'sender': headers_dict.get('From', 'Unknown Sender'),
-                                'preview': body_content[:200] if body_content else '',
-                                'date': headers_dict.get('Date', ''),
-                                'content': body_content,
-                                'hasHtml': 'text/html' in str(payload),
-                                'read': 'UNREAD' not in detail_data.get('labelIds', []),
-                                'starred': 'STARRED' in detail_data.get('labelIds', []),
-                                'recipientEmail': account.email if hasattr(account, 'email') else account.get('email', ''),
-                                'attachments': []
-                            }
-                            messages.append(message_obj)
-                            
-                    except Exception as e:
-                        print(f"Error getting Gmail message details: {str(e)}")
-                        continue
-                
-                return {
-                    'messages': messages,
-                    'nextPageToken': messages_data.get('nextPageToken')
-                }
+                                    body_content = decode_base64url_text(body_data)
+                                    break
+                    else:
+                        body_data = payload.get('body', {}).get('data', '')
+                        if body_data:
+                            body_content = decode_base64url_text(body_data)
+                    
+                    account_email = account.email if hasattr(account, 'email') else account.get('email', '')
+                    messages.append(Message(
+                        id=message['id'],
+                        account_id=account.account_id if hasattr(account, 'account_id') else account.get('account_id'),
+                        subject=headers_dict.get('Subject', 'No Subject'),
+                        sender=MessageRecipient.parse(headers_dict.get('From', 'Unknown Sender')),
+                        recipient=MessageRecipient(address=account_email, display=account_email),
+                        preview=body_content[:200] if body_content else '',
+                        date=headers_dict.get('Date', ''),
+                        timestamp=epoch_ms_from_internal_date(detail_data.get('internalDate')),
+                        content=body_content,
+                        has_html='text/html' in str(payload),
+                        read='UNREAD' not in detail_data.get('labelIds', []),
+                        starred='STARRED' in detail_data.get('labelIds', [])
+                    ))
+                    
+                except Exception as e:
+                    print(f"Error getting Gmail message details: {str(e)}")
+                    continue
+            
+            return {
+                'messages': messages,
+                'nextPageToken': messages_data.get('nextPageToken')
+            }
                 
         except Exception as e:
             print(f"Error in _get_gmail_messages: {str(e)}")
@@ -1040,28 +1052,20 @@ class EmailService:
             # Get date 2 years ago
             one_year_ago = (datetime.now() - timedelta(days=730)).strftime('%Y-%m-%d')
             
-            # Calculate skip value for pagination
-            skip_value = 0
-            if page_token:
-                try:
-                    skip_value = int(page_token)
-                except:
-                    skip_value = 0
-            
-            params = {
-                '$top': page_size,
-                '$orderby': 'receivedDateTime desc',
-                '$expand': 'attachments',
-                '$count': 'true',
-                '$filter': f"receivedDateTime ge {one_year_ago}T00:00:00Z",
-                '$skip': skip_value
-            }
+            # Later pages follow Graph's @odata.nextLink cursor, wrapped in the page token
+            next_link = decode_cursor(page_token)
+            if next_link:
+                url, params = URL(next_link, encoded=True), None
+            else:
+                url = 'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages'
+                params = {
+                    '$top': page_size,
+                    '$orderby': 'receivedDateTime desc',
+                    '$expand': 'attachments',
+                    '$filter': f"receivedDateTime ge {one_year_ago}T00:00:00Z"
+                }
 
-            async with session.get(
-                'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages',
-                headers=headers,
-                params=params
-            ) as messages_response:
+            async with provider_client.get(session, url, headers=headers, params=params) as messages_response:
                 messages_response.raise_for_status()
                 messages_data = await messages_response.json()
                 
@@ -1071,33 +1075,33 @@ class EmailService:
                     attachments = []
                     for attachment in msg.get('attachments', []):
                         if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment':
-                            attachments.append({
-                                'id': attachment['id'],
-                                'filename': attachment['name'],
-                                'mimeType': attachment.get('contentType', 'application/octet-stream'),
-                                'data': attachment.get('contentBytes', '')
-                            })
-
-                    message = {
-                        'id': msg['id'],
-                        'subject': msg.get('subject', 'No Subject'),
-                        'sender': msg.get('from', {}).get('emailAddress', {}).get('address', 'Unknown Sender'),
-                        'preview': msg.get('bodyPreview', '')[:200],
-                        'date': msg['receivedDateTime'],
-                        'content': msg.get('body', {}).get('content', ''),
-                        'hasHtml': msg.get('body', {}).get('contentType', '') == 'html',
-                        'read': msg.get('isRead', False),
-                        'starred': msg.get('flag', {}).get('flagStatus', '') == 'flagged',
-                        'recipientEmail': account.email if hasattr(account, 'email') else account.get('email', ''),
-                        'attachments': attachments
-                    }
-                    messages.append(message)
+                            attachments.append(MessageAttachment(
+                                filename=attachment['name'],
+                                mime_type=attachment.get('contentType', 'application/octet-stream'),
+                                id=attachment['id'],
+                                # Standard base64 from Graph; written back as base64 in the response
+                                data=base64.b64decode(attachment.get('contentBytes', ''))
+                            ))
+
+                    account_email = account.email if hasattr(account, 'email') else account.get('email', '')
+                    messages.append(Message(
+                        id=msg['id'],
+                        account_id=account.account_id if hasattr(account, 'account_id') else account.get('account_id'),
+                        subject=msg.get('subject', 'No Subject'),
+                        sender=MessageRecipient.from_graph(msg.get('from'), default='Unknown Sender'),
+                        recipient=MessageRecipient(address=account_email, display=account_email),
+                        preview=msg.get('bodyPreview', '')[:200],
+                        date=msg['receivedDateTime'],
+                        timestamp=epoch_ms_from_iso(msg['receivedDateTime']),
+                        content=msg.get('body', {}).get('content', ''),
+                        has_html=msg.get('body', {}).get('contentType', '') == 'html',
+                        read=msg.get('isRead', False),
+                        starred=msg.get('flag', {}).get('flagStatus', '') == 'flagged',
+                        attachments=attachments
+                    ))
                 
-                # Calculate next page token
-                next_token = None
-                total_count = messages_data.get('@odata.count', len(messages))
-                if skip_value + page_size < total_count:
-                    next_token = str(skip_value + page_size)
+                next_link = messages_data.get('@odata.nextLink')
+                next_token = encode_cursor(next_link) if next_link else None
                 
                 return {
                     'messages': messages,
@@ -2,6 +2,7 @@ import os
 from datetime import datetime, timedelta
 import aiohttp
 from config.gmail_config import GMAIL_CONFIG
+from services.provider_client import provider_client
 
 class GmailService:
     @staticmethod
@@ -45,7 +46,8 @@ class GmailService:
     async def get_user_email(access_token):
         """Get user's email address using the access token"""
         async with aiohttp.ClientSession() as session:
-            async with session.get(
+            async with provider_client.get(
+                session,
                 'https://www.googleapis.com/oauth2/v2/userinfo',
                 headers={'Authorization': f'Bearer {access_token}'}
             ) as response:
@@ -59,7 +61,8 @@ class GmailService:
     async def get_emails(access_token):
         """Get user's emails using the access token"""
         async with aiohttp.ClientSession() as session:
-            async with session.get(
+            async with provider_client.get(
+                session,
                 'https://www.googleapis.com/gmail/v1/users/me/messages',
                 headers={'Authorization': f'Bearer {access_token}'}
             ) as response:
@@ -0,0 +1,38 @@
+from typing import Optional
+
+import aiohttp
+
+from config.app_config import APP_CONFIG
+from utils.lifecycle import on_shutdown, on_startup
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    The worker's shared aiohttp session. One connection pool per process
+    instead of one per service, so keep-alive connections to Gmail and
+    Graph are reused across services and closed cleanly at shutdown.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=APP_CONFIG['HTTP_CONNECTION_LIMIT'],
+                ttl_dns_cache=300
+            )
+        )
+    return _session
+
+
+@on_startup
+async def open_http_session() -> None:
+    await get_http_session()
+
+
+@on_shutdown
+async def close_http_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,107 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config.app_config import APP_CONFIG
+from utils.listing_page import is_complete_page
+from utils.lru_cache import LRUCache
+
+PageFetch = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class InboxPrefetchService:
+    """
+    Speculative fetch of the inbox page a user is most likely to open next.
+
+    After a page is served, the page behind its nextPageToken is fetched in
+    the background and kept for INBOX_PREFETCH_TTL seconds, so "next page"
+    is answered without waiting on the providers. Each user has at most
+    INBOX_PREFETCH_PER_USER prefetches in flight; any navigation cancels the
+    ones that were not asked for, and a mutating request drops them all.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_per_user: Optional[int] = None, max_entries: int = 256):
+        self.max_per_user = max_per_user if max_per_user is not None else APP_CONFIG['INBOX_PREFETCH_PER_USER']
+        self._pages = LRUCache(
+            max_entries=max_entries,
+            ttl=ttl if ttl is not None else APP_CONFIG['INBOX_PREFETCH_TTL']
+        )
+        # user_id -> {page key: task}
+        self._pending: Dict[int, Dict[Hashable, asyncio.Task]] = {}
+        self._generations: Dict[int, int] = {}
+
+    def _cache_key(self, user_id: int, key: Hashable):
+        return (user_id, self._generations.get(user_id, 0), key)
+
+    async def take(self, user_id: int, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        The prefetched page for `key`, waiting for it if it is still in
+        flight; None if it was not prefetched. Other pending prefetches of
+        the user are cancelled, since the user went somewhere else.
+        """
+        pending = self._pending.get(user_id, {})
+        task = pending.pop(key, None)
+        if not pending:
+            self._pending.pop(user_id, None)
+        self.cancel_user(user_id)
+
+        if task is not None:
+            try:
+                # Shielded so a dropped client connection does not waste the fetch
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                # Only swallow the prefetch being cancelled (invalidation), not this request
+                if not task.cancelled():
+                    raise
+                return None
+
+        cache_key = self._cache_key(user_id, key)
+        page = self._pages.get(cache_key)
+        if page is not None:
+            # One-shot: a page is reused once, later visits fetch fresh data
+            self._pages.delete(cache_key)
+        return page
+
+    def schedule(self, user_id: int, key: Hashable, fetch: PageFetch) -> None:
+        """Start fetching `key` in the background unless it is cached, pending or over budget"""
+        if self.max_per_user <= 0:
+            return
+        pending = self._pending.setdefault(user_id, {})
+        if key in pending or len(pending) >= self.max_per_user or self._cache_key(user_id, key) in self._pages:
+            return
+
+        task = asyncio.ensure_future(self._prefetch(self._cache_key(user_id, key), fetch))
+        pending[key] = task
+
+        def forget(_):
+            if pending.get(key) is task:
+                del pending[key]
+            if not pending and self._pending.get(user_id) is pending:
+                del self._pending[user_id]
+
+        task.add_done_callback(forget)
+
+    async def _prefetch(self, cache_key, fetch: PageFetch) -> None:
+        try:
+            page = await fetch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error prefetching inbox page {cache_key}: {str(e)}")
+            return
+        # Failed, empty or incomplete pages are not worth keeping
+        if page and page.get('messages') and is_complete_page(page):
+            self._pages.set(cache_key, page)
+
+    def cancel_user(self, user_id: int) -> None:
+        """Cancel every prefetch still in flight for the user"""
+        for task in list(self._pending.get(user_id, {}).values()):
+            task.cancel()
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop prefetched pages after the user changed their mailbox"""
+        self.cancel_user(user_id)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+# Shared instance so every request of a user sees the same prefetches
+inbox_prefetch_service = InboxPrefetchService()
@@ -0,0 +1,176 @@
+import base64
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import jwt
+
+from config.app_config import APP_CONFIG
+from services.base_service import BaseService
+from services.attachment_blob_store import AttachmentBlobStore, attachment_blob_store
+from services.provider_client import provider_client
+from utils.codec import decode_base64url
+
+INLINE_IMAGE_ROUTE = '/api/emails/inline'
+INLINE_TOKEN_SCOPE = 'inline_image'
+
+CID_SRC_PATTERN = re.compile(r'''(src=["'])cid:([^"']+)(["'])''', re.IGNORECASE)
+
+
+class InlineImageService(BaseService):
+    """Serves inline (cid:) message images through the API instead of data: URLs"""
+
+    def __init__(self, blob_store: Optional[AttachmentBlobStore] = None):
+        super().__init__()
+        self.blob_store = blob_store or attachment_blob_store
+
+    # --- URL building ---
+
+    @staticmethod
+    def create_access_token(user_id: int, account_id: int) -> str:
+        """
+        Create a token that lets <img> tags load inline images of one account.
+        Expiry is bucketed per day so URLs stay stable and browser caching works.
+        """
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        payload = {
+            'user_id': user_id,
+            'account_id': int(account_id),
+            'scope': INLINE_TOKEN_SCOPE,
+            'exp': int((today + timedelta(days=2)).timestamp())
+        }
+        # Own key: these URLs end up in email HTML and must never pass as session tokens
+        return jwt.encode(payload, APP_CONFIG['INLINE_IMAGE_SECRET'], algorithm='HS256')
+
+    @staticmethod
+    def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
+        """Return the token payload if it is a valid inline image token"""
+        try:
+            payload = jwt.decode(token, APP_CONFIG['INLINE_IMAGE_SECRET'], algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            return None
+        if payload.get('scope') != INLINE_TOKEN_SCOPE:
+            return None
+        return payload
+
+    def build_url(self, user_id: int, account_id: int, message_id: str, content_id: str, token: Optional[str] = None) -> str:
+        token = token or self.create_access_token(user_id, account_id)
+        return (
+            f"{APP_CONFIG['PUBLIC_URL']}{INLINE_IMAGE_ROUTE}/{account_id}/"
+            f"{quote(message_id, safe='')}/{quote(content_id, safe='')}?token={token}"
+        )
+
+    def url_resolver(self, user_id: int, account_id: int, message_id: str, token: Optional[str] = None) -> Callable[[str], str]:
+        """Return a cid -> URL function for one message, signing the token once"""
+        token = token or self.create_access_token(user_id, account_id)
+        return lambda content_id: self.build_url(user_id, account_id, message_id, content_id.strip('<>'), token)
+
+    def rewrite_cid_references(self, content: str, user_id: int, account_id: int, message_id: str) -> str:
+        """Point every `src="cid:..."` reference in the content at the inline image endpoint"""
+        if not content or 'cid:' not in content:
+            return content
+        resolve = self.url_resolver(user_id, account_id, message_id)
+        return CID_SRC_PATTERN.sub(lambda m: f"{m.group(1)}{resolve(m.group(2))}{m.group(3)}", content)
+
+    # --- Image fetching ---
+
+    async def get_image(self, session, account, message_id: str, content_id: str) -> Optional[Tuple[bytes, str]]:
+        """Return (image bytes, mime type) for an inline image, fetching it from the provider if needed"""
+        account_id = account.account_id if hasattr(account, 'account_id') else account['account_id']
+        account_type = account.account_type if hasattr(account, 'account_type') else account['account_type']
+        access_token = account.access_token if hasattr(account, 'access_token') else account['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+
+        async def fetch():
+            if account_type == 'gmail':
+                return await self._fetch_gmail_image(session, headers, message_id, content_id)
+            if account_type == 'outlook':
+                return await self._fetch_outlook_image(session, headers, message_id, content_id)
+            return None
+
+        # Served from the blob store after the first request, without any provider call
+        blob = await self.blob_store.get_or_fetch(account_id, message_id, f"cid:{content_id}", fetch)
+        if not blob:
+            return None
+        return bytes(blob.data), blob.mime_type or 'application/octet-stream'
+
+    @staticmethod
+    def _part_content_id(part: Dict[str, Any]) -> str:
+        if part.get('contentId'):
+            return part['contentId'].strip('<>')
+        return next(
+            (h['value'].strip().strip('<>') for h in part.get('headers', []) if h.get('name', '').lower() == 'content-id'),
+            ''
+        )
+
+    def _find_gmail_part(self, parts: List[Dict[str, Any]], content_id: str) -> Optional[Dict[str, Any]]:
+        for part in parts:
+            if self._part_content_id(part) == content_id:
+                return part
+            if 'parts' in part:
+                found = self._find_gmail_part(part['parts'], content_id)
+                if found:
+                    return found
+        return None
+
+    async def _fetch_gmail_image(self, session, headers, message_id: str, content_id: str) -> Optional[Tuple[bytes, str]]:
+        async with provider_client.get(
+            session,
+            f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}',
+            headers=headers,
+            params={'format': 'full', 'fields': 'payload'}
+        ) as response:
+            if response.status != 200:
+                print(f"Error fetching Gmail message {message_id} for inline image: Status {response.status}")
+                return None
+            message_data = await response.json()
+
+        payload = message_data.get('payload', {})
+        part = self._find_gmail_part([payload], content_id)
+        if not part:
+            return None
+
+        mime_type = part.get('mimeType', 'application/octet-stream')
+        body = part.get('body', {})
+        if body.get('data'):
+            return decode_base64url(body['data']), mime_type
+
+        if body.get('attachmentId'):
+            async with provider_client.get(
+                session,
+                f"https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}/attachments/{body['attachmentId']}",
+                headers=headers
+            ) as response:
+                if response.status != 200:
+                    print(f"Error fetching Gmail inline attachment for {message_id}: Status {response.status}")
+                    return None
+                attachment_data = await response.json()
+            return decode_base64url(attachment_data.get('data', '')), mime_type
+
+        return None
+
+    async def _fetch_outlook_image(self, session, headers, message_id: str, content_id: str) -> Optional[Tuple[bytes, str]]:
+        async with provider_client.get(
+            session,
+            f'https://graph.microsoft.com/v1.0/me/messages/{message_id}/attachments',
+            headers=headers
+        ) as response:
+            if response.status != 200:
+                print(f"Error fetching Outlook attachments for {message_id}: Status {response.status}")
+                return None
+            data = await response.json()
+
+        for attachment in data.get('value', []):
+            attachment_cid = (attachment.get('contentId') or '').strip('<>')
+            if attachment_cid == content_id or attachment.get('name') == content_id:
+                content_bytes = attachment.get('contentBytes')
+                if not content_bytes:
+                    return None
+                return base64.b64decode(content_bytes), attachment.get('contentType', 'application/octet-stream')
+
+        return None
+
+
+# Shared instance so every service signs inline image URLs the same way
+inline_image_service = InlineImageService()
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from config.app_config import APP_CONFIG
+from services.provider_client import provider_client
+from services.shared_cache_service import MAILBOX_CHANGED, shared_cache
+from utils.lru_cache import LRUCache
+
+
+class MessageCountService:
+    """
+    Per-account message counts used for pagination metadata (totalCount).
+
+    Counts are cached for MESSAGE_COUNT_TTL seconds. After that the stale
+    value is still returned while one background task refreshes it, so a
+    page never waits on a count request once the account has been counted.
+    Mutations (delete, restore) invalidate an account's counts.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else APP_CONFIG['MESSAGE_COUNT_TTL']
+        # key -> (count, fetched_at)
+        self._counts = LRUCache(max_entries=4096)
+        self._refreshing: Dict[tuple, asyncio.Task] = {}
+
+    def invalidate(self, account_id: int) -> None:
+        """Forget cached counts of an account, e.g. after messages were moved or deleted"""
+        for folder in ('inbox', 'sentitems', 'deleteditems'):
+            self._counts.delete(('outlook', account_id, folder))
+
+    async def _get(self, key: tuple, fetch: Callable[[], Awaitable[Optional[int]]]) -> Optional[int]:
+        cached = self._counts.get(key)
+        if cached is None:
+            return await self._refresh(key, fetch)
+        count, fetched_at = cached
+        if time.monotonic() - fetched_at > self.ttl and key not in self._refreshing:
+            task = asyncio.ensure_future(self._refresh(key, fetch))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return count
+
+    async def _refresh(self, key: tuple, fetch: Callable[[], Awaitable[Optional[int]]]) -> Optional[int]:
+        try:
+            count = await fetch()
+        except Exception as e:
+            print(f"Error refreshing message count {key}: {str(e)}")
+            return None
+        if count is not None:
+            self._counts.set(key, (count, time.monotonic()))
+        return count
+
+    async def get_outlook_folder_total(self, session, headers, account_id: int, folder: str = 'inbox') -> Optional[int]:
+        """totalItemCount of an Outlook mail folder, or None if Graph could not be asked"""
+        async def fetch():
+            async with provider_client.get(
+                session,
+                f'https://graph.microsoft.com/v1.0/me/mailFolders/{folder}',
+                headers=headers,
+                params={'$select': 'totalItemCount'}
+            ) as response:
+                if response.status != 200:
+                    print(f"Error fetching Outlook folder count for account {account_id}: Status {response.status}")
+                    return None
+                data = await response.json()
+            return data.get('totalItemCount', 0)
+
+        return await self._get(('outlook', account_id, folder), fetch)
+
+
+# Shared instance so every service reads the same cached counts
+message_count_service = MessageCountService()
+# A mailbox changed in any worker: drop the counts this worker holds for it
+shared_cache.subscribe(MAILBOX_CHANGED, lambda payload: message_count_service.invalidate(payload['account_id']))
@@ -1,15 +1,48 @@
 import aiohttp
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 import traceback
 import asyncio
-from bs4 import BeautifulSoup
-import base64
 import re
+from yarl import URL
 
 from services.base_service import BaseService
 from services.authentication_service import AuthenticationService
 from repositories.mail_account_repository import MailAccountRepository
+from models.message import Message, MessageAttachment, MessageRecipient
+from services.attachment_blob_store import attachment_blob_store
+from services.inbox_prefetch_service import inbox_prefetch_service
+from services.message_count_service import message_count_service
+from services.provider_breaker_service import provider_breakers
+from services.provider_client import ProviderHTTPError, provider_client
+from services.inline_image_service import inline_image_service
+from config.app_config import APP_CONFIG
+from utils.circuit_breaker import is_upstream_failure
+from utils.codec import decode_base64url, decode_base64url_text
+from utils.deadline import NO_DEADLINE, Deadline
+from utils.fan_out import as_finished
+from utils.field_projection import ALL_FIELDS, FieldSelection
+from utils.page_token import decode_cursor, encode_cursor
+from utils.timestamps import epoch_ms_from_header, epoch_ms_from_internal_date, epoch_ms_from_iso
+from utils.top_n import TopN
+
+# Outlook listings expand attachment metadata only; bytes come from the blob store
+OUTLOOK_ATTACHMENT_FIELDS = 'id,name,contentType,size,isInline'
+
+# Graph properties behind each inbox field; receivedDateTime is always needed for sorting
+OUTLOOK_INBOX_PROPERTIES = {
+    'id': 'id',
+    'subject': 'subject',
+    'sender': 'from',
+    'preview': 'bodyPreview',
+    'content': 'body',
+    'hasHtml': 'body',
+    'read': 'isRead',
+    'starred': 'flag',
+}
+
+# Gmail headers read for metadata-only requests
+GMAIL_METADATA_HEADERS = ['Subject', 'From', 'Date', 'Delivered-To', 'To']
 
 class MessageService(BaseService):
     """Service responsible for email message operations"""
@@ -86,8 +119,144 @@ class MessageService(BaseService):
             print(f"Error in _ensure_valid_token: {str(e)}")
             return False
     
-    async def get_inbox_messages(self, user_id: int, account_id: str = None, page_token: str = None, page_size: int = 50) -> Dict[str, Any]:
-        """Get inbox messages for a user"""
+    async def get_inbox_messages(self, user_id: int, account_id: str = None, page_token: str = None, page_size: int = 50, fields: Optional[FieldSelection] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Get inbox messages for a user, limited to the selected fields, and prefetch the next page"""
+        fields = fields or ALL_FIELDS
+        result = await inbox_prefetch_service.take(user_id, self._inbox_page_key(account_id, page_token, page_size, fields))
+        if result is None:
+            result = await self._fetch_inbox_page(user_id, account_id, page_token, page_size, fields, deadline or NO_DEADLINE)
+
+        next_page_token = result.get('nextPageToken')
+        if next_page_token:
+            inbox_prefetch_service.schedule(
+                user_id,
+                self._inbox_page_key(account_id, next_page_token, page_size, fields),
+                lambda: self._fetch_inbox_page(user_id, account_id, next_page_token, page_size, fields, Deadline(APP_CONFIG['UPSTREAM_DEADLINE']))
+            )
+        return result
+
+    async def stream_inbox_messages(self, user_id: int, account_id: str = None, page_token: str = None, page_size: int = 50, fields: Optional[FieldSelection] = None, deadline: Optional[Deadline] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Inbox page as a stream of events. In all-accounts mode every account
+        is fetched concurrently and a 'messages' event is yielded as soon as
+        one finishes, so the first messages arrive with the fastest account.
+        A final 'done' event carries the merged page order ([accountId, id]
+        pairs, newest first) and the usual pagination fields. An account that
+        fails gets an 'error' event and is listed in unavailableAccounts.
+        """
+        fields = fields or ALL_FIELDS
+        deadline = deadline or NO_DEADLINE
+
+        if account_id:
+            # Single account pages come from one provider call anyway
+            result = await self.get_inbox_messages(user_id, account_id, page_token, page_size, fields, deadline)
+            messages = result.pop('messages')
+            # Same id type as the all-accounts events
+            stream_account_id = int(account_id) if account_id.isdigit() else account_id
+            yield {'type': 'messages', 'accountId': stream_account_id, 'messages': messages}
+            yield {'type': 'done', 'order': [[stream_account_id, message.get('id')] for message in messages], **result}
+            return
+
+        try:
+            current_page = max(int(page_token), 1) if page_token else 1
+        except ValueError:
+            current_page = 1
+        offset = (current_page - 1) * page_size
+        fetch_size_per_account = max(page_size * 3, 100)
+        one_year_ago = (datetime.now() - timedelta(days=730)).strftime('%Y/%m/%d')
+
+        try:
+            accounts = await self.mail_account_repository.get_user_accounts(user_id)
+            session = await self.get_aiohttp_session()
+        except Exception as e:
+            print(f"Error in stream_inbox_messages: {str(e)}")
+            print(traceback.format_exc())
+            yield {'type': 'done', 'order': [], 'nextPageToken': None, 'totalCount': 0, 'currentPage': 1, 'error': 'Inbox could not be loaded'}
+            return
+
+        end_idx = offset + page_size
+        estimated_total_count = 0
+        top_messages = TopN(end_idx, key=lambda message: message.timestamp)
+        partial_accounts, timed_out_accounts, unavailable_accounts = [], [], []
+
+        async def fetch_account(account):
+            try:
+                messages, account_total, status = await self._fetch_account_inbox(session, account, user_id, fetch_size_per_account, one_year_ago, fields, deadline)
+                return account, messages, account_total, status, None
+            except Exception as e:
+                print(f"Error streaming messages for account {account.email}: {str(e)}")
+                print(traceback.format_exc())
+                return account, [], 0, 'unavailable', e
+
+        pending = {asyncio.ensure_future(fetch_account(account)) for account in accounts or []}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Accounts whose messages are not merged yet, including the rest of this batch
+                unmerged = len(pending) + len(done)
+                for task in done:
+                    unmerged -= 1
+                    account, messages, account_total, status, error = task.result()
+                    if error is not None:
+                        unavailable_accounts.append(account.account_id)
+                        yield {'type': 'error', 'accountId': account.account_id, 'error': 'Account could not be loaded', 'details': str(error)}
+                        continue
+                    estimated_total_count += account_total
+                    top_messages.extend(messages)
+                    if status == 'timeout':
+                        timed_out_accounts.append(account.account_id)
+                    elif status == 'partial':
+                        partial_accounts.append(account.account_id)
+                    elif status == 'unavailable':
+                        unavailable_accounts.append(account.account_id)
+
+                    # Merged ranks only grow as accounts arrive, and each unmerged account can
+                    # push a message down by at most min(fetch size, end_idx) places. Only
+                    # this account's messages whose rank can still end up in [offset, end_idx)
+                    # are sent; the 'done' order settles the final page.
+                    lowest_rank = offset - unmerged * min(fetch_size_per_account, end_idx)
+                    page_messages = [
+                        message for rank, message in enumerate(top_messages.results())
+                        if rank >= lowest_rank and message.account_id == account.account_id
+                    ]
+                    yield {
+                        'type': 'messages',
+                        'accountId': account.account_id,
+                        'status': status or 'complete',
+                        'messages': [message.to_dict(fields) for message in page_messages]
+                    }
+        finally:
+            # The client went away or the generator was closed early
+            for task in pending:
+                task.cancel()
+
+        fetched_count = top_messages.seen
+        total_count = max(estimated_total_count, fetched_count)
+        next_page_token = None
+        if end_idx < fetched_count or fetched_count < total_count:
+            next_page_token = str(current_page + 1)
+
+        yield {
+            'type': 'done',
+            'order': [[message.account_id, message.id] for message in top_messages.page(offset)],
+            'nextPageToken': next_page_token,
+            'totalCount': total_count,
+            'currentPage': current_page,
+            'partialAccounts': partial_accounts,
+            'timedOutAccounts': timed_out_accounts,
+            'unavailableAccounts': unavailable_accounts
+        }
+
+    @staticmethod
+    def _inbox_page_key(account_id: Optional[str], page_token: Optional[str], page_size: int, fields: FieldSelection):
+        return (account_id, page_token, page_size, fields.fields)
+
+    async def _fetch_inbox_page(self, user_id: int, account_id: Optional[str], page_token: Optional[str], page_size: int, fields: FieldSelection, deadline: Deadline) -> Dict[str, Any]:
+        """
+        Fetch one inbox page from the providers within the deadline. Accounts
+        that ran out of time are listed in partialAccounts (some messages
+        made it) or timedOutAccounts (none did).
+        """
         try:
             # Get user's mail accounts
             accounts = await self.mail_account_repository.get_user_accounts(user_id)
@@ -107,6 +276,7 @@ class MessageService(BaseService):
                 try:
                     if account_id:
                         # Single account: token format is "account_id:actual_token:page_number"
+                        # (actual_token is Gmail's pageToken or an encoded Graph nextLink)
                         token_parts = page_token.split(':')
                         if len(token_parts) == 3:
                             token_account_id, actual_token, page_number = token_parts
@@ -135,6 +305,7 @@ class MessageService(BaseService):
             all_messages = []
             next_page_token = None
             total_count = 0
+            partial_accounts, timed_out_accounts, unavailable_accounts = [], [], []
             session = await self.get_aiohttp_session()
             
             # Get date 2 years ago
@@ -144,10 +315,15 @@ class MessageService(BaseService):
             if account_id:
                 for account in accounts:
                     account_dict = account.to_dict()
+                    fetched_before = len(all_messages)
+                    if not provider_breakers.allow(account.account_type, account.account_id):
+                        unavailable_accounts.append(account.account_id)
+                        continue
                     if account.account_type == 'gmail':
                         try:
                             # Validate token
-                            if not await self._ensure_valid_token(account_dict):
+                            if not await deadline.run(self._ensure_valid_token(account_dict)):
+                                provider_breakers.release(account.account_type, account.account_id)
                                 continue
 
                             headers = {
@@ -164,51 +340,65 @@ class MessageService(BaseService):
                             if page_token:
                                 params['pageToken'] = page_token
 
-                            async with session.get(
+                            async with provider_client.get(
+                                session,
                                 'https://gmail.googleapis.com/gmail/v1/users/me/messages',
                                 headers=headers,
-                                params=params
+                                params=params,
+                                deadline=deadline
                             ) as messages_response:
                                 messages_response.raise_for_status()
                                 messages_data = await messages_response.json()
                                 
-                                if messages_data.get('nextPageToken'):
-                                    # Format: "account_id:actual_token:page_number"
-                                    next_page_token = f"{account.account_id}:{messages_data['nextPageToken']}:{current_page + 1}"
-                                
-                                total_count += messages_data.get('resultSizeEstimate', 0)
-                                
-                                # Get details for each message concurrently
-                                message_tasks = []
-                                for message in messages_data.get('messages', []):
-                                    task = self.get_message_details(session, headers, message['id'], account.email)
-                                    message_tasks.append(task)
+                            if messages_data.get('nextPageToken'):
+                                # Format: "account_id:actual_token:page_number"
+                                next_page_token = f"{account.account_id}:{messages_data['nextPageToken']}:{current_page + 1}"
+                            
+                            total_count += messages_data.get('resultSizeEstimate', 0)
+                            
+                            # Get details in larger batches for better performance; whatever
+                            # arrived before the deadline is returned
+                            message_ids = [message['id'] for message in messages_data.get('messages', [])]
+                            batch_size = 10  # Increased from 5 to 10
+                            detail_errors = []
+                            
+                            for i in range(0, len(message_ids), batch_size):
+                                batch = [
+                                    self.get_message_details(session, headers, message_id, account.email, account.account_id, user_id, fields)
+                                    for message_id in message_ids[i:i + batch_size]
+                                ]
+                                batch_results = await deadline.run(asyncio.gather(*batch, return_exceptions=True))
                                 
-                                # Process messages in larger batches for better performance
-                                batch_size = 10  # Increased from 5 to 10
-                                messages = []
+                                for result in batch_results:
+                                    if isinstance(result, Exception):
+                                        detail_errors.append(result)
+                                    elif result is not None:
+                                        all_messages.append(result)
                                 
-                                for i in range(0, len(message_tasks), batch_size):
-                                    batch = message_tasks[i:i + batch_size]
-                                    batch_results = await asyncio.gather(*batch, return_exceptions=True)
-                                    
-                                    for result in batch_results:
-                                        if result is not None and not isinstance(result, Exception):
-                                            messages.append(result)
-                                    
-                                    # Reduced delay between batches
-                                    if i + batch_size < len(message_tasks):
-                                        await asyncio.sleep(0.1)  # Reduced from 0.5 to 0.1
-                                
-                                all_messages.extend(messages)
+                                # Reduced delay between batches
+                                if i + batch_size < len(message_ids):
+                                    await asyncio.sleep(0.1)  # Reduced from 0.5 to 0.1
+
+                            # The listing worked but every messages.get failed: the detail endpoint is down
+                            if detail_errors and len(all_messages) == fetched_before:
+                                raise detail_errors[0]
+
+                            provider_breakers.record_success(account.account_type, account.account_id)
                                 
+                        except asyncio.TimeoutError as e:
+                            print(f"Deadline exceeded fetching messages for account {account.email}")
+                            provider_breakers.record_failure(account.account_type, account.account_id, e)
+                            (partial_accounts if len(all_messages) > fetched_before else timed_out_accounts).append(account.account_id)
                         except Exception as e:
                             print(f"Error fetching messages for account {account.email}: {str(e)}")
+                            provider_breakers.record_failure(account.account_type, account.account_id, e)
+                            unavailable_accounts.append(account.account_id)
                             continue
                     elif account.account_type == 'outlook':
                         try:
                             # Validate token
-                            if not await self._ensure_valid_token(account_dict):
+                            if not await deadline.run(self._ensure_valid_token(account_dict)):
+                                provider_breakers.release(account.account_type, account.account_id)
                                 continue
 
                             headers = {
@@ -216,74 +406,50 @@ class MessageService(BaseService):
                                 'Content-Type': 'application/json'
                             }
                             
-                            # Calculate skip value for Outlook pagination
-                            skip_value = (current_page - 1) * page_size if page_token else 0
-                            
-                            # Outlook API endpoint with attachment info and date filter
-                            params = {
-                                '$top': page_size,
-                                '$orderby': 'receivedDateTime desc',
-                                '$expand': 'attachments',
-                                '$count': 'true',
-                                '$filter': f"receivedDateTime ge {one_year_ago.replace('/', '-')}T00:00:00Z",
-                                '$skip': skip_value
-                            }
+                            # Later pages follow Graph's @odata.nextLink cursor instead of a growing $skip
+                            next_link = decode_cursor(page_token) if page_token else None
+                            if next_link:
+                                url, params = URL(next_link, encoded=True), None
+                            else:
+                                # Outlook API endpoint with attachment info and date filter
+                                url = 'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages'
+                                params = {
+                                    '$top': page_size,
+                                    '$orderby': 'receivedDateTime desc',
+                                    '$filter': f"receivedDateTime ge {one_year_ago.replace('/', '-')}T00:00:00Z"
+                                }
+                                params.update(self._outlook_projection_params(fields))
 
                             # Get messages from the inbox folder only
-                            async with session.get(
-                                'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages',
-                                headers=headers,
-                                params=params
-                            ) as messages_response:
+                            async with provider_client.get(session, url, headers=headers, params=params, deadline=deadline) as messages_response:
                                 messages_response.raise_for_status()
                                 messages_data = await messages_response.json()
                                 
-                                # Get total count from Outlook API
-                                if '@odata.count' in messages_data:
-                                    total_count += messages_data['@odata.count']
-                                    
-                                    # Calculate if there are more pages
-                                    if skip_value + page_size < messages_data['@odata.count']:
-                                        # Format: "account_id:skip_value:page_number"
-                                        next_page_token = f"{account.account_id}:{skip_value + page_size}:{current_page + 1}"
-                                else:
-                                    messages_count = len(messages_data.get('value', []))
-                                    total_count += messages_count
-                                    
-                                    # If we got a full page, assume there might be more
-                                    if messages_count == page_size:
-                                        next_page_token = f"{account.account_id}:{skip_value + page_size}:{current_page + 1}"
-                                
-                                # Process Outlook messages
-                                for msg in messages_data.get('value', []):
-                                    # Process attachments
-                                    attachments = []
-                                    for attachment in msg.get('attachments', []):
-                                        if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment':
-                                            attachments.append({
-                                                'id': attachment['id'],
-                                                'filename': attachment['name'],
-                                                'mimeType': attachment.get('contentType', 'application/octet-stream'),
-                                                'data': attachment.get('contentBytes', '')
-                                            })
-
-                                    message = {
-                                        'id': msg['id'],
-                                        'subject': msg.get('subject', 'No Subject'),
-                                        'sender': msg.get('from', {}).get('emailAddress', {}).get('address', 'Unknown Sender'),
-                                        'preview': msg.get('bodyPreview', '')[:200],
-                                        'date': msg['receivedDateTime'],
-                                        'content': msg.get('body', {}).get('content', ''),
-                                        'hasHtml': msg.get('body', {}).get('contentType', '') == 'html',
-                                        'read': msg.get('isRead', False),
-                                        'starred': msg.get('flag', {}).get('flagStatus', '') == 'flagged',
-                                        'recipientEmail': account.email,
-                                        'attachments': attachments
-                                    }
-                                    all_messages.append(message)
+                            if messages_data.get('@odata.nextLink'):
+                                # Format: "account_id:opaque_cursor:page_number"
+                                next_page_token = f"{account.account_id}:{encode_cursor(messages_data['@odata.nextLink'])}:{current_page + 1}"
+                            
+                            # Folder total is cached, not recounted by Graph for every page
+                            folder_total = await deadline.run(message_count_service.get_outlook_folder_total(session, headers, account.account_id))
+                            total_count += folder_total if folder_total is not None else len(messages_data.get('value', []))
+                            
+                            # Process Outlook messages
+                            for msg in messages_data.get('value', []):
+                                # Process attachments
+                                attachments = await deadline.run(self._get_outlook_attachments(session, headers, account.account_id, msg)) if fields.wants('attachments') else []
+
+                                all_messages.append(self._outlook_message(msg, account, user_id, attachments))
+
+                            provider_breakers.record_success(account.account_type, account.account_id)
                                     
+                        except asyncio.TimeoutError as e:
+                            print(f"Deadline exceeded fetching messages for account {account.email}")
+                            provider_breakers.record_failure(account.account_type, account.account_id, e)
+                            (partial_accounts if len(all_messages) > fetched_before else timed_out_accounts).append(account.account_id)
                         except Exception as e:
                             print(f"Error fetching messages for account {account.email}: {str(e)}")
+                            provider_breakers.record_failure(account.account_type, account.account_id, e)
+                            unavailable_accounts.append(account.account_id)
                             continue
             else:
                 # All accounts selected - improved logic for proper pagination and sorting
@@ -296,225 +462,174 @@ class MessageService(BaseService):
                 
                 # Track total count across all accounts
                 estimated_total_count = 0
-                
-                for account in accounts:
-                    account_dict = account.to_dict()
-                    if account.account_type == 'gmail':
-                        try:
-                            # Validate token
-                            if not await self._ensure_valid_token(account_dict):
-                                continue
-
-                            headers = {
-                                'Authorization': f'Bearer {account_dict["access_token"]}',
-                                'Content-Type': 'application/json'
-                            }
-                            
-                            # First, get the total count estimate
-                            count_params = {
-                                'maxResults': 1,
-                                'q': f'in:inbox -from:me after:{one_year_ago}',
-                            }
-                            
-                            async with session.get(
-                                'https://gmail.googleapis.com/gmail/v1/users/me/messages',
-                                headers=headers,
-                                params=count_params
-                            ) as count_response:
-                                count_response.raise_for_status()
-                                count_data = await count_response.json()
-                                estimated_total_count += count_data.get('resultSizeEstimate', 0)
-                            
-                            # List messages in inbox with date filter - fetch more for proper sorting
-                            params = {
-                                'maxResults': min(fetch_size_per_account, 100),  # Increased limit
-                                'q': f'in:inbox -from:me after:{one_year_ago}',  # Only show received emails from last year
-                                'orderBy': 'desc'  # Sort by date descending (newest first)
-                            }
-
-                            async with session.get(
-                                'https://gmail.googleapis.com/gmail/v1/users/me/messages',
-                                headers=headers,
-                                params=params
-                            ) as messages_response:
-                                messages_response.raise_for_status()
-                                messages_data = await messages_response.json()
-                                
-                                # Get details for each message concurrently
-                                message_tasks = []
-                                for message in messages_data.get('messages', []):
-                                    task = self.get_message_details(session, headers, message['id'], account.email)
-                                    message_tasks.append(task)
-                                
-                                # Process messages in batches
-                                batch_size = 10
-                                messages = []
-                                
-                                for i in range(0, len(message_tasks), batch_size):
-                                    batch = message_tasks[i:i + batch_size]
-                                    batch_results = await asyncio.gather(*batch, return_exceptions=True)
-                                    
-                                    for result in batch_results:
-                                        if result is not None and not isinstance(result, Exception):
-                                            messages.append(result)
-                                    
-                                    if i + batch_size < len(message_tasks):
-                                        await asyncio.sleep(0.1)
-                                
-                                all_messages.extend(messages)
-                                
-                        except Exception as e:
-                            print(f"Error fetching messages for account {account.email}: {str(e)}")
-                            continue
-                    elif account.account_type == 'outlook':
-                        try:
-                            # Validate token
-                            if not await self._ensure_valid_token(account_dict):
-                                continue
-
-                            headers = {
-                                'Authorization': f'Bearer {account_dict["access_token"]}',
-                                'Content-Type': 'application/json'
-                            }
-                            
-                            # Outlook API endpoint with attachment info and date filter
-                            params = {
-                                '$top': fetch_size_per_account,  # Fetch more messages
-                                '$orderby': 'receivedDateTime desc',
-                                '$expand': 'attachments',
-                                '$count': 'true',
-                                '$filter': f"receivedDateTime ge {one_year_ago.replace('/', '-')}T00:00:00Z"
-                            }
 
-                            # Get messages from the inbox folder only
-                            async with session.get(
-                                'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages',
-                                headers=headers,
-                                params=params
-                            ) as messages_response:
-                                messages_response.raise_for_status()
-                                messages_data = await messages_response.json()
-                                
-                                # Get total count from Outlook API
-                                if '@odata.count' in messages_data:
-                                    estimated_total_count += messages_data['@odata.count']
-                                else:
-                                    estimated_total_count += len(messages_data.get('value', []))
-                                
-                                # Process Outlook messages
-                                for msg in messages_data.get('value', []):
-                                    # Process attachments
-                                    attachments = []
-                                    for attachment in msg.get('attachments', []):
-                                        if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment':
-                                            attachments.append({
-                                                'id': attachment['id'],
-                                                'filename': attachment['name'],
-                                                'mimeType': attachment.get('contentType', 'application/octet-stream'),
-                                                'data': attachment.get('contentBytes', '')
-                                            })
-
-                                    message = {
-                                        'id': msg['id'],
-                                        'subject': msg.get('subject', 'No Subject'),
-                                        'sender': msg.get('from', {}).get('emailAddress', {}).get('address', 'Unknown Sender'),
-                                        'preview': msg.get('bodyPreview', '')[:200],
-                                        'date': msg['receivedDateTime'],
-                                        'content': msg.get('body', {}).get('content', ''),
-                                        'hasHtml': msg.get('body', {}).get('contentType', '') == 'html',
-                                        'read': msg.get('isRead', False),
-                                        'starred': msg.get('flag', {}).get('flagStatus', '') == 'flagged',
-                                        'recipientEmail': account.email,
-                                        'attachments': attachments
-                                    }
-                                    all_messages.append(message)
-                                    
-                        except Exception as e:
-                            print(f"Error fetching messages for account {account.email}: {str(e)}")
-                            continue
+                # Only the newest offset + page_size messages are kept while accounts are merged
+                top_messages = TopN(offset + page_size, key=lambda message: message.timestamp)
+                
+                async def fetch_account(account):
+                    return account, await self._fetch_account_inbox(session, account, user_id, fetch_size_per_account, one_year_ago, fields, deadline)
 
-                # Sort all messages by date (newest first) - improved date parsing
-                def parse_date_safely(date_str):
-                    try:
-                        if not date_str:
-                            return datetime.min.replace(tzinfo=timezone.utc)
-                        
-                        # Clean up the date string
-                        date_str = date_str.strip()
-                        
-                        # First try RFC 2822 format (Gmail format) - most common
-                        try:
-                            from email.utils import parsedate_to_datetime
-                            parsed_dt = parsedate_to_datetime(date_str)
-                            # Ensure timezone-aware
-                            if parsed_dt.tzinfo is None:
-                                parsed_dt = parsed_dt.replace(tzinfo=timezone.utc)
-                            return parsed_dt
-                        except:
-                            pass
-                        
-                        # Then try ISO format (Outlook format)
-                        try:
-                            # Handle various ISO formats
-                            if date_str.endswith('Z'):
-                                return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                            elif '+' in date_str[-6:] or '-' in date_str[-6:]:
-                                return datetime.fromisoformat(date_str)
-                            else:
-                                # Assume UTC if no timezone info
-                                dt = datetime.fromisoformat(date_str)
-                                return dt.replace(tzinfo=timezone.utc)
-                        except:
-                            pass
-                        
-                        # Fallback: try general parsing
-                        try:
-                            from dateutil.parser import parse
-                            parsed_dt = parse(date_str)
-                            # Ensure timezone-aware
-                            if parsed_dt.tzinfo is None:
-                                parsed_dt = parsed_dt.replace(tzinfo=timezone.utc)
-                            return parsed_dt
-                        except:
-                            print(f"Error parsing date '{date_str}': Unable to parse")
-                            return datetime.min.replace(tzinfo=timezone.utc)
-                            
-                    except Exception as e:
-                        print(f"Error parsing date '{date_str}': {str(e)}")
-                        return datetime.min.replace(tzinfo=timezone.utc)
+                # Accounts are fetched side by side under the same deadline, so a
+                # hung account costs the remaining time once, not per account.
+                # Each batch is merged as its account finishes and then dropped,
+                # instead of every account's batch being held until the slowest one.
+                async for account, (messages, account_total, status) in as_finished(fetch_account(account) for account in accounts):
+                    estimated_total_count += account_total
+                    top_messages.extend(messages)
+                    if status == 'timeout':
+                        timed_out_accounts.append(account.account_id)
+                    elif status == 'partial':
+                        partial_accounts.append(account.account_id)
+                    elif status == 'unavailable':
+                        unavailable_accounts.append(account.account_id)
 
-                all_messages.sort(key=lambda x: parse_date_safely(x.get('date', '')), reverse=True)
-                
-                # Apply pagination to the sorted messages
-                start_idx = offset
+                # Newest first; timestamps were parsed once at ingest
                 end_idx = offset + page_size
-                paginated_messages = all_messages[start_idx:end_idx]
+                fetched_count = top_messages.seen
                 
                 # Use the estimated total count from API calls, fallback to actual fetched count
-                total_count = max(estimated_total_count, len(all_messages))
-                if end_idx < len(all_messages):
+                total_count = max(estimated_total_count, fetched_count)
+                if end_idx < fetched_count:
                     next_page_token = str(current_page + 1)
-                elif len(all_messages) < total_count:
+                elif fetched_count < total_count:
                     # There might be more messages we haven't fetched yet
                     next_page_token = str(current_page + 1)
                 
-                # Update all_messages to the paginated subset
-                all_messages = paginated_messages
+                all_messages = top_messages.page(offset)
             
             return {
-                'messages': all_messages,
+                # Each record is turned into its response dict once, with only the selected fields
+                'messages': [message.to_dict(fields) for message in all_messages],
                 'nextPageToken': next_page_token,
                 'totalCount': total_count,
-                'currentPage': current_page
+                'currentPage': current_page,
+                'partialAccounts': partial_accounts,
+                'timedOutAccounts': timed_out_accounts,
+                # Failed upstream, or skipped because the provider or the account's circuit is open
+                'unavailableAccounts': unavailable_accounts
             }
             
         except Exception as e:
             print(f"Error in get_inbox_messages: {str(e)}")
             print(traceback.format_exc())
-            return {'messages': [], 'nextPageToken': None, 'totalCount': 0, 'currentPage': 1}
+            return {'messages': [], 'nextPageToken': None, 'totalCount': 0, 'currentPage': 1, 'error': 'Inbox could not be loaded'}
     
-    async def _process_message_parts(self, parts, content, attachments, headers, session, message_id, depth=0):
-        """Recursively process message parts to extract content and attachments"""
+    async def _fetch_account_inbox(self, session, account, user_id: int, fetch_size: int, one_year_ago: str, fields: FieldSelection, deadline: Deadline = NO_DEADLINE) -> Tuple[List[Message], int, Optional[str]]:
+        """
+        Newest inbox messages of one account for the all-accounts merge, the
+        account's estimated inbox total, and 'partial' or 'timeout' when the
+        deadline cut the fetch short, 'unavailable' when the provider failed
+        or a circuit breaker skipped it (None when it completed)
+        """
+        messages: List[Message] = []
+        estimated_total_count = 0
+        if not provider_breakers.allow(account.account_type, account.account_id):
+            return messages, estimated_total_count, 'unavailable'
+
+        account_dict = account.to_dict()
+        try:
+            # Validate token
+            if not await deadline.run(self._ensure_valid_token(account_dict)):
+                provider_breakers.release(account.account_type, account.account_id)
+                return messages, estimated_total_count, None
+
+            headers = {
+                'Authorization': f'Bearer {account_dict["access_token"]}',
+                'Content-Type': 'application/json'
+            }
+
+            if account.account_type == 'gmail':
+                # List messages in inbox with date filter - fetch more for proper sorting
+                params = {
+                    'maxResults': min(fetch_size, 100),  # Increased limit
+                    'q': f'in:inbox -from:me after:{one_year_ago}',  # Only show received emails from last year
+                    'orderBy': 'desc'  # Sort by date descending (newest first)
+                }
+
+                async with provider_client.get(
+                    session,
+                    'https://gmail.googleapis.com/gmail/v1/users/me/messages',
+                    headers=headers,
+                    params=params,
+                    deadline=deadline
+                ) as messages_response:
+                    messages_response.raise_for_status()
+                    messages_data = await messages_response.json()
+
+                # The listing carries the same estimate a separate maxResults=1 call would
+                estimated_total_count = messages_data.get('resultSizeEstimate', 0)
+
+                # Get details in concurrent batches; whatever arrived before the deadline is kept
+                message_ids = [message['id'] for message in messages_data.get('messages', [])]
+                batch_size = 10
+                detail_errors = []
+
+                for i in range(0, len(message_ids), batch_size):
+                    batch = [
+                        self.get_message_details(session, headers, message_id, account.email, account.account_id, user_id, fields)
+                        for message_id in message_ids[i:i + batch_size]
+                    ]
+                    batch_results = await deadline.run(asyncio.gather(*batch, return_exceptions=True))
+
+                    for result in batch_results:
+                        if isinstance(result, Exception):
+                            detail_errors.append(result)
+                        elif result is not None:
+                            messages.append(result)
+
+                    if i + batch_size < len(message_ids):
+                        await asyncio.sleep(0.1)
+
+                # The listing worked but every messages.get failed: the detail endpoint is down
+                if detail_errors and not messages:
+                    raise detail_errors[0]
+
+            elif account.account_type == 'outlook':
+                # Outlook API endpoint with attachment info and date filter
+                params = {
+                    '$top': fetch_size,  # Fetch more messages
+                    '$orderby': 'receivedDateTime desc',
+                    '$filter': f"receivedDateTime ge {one_year_ago.replace('/', '-')}T00:00:00Z"
+                }
+                params.update(self._outlook_projection_params(fields))
+
+                # Get messages from the inbox folder only
+                async with provider_client.get(
+                    session,
+                    'https://graph.microsoft.com/v1.0/me/mailFolders/inbox/messages',
+                    headers=headers,
+                    params=params,
+                    deadline=deadline
+                ) as messages_response:
+                    messages_response.raise_for_status()
+                    messages_data = await messages_response.json()
+
+                # Cached folder total instead of $count, which Graph computes on every page
+                folder_total = await deadline.run(message_count_service.get_outlook_folder_total(session, headers, account.account_id))
+                estimated_total_count = folder_total if folder_total is not None else len(messages_data.get('value', []))
+
+                # Process Outlook messages
+                for msg in messages_data.get('value', []):
+                    # Process attachments
+                    attachments = await deadline.run(self._get_outlook_attachments(session, headers, account.account_id, msg)) if fields.wants('attachments') else []
+
+                    messages.append(self._outlook_message(msg, account, user_id, attachments))
+
+            provider_breakers.record_success(account.account_type, account.account_id)
+
+        except asyncio.TimeoutError as e:
+            print(f"Deadline exceeded fetching messages for account {account.email}")
+            provider_breakers.record_failure(account.account_type, account.account_id, e)
+            return messages, estimated_total_count, 'partial' if messages else 'timeout'
+        except Exception as e:
+            print(f"Error fetching messages for account {account.email}: {str(e)}")
+            provider_breakers.record_failure(account.account_type, account.account_id, e)
+            return messages, estimated_total_count, 'unavailable'
+
+        return messages, estimated_total_count, None
+
+    async def _process_message_parts(self, parts, content, attachments, headers, session, message_id, account_id=None, depth=0, include_body=True, include_attachments=True):
+        """Recursively process message parts to extract content and attachments, skipping whichever is not needed"""
         if depth > 10:  # Prevent infinite recursion
             return content
 
@@ -529,72 +644,35 @@ class MessageService(BaseService):
             
             if mime_type.startswith('multipart/'):
                 if 'parts' in part:
-                    content = await self._process_message_parts(part['parts'], content, attachments, headers, session, message_id, depth + 1)
+                    content = await self._process_message_parts(
+                        part['parts'], content, attachments, headers, session, message_id, account_id, depth + 1,
+                        include_body, include_attachments
+                    )
             elif mime_type.startswith('text/'):
+                if not include_body:
+                    continue
                 part_content = self._decode_body(part.get('body', {}))
                 if part_content:
                     if mime_type == 'text/html':
                         content = part_content
                     elif not content:  # Only use plain text if we don't have HTML
                         content = part_content
+            elif not include_attachments:
+                continue
             elif mime_type.startswith('image/'):
                 # Resim parçasını işle
                 try:
-                    attachment = {
-                        'filename': part.get('filename', 'unnamed_attachment'),
-                        'mimeType': mime_type,
-                        'inline': bool(part.get('contentId')) or bool(part.get('contentDisposition', '').startswith('inline'))
-                    }
-                    
-                    # Resim verisini al
-                    if 'attachmentId' in part.get('body', {}):
-                        attachment['id'] = part['body']['attachmentId']
-                        async with session.get(
-                            f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}/attachments/{attachment["id"]}',
-                            headers=headers
-                        ) as response:
-                            if response.status == 200:
-                                attachment_data = await response.json()
-                                raw_data = attachment_data.get('data', '')
-                                
-                                # Base64 düzeltmeleri
-                                raw_data = raw_data.replace('-', '+').replace('_', '/')
-                                padding = len(raw_data) % 4
-                                if padding:
-                                    raw_data += '=' * (4 - padding)
-                                
-                                attachment['data'] = raw_data
-                                
-                                # Inline resim/GIF ise içeriğe ekle
-                                if attachment['inline']:
-                                    content_id = part.get('contentId', '').strip('<>')
-                                    if content_id:
-                                        # Debug için
-                                        print(f"Replacing CID: {content_id} with data URL")
-                                        # İçerikteki CID referansını bul ve değiştir
-                                        cid_pattern = f'cid:{content_id}'
-                                        data_url = f'data:{mime_type};base64,{raw_data}'
-                                        content = content.replace(cid_pattern, data_url)
-                                        print(f"Content after replacement contains data URL: {'data:image/gif' in content}")
+                    attachment = self._gmail_attachment(part, mime_type)
+
+                    if attachment.inline:
+                        # Inline resimler içerikte proxy URL ile gösterilir, veriyi burada indirmeye gerek yok
+                        attachment.content_id = part.get('contentId', '').strip('<>') or None
+
+                    elif attachment.id is not None:
+                        attachment.data = await self._get_gmail_attachment(session, headers, message_id, account_id, part)
                     
                     elif 'data' in part.get('body', {}):
-                        raw_data = part['body']['data']
-                        # Base64 düzeltmeleri
-                        raw_data = raw_data.replace('-', '+').replace('_', '/')
-                        padding = len(raw_data) % 4
-                        if padding:
-                            raw_data += '=' * (4 - padding)
-                        
-                        attachment['data'] = raw_data
-                        
-                        # Inline resim/GIF ise içeriğe ekle
-                        if attachment['inline']:
-                            content_id = part.get('contentId', '').strip('<>')
-                            if content_id:
-                                content = content.replace(
-                                    f'cid:{content_id}',
-                                    f'data:{mime_type};base64,{raw_data}'
-                                )
+                        attachment.data = decode_base64url(part['body']['data'])
                     
                     attachments.append(attachment)
                 except Exception as e:
@@ -603,121 +681,192 @@ class MessageService(BaseService):
             
             elif 'attachmentId' in part.get('body', {}) or part.get('filename'):
                 # Diğer ekleri işle
-                attachment = {
-                    'filename': part.get('filename', 'unnamed_attachment'),
-                    'mimeType': mime_type,
-                    'inline': bool(part.get('contentId')) or bool(part.get('contentDisposition', '').startswith('inline'))
-                }
+                attachment = self._gmail_attachment(part, mime_type)
                 
-                if 'attachmentId' in part.get('body', {}):
-                    attachment['id'] = part['body']['attachmentId']
+                if attachment.id is not None:
                     try:
-                        async with session.get(
-                            f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}/attachments/{attachment["id"]}',
-                            headers=headers
-                        ) as response:
-                            if response.status == 200:
-                                attachment_data = await response.json()
-                                raw_data = attachment_data.get('data', '')
-                                
-                                # Base64 düzeltmeleri
-                                raw_data = raw_data.replace('-', '+').replace('_', '/')
-                                padding = len(raw_data) % 4
-                                if padding:
-                                    raw_data += '=' * (4 - padding)
-                                
-                                attachment['data'] = raw_data
+                        attachment.data = await self._get_gmail_attachment(session, headers, message_id, account_id, part)
                     except Exception as e:
-                        print(f"Error fetching attachment {attachment['id']}: {str(e)}")
+                        print(f"Error fetching attachment {attachment.id}: {str(e)}")
                         print(traceback.format_exc())
                 
                 elif 'data' in part.get('body', {}):
-                    raw_data = part['body']['data']
-                    # Base64 düzeltmeleri
-                    raw_data = raw_data.replace('-', '+').replace('_', '/')
-                    padding = len(raw_data) % 4
-                    if padding:
-                        raw_data += '=' * (4 - padding)
-                    
-                    attachment['data'] = raw_data
+                    attachment.data = decode_base64url(part['body']['data'])
                 
                 attachments.append(attachment)
 
         return content
 
-    async def get_message_details(self, session, headers, message_id, account_email):
-        """Get detailed message information with retry mechanism for rate limiting"""
+    @staticmethod
+    def _gmail_attachment(part, mime_type) -> MessageAttachment:
+        return MessageAttachment(
+            filename=part.get('filename', 'unnamed_attachment'),
+            mime_type=mime_type,
+            id=part.get('body', {}).get('attachmentId'),
+            inline=bool(part.get('contentId')) or bool(part.get('contentDisposition', '').startswith('inline')),
+            size=part.get('body', {}).get('size')
+        )
+
+    async def _get_gmail_attachment(self, session, headers, message_id, account_id, part):
+        """Attachment bytes for a Gmail part; repeat downloads come from the blob store"""
+        attachment_id = part['body']['attachmentId']
+        if account_id is None:
+            async with provider_client.get(
+                session,
+                f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}/attachments/{attachment_id}',
+                headers=headers
+            ) as response:
+                if response.status != 200:
+                    return None
+                attachment_data = await response.json()
+                # Ekler yanıt yazılana kadar bytes olarak tutulur
+                return decode_base64url(attachment_data.get('data', ''))
+        return await attachment_blob_store.get_gmail_attachment(
+            session, headers, account_id, message_id, attachment_id,
+            part_id=part.get('partId'), mime_type=part.get('mimeType')
+        )
+
+    async def _get_outlook_attachments(self, session, headers, account_id, msg) -> List[MessageAttachment]:
+        """
+        Build the attachment list of an Outlook message. The listing only
+        expands attachment metadata; bytes come from the blob store and are
+        downloaded from Graph once per attachment. The first listing of a
+        message therefore makes one $value request per non-inline
+        attachment; later listings read them from disk.
+        """
+        file_attachments = [
+            attachment for attachment in msg.get('attachments', [])
+            if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment'
+        ]
+        attachments = []
+        downloads = []
+        for attachment in file_attachments:
+            mime_type = attachment.get('contentType', 'application/octet-stream')
+            entry = MessageAttachment(
+                filename=attachment['name'],
+                mime_type=mime_type,
+                id=attachment['id'],
+                inline=attachment.get('isInline', False),
+                size=attachment.get('size')
+            )
+            attachments.append(entry)
+            # Inline resimler içerikte proxy URL ile gösterilir
+            if not entry.inline:
+                downloads.append((entry, attachment_blob_store.get_outlook_attachment(
+                    session, headers, account_id, msg['id'], attachment['id'], mime_type
+                )))
+
+        if downloads:
+            results = await asyncio.gather(*(download for _, download in downloads), return_exceptions=True)
+            for (entry, _), data in zip(downloads, results):
+                if isinstance(data, Exception):
+                    print(f"Error fetching attachment {entry.id}: {str(data)}")
+                    data = None
+                entry.data = data if data is not None else b''
+        return attachments
+
+    async def get_message_details(self, session, headers, message_id, account_email, account_id=None, user_id=None, fields: Optional[FieldSelection] = None):
+        """
+        Get detailed message information with retry mechanism for rate limiting.
+        Returns None when the message cannot be read; raises when the
+        provider itself failed (429, 5xx, timeouts) after the last retry.
+        """
+        fields = fields or ALL_FIELDS
         max_retries = 3
         base_delay = 1
+
+        include_body = fields.wants('content', 'preview')
+        include_attachments = fields.wants('attachments')
+        if include_body or include_attachments:
+            params = {
+                'format': 'full',
+                'fields': 'id,internalDate,labelIds,payload(headers,body,parts),snippet'  # Only get needed fields
+            }
+        else:
+            # Headers and labels only: Gmail sends no body parts at all
+            params = {
+                'format': 'metadata',
+                'metadataHeaders': GMAIL_METADATA_HEADERS,
+                'fields': 'id,internalDate,labelIds,payload(headers),snippet'
+            }
         
         for attempt in range(max_retries):
             try:
-                # Add format=metadata to get only necessary fields and reduce response size
-                async with session.get(
+                # Hedged when PROVIDER_HEDGING is on: one slow messages.get should not set the page latency
+                status, message_data = await provider_client.get_json(
+                    session,
                     f'https://gmail.googleapis.com/gmail/v1/users/me/messages/{message_id}',
+                    endpoint='gmail.messages.get',
+                    hedge=True,
                     headers=headers,
-                    params={
-                        'format': 'full',
-                        'fields': 'id,labelIds,payload(headers,body,parts),snippet'  # Only get needed fields
-                    }
-                ) as response:
-                    if response.status == 429:  # Rate limit exceeded
-                        if attempt < max_retries - 1:
-                            delay = base_delay * (2 ** attempt)  # Exponential backoff
-                            print(f"Rate limit hit for message {message_id}, retrying in {delay} seconds...")
-                            await asyncio.sleep(delay)
-                            continue
-                        else:
-                            print(f"Max retries exceeded for message {message_id}, skipping...")
-                            return None
-                    
-                    response.raise_for_status()
-                    message_data = await response.json()
-                    
-                    # Process the message data
-                    payload = message_data.get('payload', {})
-                    headers_list = payload.get('headers', [])
-                    
-                    # Extract headers using dictionary comprehension for better performance
-                    headers_dict = {header.get('name', '').lower(): header.get('value', '') for header in headers_list}
-                    
-                    subject = headers_dict.get('subject', '')
-                    sender = headers_dict.get('from', '')
-                    date = headers_dict.get('date', '')
-                    recipient = headers_dict.get('delivered-to', headers_dict.get('to', account_email))
-                    
-                    # Extract body content and attachments
-                    content = ''
-                    attachments = []
-                    
-                    # Check if payload has parts or if it's a single part
-                    if 'parts' in payload:
-                        content = await self._process_message_parts(payload['parts'], content, attachments, headers, session, message_id)
+                    params=params
+                )
+                if status == 429:  # Rate limit exceeded
+                    if attempt < max_retries - 1:
+                        delay = base_delay * (2 ** attempt)  # Exponential backoff
+                        print(f"Rate limit hit for message {message_id}, retrying in {delay} seconds...")
+                        await asyncio.sleep(delay)
+                        continue
                     else:
-                        # Single part message
-                        content = await self._process_message_parts([payload], content, attachments, headers, session, message_id)
-                    
-                    # If content is empty, use snippet as fallback
-                    if not content:
-                        content = message_data.get('snippet', '')
-                    
-                    # Clean CID references from content
-                    content = self._clean_cid_references(content)
-                    
-                    return {
-                        'id': message_id,
-                        'subject': subject,
-                        'sender': sender,
-                        'preview': content[:200] if content else '',
-                        'date': date,
-                        'content': content,
-                        'hasHtml': True,
-                        'read': 'UNREAD' not in message_data.get('labelIds', []),
-                        'starred': 'STARRED' in message_data.get('labelIds', []),
-                        'recipientEmail': recipient,
-                        'attachments': attachments
-                    }
-                    
+                        print(f"Max retries exceeded for message {message_id}, skipping...")
+                        raise ProviderHTTPError(status, 'gmail.messages.get')
+                
+                if status != 200:
+                    raise ProviderHTTPError(status, 'gmail.messages.get')
+                
+                # Process the message data
+                payload = message_data.get('payload', {})
+                headers_list = payload.get('headers', [])
+                
+                # Extract headers using dictionary comprehension for better performance
+                headers_dict = {header.get('name', '').lower(): header.get('value', '') for header in headers_list}
+                
+                subject = headers_dict.get('subject', '')
+                sender = headers_dict.get('from', '')
+                date = headers_dict.get('date', '')
+                recipient = headers_dict.get('delivered-to', headers_dict.get('to', account_email))
+                
+                # Extract body content and attachments
+                content = ''
+                attachments = []
+                
+                # Check if payload has parts or if it's a single part
+                if include_body or include_attachments:
+                    parts = payload['parts'] if 'parts' in payload else [payload]  # Single part message
+                    content = await self._process_message_parts(
+                        parts, content, attachments, headers, session, message_id, account_id,
+                        include_body=include_body, include_attachments=include_attachments
+                    )
+                
+                # If content is empty, use snippet as fallback
+                if not content:
+                    content = message_data.get('snippet', '')
+                
+                # Point CID references at the inline image endpoint
+                if include_body:
+                    if account_id is not None and user_id is not None:
+                        content = inline_image_service.rewrite_cid_references(content, user_id, account_id, message_id)
+                    else:
+                        content = self._clean_cid_references(content)
+                
+                label_ids = message_data.get('labelIds', [])
+                return Message(
+                    id=message_id,
+                    account_id=account_id,
+                    subject=subject,
+                    sender=MessageRecipient.parse(sender),
+                    recipient=MessageRecipient.parse(recipient),
+                    date=date,
+                    # internalDate is always sent; the header is only a fallback
+                    timestamp=epoch_ms_from_internal_date(message_data.get('internalDate')) or epoch_ms_from_header(date),
+                    preview=content[:200] if content else '',
+                    content=content,
+                    has_html=True,
+                    read='UNREAD' not in label_ids,
+                    starred='STARRED' in label_ids,
+                    attachments=attachments
+                )
+                
             except Exception as e:
                 if attempt < max_retries - 1:
                     delay = base_delay * (2 ** attempt)
@@ -727,10 +876,42 @@ class MessageService(BaseService):
                 else:
                     print(f"Error getting message details for {message_id}: {e}")
                     print(traceback.format_exc())
+                    # Provider trouble goes up to the caller, which reports it to the circuit breakers
+                    if is_upstream_failure(e):
+                        raise
                     return None
         
         return None
 
+    @staticmethod
+    def _outlook_message(msg, account, user_id, attachments) -> Message:
+        body = msg.get('body', {})
+        return Message(
+            id=msg['id'],
+            account_id=account.account_id,
+            subject=msg.get('subject', 'No Subject'),
+            sender=MessageRecipient.from_graph(msg.get('from'), default='Unknown Sender'),
+            recipient=MessageRecipient(address=account.email, display=account.email),
+            date=msg['receivedDateTime'],
+            timestamp=epoch_ms_from_iso(msg['receivedDateTime']),
+            preview=msg.get('bodyPreview', '')[:200],
+            content=inline_image_service.rewrite_cid_references(body.get('content', ''), user_id, account.account_id, msg['id']),
+            has_html=body.get('contentType', '') == 'html',
+            read=msg.get('isRead', False),
+            starred=msg.get('flag', {}).get('flagStatus', '') == 'flagged',
+            attachments=attachments
+        )
+
+    @staticmethod
+    def _outlook_projection_params(fields: FieldSelection) -> Dict[str, str]:
+        """$select/$expand for an inbox listing, so Graph only sends the selected fields"""
+        properties = {'id', 'receivedDateTime'}
+        properties.update(prop for name, prop in OUTLOOK_INBOX_PROPERTIES.items() if fields.wants(name))
+        params = {'$select': ','.join(sorted(properties))}
+        if fields.wants('attachments'):
+            params['$expand'] = f'attachments($select={OUTLOOK_ATTACHMENT_FIELDS})'
+        return params
+
     def _clean_cid_references(self, content: str) -> str:
         """Clean up any remaining CID references in the content"""
         if not content:
@@ -745,20 +926,7 @@ class MessageService(BaseService):
         return content
 
     def _decode_body(self, body: Dict[str, Any]) -> str:
-        """Decode message body from base64"""
-        try:
-            if 'data' not in body:
-                return ''
-            
-            # Replace URL-safe characters back to their original form
-            encoded_data = body['data'].replace('-', '+').replace('_', '/')
-            
-            # Add padding if necessary
-            padding = len(encoded_data) % 4
-            if padding:
-                encoded_data += '=' * (4 - padding)
-            
-            return base64.b64decode(encoded_data).decode('utf-8', errors='ignore')
-        except Exception as e:
-            print(f"Error decoding body: {str(e)}")
-            return '' 
\ No newline at end of file
+        """Decode message body from URL-safe base64"""
+        if 'data' not in body:
+            return ''
+        return decode_base64url_text(body['data'])
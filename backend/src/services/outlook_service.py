@@ -13,6 +13,7 @@ from config.outlook_config import (
 from repositories.mail_account_repository import MailAccountRepository
 from models.mail_account import MailAccount
 from models.email import Email
+from services.provider_client import provider_client
 import aiohttp
 import json
 from typing import List, Dict, Any, Optional
@@ -71,7 +72,7 @@ class OutlookService:
             print("Getting user info from Outlook...")
             async with aiohttp.ClientSession() as session:
                 headers = {'Authorization': f'Bearer {tokens["access_token"]}'}
-                async with session.get(f"{self.base_url}/me", headers=headers) as response:
+                async with provider_client.get(session, f"{self.base_url}/me", headers=headers) as response:
                     if response.status != 200:
                         error_data = await response.json()
                         print(f"Failed to get user info: {error_data}")
@@ -127,7 +128,7 @@ class OutlookService:
                     '$orderby': 'receivedDateTime desc'
                 }
                 
-                async with session.get(f"{self.base_url}/me/messages", headers=headers, params=params) as response:
+                async with provider_client.get(session, f"{self.base_url}/me/messages", headers=headers, params=params) as response:
                     if response.status != 200:
                         error_data = await response.json()
                         print(f"Failed to get inbox: {error_data}")
@@ -136,26 +137,26 @@ class OutlookService:
                     data = await response.json()
                     print("Inbox data retrieved:", data)
 
-                    emails = []
-                    for msg in data.get('value', []):
-                        email = await Email.create(
-                            account_id=account_id,
-                            message_id=msg['id'],
-                            subject=msg.get('subject', ''),
-                            sender=msg.get('from', {}).get('emailAddress', {}).get('address', ''),
-                            recipient=msg.get('toRecipients', [{}])[0].get('emailAddress', {}).get('address', ''),
-                            body=msg.get('body', {}).get('content', ''),
-                            received_at=datetime.fromisoformat(msg['receivedDateTime'].replace('Z', '+00:00')),
-                            is_read=msg.get('isRead', False)
-                        )
-                        emails.append(email.to_dict())
+                emails = []
+                for msg in data.get('value', []):
+                    email = await Email.create(
+                        account_id=account_id,
+                        message_id=msg['id'],
+                        subject=msg.get('subject', ''),
+                        sender=msg.get('from', {}).get('emailAddress', {}).get('address', ''),
+                        recipient=msg.get('toRecipients', [{}])[0].get('emailAddress', {}).get('address', ''),
+                        body=msg.get('body', {}).get('content', ''),
+                        received_at=datetime.fromisoformat(msg['receivedDateTime'].replace('Z', '+00:00')),
+                        is_read=msg.get('isRead', False)
+                    )
+                    emails.append(email.to_dict())
 
-                    return {
-                        'emails': emails,
-                        'total': data.get('@odata.count', len(emails)),
-                        'page': page,
-                        'per_page': per_page
-                    }
+                return {
+                    'emails': emails,
+                    'total': data.get('@odata.count', len(emails)),
+                    'page': page,
+                    'per_page': per_page
+                }
 
         except Exception as e:
             print(f"Error in get_inbox: {str(e)}")
@@ -174,7 +175,7 @@ class OutlookService:
 
             async with aiohttp.ClientSession() as session:
                 headers = {'Authorization': f"Bearer {account.access_token}"}
-                async with session.get(f"{self.base_url}/me/messages/{message_id}", headers=headers) as response:
+                async with provider_client.get(session, f"{self.base_url}/me/messages/{message_id}", headers=headers) as response:
                     if response.status != 200:
                         error_data = await response.json()
                         print(f"Failed to get email: {error_data}")
@@ -183,18 +184,18 @@ class OutlookService:
                     msg = await response.json()
                     print("Email data retrieved:", msg)
 
-                    email = await Email.create(
-                        account_id=account_id,
-                        message_id=msg['id'],
-                        subject=msg.get('subject', ''),
-                        sender=msg.get('from', {}).get('emailAddress', {}).get('address', ''),
-                        recipient=msg.get('toRecipients', [{}])[0].get('emailAddress', {}).get('address', ''),
-                        body=msg.get('body', {}).get('content', ''),
-                        received_at=datetime.fromisoformat(msg['receivedDateTime'].replace('Z', '+00:00')),
-                        is_read=msg.get('isRead', False)
-                    )
+                email = await Email.create(
+                    account_id=account_id,
+                    message_id=msg['id'],
+                    subject=msg.get('subject', ''),
+                    sender=msg.get('from', {}).get('emailAddress', {}).get('address', ''),
+                    recipient=msg.get('toRecipients', [{}])[0].get('emailAddress', {}).get('address', ''),
+                    body=msg.get('body', {}).get('content', ''),
+                    received_at=datetime.fromisoformat(msg['receivedDateTime'].replace('Z', '+00:00')),
+                    is_read=msg.get('isRead', False)
+                )
 
-                    return email.to_dict()
+                return email.to_dict()
 
         except Exception as e:
             print(f"Error in get_email: {str(e)}")
@@ -218,7 +219,7 @@ class OutlookService:
                 }
                 
                 # Get original message
-                async with session.get(f"{self.base_url}/me/messages/{message_id}", headers=headers) as response:
+                async with provider_client.get(session, f"{self.base_url}/me/messages/{message_id}", headers=headers) as response:
                     if response.status != 200:
                         error_data = await response.json()
                         print(f"Failed to get original message: {error_data}")
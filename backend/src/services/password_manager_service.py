@@ -1,6 +1,7 @@
 from datetime import datetime
 from models.password_manager import PasswordEntry
 from repositories.password_manager_repository import PasswordManagerRepository
+from config.settings import settings
 from services.PassAlgo import (
     generate_user_key,
     encrypt_user_key,
@@ -8,15 +9,13 @@ from services.PassAlgo import (
     encrypt_password,
     decrypt_password
 )
-import os
 import traceback
 import sys
 
 class PasswordManagerService:
     def __init__(self):
         self.repository = PasswordManagerRepository()
-        self.MASTER_KEY = os.getenv("MASTER_KEY")
-        print("Initialized PasswordManagerService with MASTER_KEY:", self.MASTER_KEY[:10] + "..." if self.MASTER_KEY else "None")
+        self.MASTER_KEY = settings.get("MASTER_KEY")
 
     async def add_password(self, user_id: int, title: str, password: str, descriptions: str = "") -> dict:
         try:
@@ -0,0 +1,104 @@
+from typing import Dict, Optional, Tuple
+
+from config.app_config import APP_CONFIG
+from utils.circuit_breaker import STATE_VALUES, CircuitBreaker, is_upstream_failure
+from utils.metrics import metrics
+
+PROVIDER = 'provider'
+ACCOUNT = 'account'
+
+
+class ProviderBreakerService:
+    """
+    Circuit breakers for the mail providers. There is one breaker per
+    provider ('gmail', 'outlook') and one per account. A provider outage
+    opens the provider breaker and every account of that provider is skipped
+    at once. A single broken mailbox only opens its own breaker. Callers ask
+    `allow` before fetching and, on every path, either report the outcome
+    or `release` the call. Skipped accounts come back empty and are listed
+    as unavailable.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or APP_CONFIG
+        self._breakers: Dict[Tuple[str, str, Optional[int]], CircuitBreaker] = {}
+        metrics.register_gauge(
+            'provider_circuit_state',
+            self._state_samples,
+            'Circuit breaker state per provider/account (0 closed, 1 half-open, 2 open)'
+        )
+
+    def _breaker(self, scope: str, provider: str, account_id: Optional[int] = None) -> CircuitBreaker:
+        key = (scope, provider, account_id)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            def on_transition(previous: str, state: str) -> None:
+                print(f"Circuit breaker {provider}{'' if account_id is None else f' account {account_id}'}: {previous} -> {state}")
+                metrics.inc(
+                    'provider_circuit_transitions_total',
+                    {'provider': provider, 'scope': scope, 'state': state},
+                    help_text='Circuit breaker state changes'
+                )
+
+            breaker = self._breakers[key] = CircuitBreaker(
+                failure_rate=self.config['CIRCUIT_FAILURE_RATE'],
+                min_calls=self.config['CIRCUIT_MIN_CALLS'],
+                window=self.config['CIRCUIT_WINDOW'],
+                open_seconds=self.config['CIRCUIT_OPEN_SECONDS'],
+                on_transition=on_transition
+            )
+        return breaker
+
+    def allow(self, provider: str, account_id: int) -> bool:
+        """Whether the account may be fetched now; False while its provider or itself is open"""
+        # Account first: a half-open provider's single trial must not be spent on a call that never goes out
+        account = self._breaker(ACCOUNT, provider, account_id)
+        allowed = account.allow()
+        if allowed and not self._breaker(PROVIDER, provider).allow():
+            account.release()
+            allowed = False
+        if not allowed:
+            metrics.inc('provider_circuit_rejections_total', {'provider': provider}, help_text='Fetches skipped by an open circuit')
+        return allowed
+
+    def record_success(self, provider: str, account_id: int) -> None:
+        self._breaker(PROVIDER, provider).record_success()
+        self._breaker(ACCOUNT, provider, account_id).record_success()
+
+    def release(self, provider: str, account_id: int) -> None:
+        """The fetch allowed by `allow` did not reach the provider (e.g. no valid token); give back any trial slot"""
+        self._breaker(ACCOUNT, provider, account_id).release()
+        self._breaker(PROVIDER, provider).release()
+
+    def record_failure(self, provider: str, account_id: int, error: BaseException) -> None:
+        """
+        Count `error` against the breakers if it says the provider is
+        unhealthy; any other error only gives back a claimed trial slot
+        """
+        if is_upstream_failure(error):
+            self._record_failure(provider, account_id)
+        else:
+            self.release(provider, account_id)
+
+    def record_status(self, provider: str, account_id: int, status: int) -> None:
+        """Record an HTTP response status: 429 and 5xx count as failures, anything else as success"""
+        if status == 429 or status >= 500:
+            self._record_failure(provider, account_id)
+        else:
+            self.record_success(provider, account_id)
+
+    def _record_failure(self, provider: str, account_id: int) -> None:
+        metrics.inc('provider_failures_total', {'provider': provider}, help_text='Upstream failures counted by the breakers')
+        self._breaker(PROVIDER, provider).record_failure()
+        self._breaker(ACCOUNT, provider, account_id).record_failure()
+
+    def _state_samples(self):
+        for (scope, provider, account_id), breaker in list(self._breakers.items()):
+            labels = {'provider': provider, 'scope': scope}
+            if account_id is not None:
+                labels['account_id'] = account_id
+            yield labels, STATE_VALUES[breaker.state]
+
+
+# Shared instance so every service sees the same provider health
+provider_breakers = ProviderBreakerService()
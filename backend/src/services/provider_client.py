@@ -0,0 +1,180 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from config.app_config import APP_CONFIG
+from utils.deadline import Deadline
+from utils.fair_scheduler import FairScheduler
+from utils.metrics import metrics
+from utils.request_context import current_user_id
+
+
+class ProviderHTTPError(Exception):
+    """Non-success status from a provider call made through ProviderClient"""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"Provider returned status {status} for {url}")
+        self.status = status
+
+
+class LatencyTracker:
+    """Recent latencies of one endpoint; the hedge delay follows their percentile"""
+
+    __slots__ = ('samples', '_cached', '_since_cache')
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._cached: Optional[float] = None
+        self._since_cache = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._since_cache += 1
+
+    def percentile(self, fraction: float, min_samples: int) -> Optional[float]:
+        if len(self.samples) < min_samples:
+            return None
+        # Re-sorting on every call would cost more than the request; refresh every 20 samples
+        if self._cached is None or self._since_cache >= 20:
+            ordered = sorted(self.samples)
+            self._cached = ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+            self._since_cache = 0
+        return self._cached
+
+
+class ProviderClient:
+    """
+    Shared entry point for idempotent Gmail/Graph reads.
+
+    get_json runs one GET and reads the whole body, then returns
+    (status, json or None). It records latency per endpoint. With
+    hedge=True and PROVIDER_HEDGING on, a call still running after the
+    endpoint's observed p95 sends a duplicate request. Whichever answers
+    first wins and the other is cancelled. Hedges are capped by a budget
+    refilled as a fraction of primary calls. They pause while the endpoint
+    is answering 429, so hedging never adds to a quota problem.
+
+    get is session.get for the other provider reads (listings, folder
+    counts, attachment bytes, inline images): the caller reads the response
+    itself, without latency tracking or hedging.
+
+    Every request waits for one of UPSTREAM_CONCURRENCY slots. Slots are
+    shared between users by deficit round robin, keyed by the user the
+    request acts for. A user listing 500 sent messages queues behind their
+    own calls and does not take the pool from everyone else. Hedges use
+    slots from the same user's share.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or APP_CONFIG
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._hedge_tokens = float(self.config['HEDGE_BUDGET_BURST'])
+        self._throttled_until: Dict[str, float] = {}
+        self.scheduler = FairScheduler(self.config['UPSTREAM_CONCURRENCY'], self.config['FAIR_QUEUE_QUANTUM'])
+        metrics.register_gauge('provider_hedge_delay_seconds', self._delay_samples, 'Current hedge delay per endpoint')
+        metrics.register_gauge('provider_requests_in_flight', lambda: [({}, self.scheduler.in_flight)], 'Upstream requests holding a slot')
+        metrics.register_gauge('provider_requests_queued', lambda: [({}, self.scheduler.queued)], 'Upstream requests waiting for a slot')
+        metrics.register_gauge('provider_queued_users', lambda: [({}, self.scheduler.waiting_keys)], 'Users with upstream requests waiting')
+
+    def _tracker(self, endpoint: str) -> LatencyTracker:
+        tracker = self._latency.get(endpoint)
+        if tracker is None:
+            tracker = self._latency[endpoint] = LatencyTracker()
+        return tracker
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while too few latencies are known"""
+        p95 = self._tracker(endpoint).percentile(0.95, self.config['HEDGE_MIN_SAMPLES'])
+        if p95 is None:
+            return None
+        return max(p95, self.config['HEDGE_MIN_DELAY'])
+
+    def _take_hedge_token(self, endpoint: str) -> bool:
+        if time.monotonic() < self._throttled_until.get(endpoint, 0):
+            return False
+        # Slow because of queueing, not the provider: a duplicate would only queue too
+        if self.scheduler.queued:
+            return False
+        if self._hedge_tokens < 1:
+            return False
+        self._hedge_tokens -= 1
+        return True
+
+    @asynccontextmanager
+    async def get(self, session, url, deadline: Optional[Deadline] = None, **kwargs):
+        """
+        `async with provider_client.get(session, url, ...) as response`, like
+        session.get. The slot is held until the block exits, so read the body
+        and leave the block before starting further provider calls. With a
+        deadline, waiting for the slot counts against it and the request gets
+        whatever time is left.
+        """
+        key = current_user_id.get()
+        if deadline is None:
+            await self.scheduler.acquire(key)
+        else:
+            await deadline.run(self.scheduler.acquire(key))
+            kwargs['timeout'] = deadline.client_timeout()
+        try:
+            async with session.get(url, **kwargs) as response:
+                yield response
+        finally:
+            self.scheduler.release()
+
+    async def _get(self, session, url, endpoint: str, **kwargs) -> Tuple[int, Any]:
+        async with self.scheduler.slot(current_user_id.get()):
+            started = time.monotonic()
+            async with session.get(url, **kwargs) as response:
+                status = response.status
+                data = await response.json() if status == 200 else None
+        if status == 200:
+            self._tracker(endpoint).observe(time.monotonic() - started)
+        elif status == 429:
+            # Provider asks us to slow down: no hedging on this endpoint for a while
+            self._throttled_until[endpoint] = time.monotonic() + self.config['HEDGE_THROTTLE_SECONDS']
+        return status, data
+
+    async def get_json(self, session, url, *, endpoint: str, hedge: bool = False, **kwargs) -> Tuple[int, Any]:
+        """GET `url` (session.get keyword arguments pass through) and return (status, parsed JSON or None)"""
+        self._hedge_tokens = min(self._hedge_tokens + self.config['HEDGE_BUDGET_RATIO'], self.config['HEDGE_BUDGET_BURST'])
+
+        delay = self.hedge_delay(endpoint) if hedge and self.config['PROVIDER_HEDGING'] else None
+        if delay is None:
+            return await self._get(session, url, endpoint, **kwargs)
+
+        primary = asyncio.ensure_future(self._get(session, url, endpoint, **kwargs))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._take_hedge_token(endpoint):
+                return await primary
+
+            metrics.inc('provider_hedges_total', {'endpoint': endpoint}, help_text='Duplicate requests sent after the hedge delay')
+            hedged = asyncio.ensure_future(self._get(session, url, endpoint, **kwargs))
+            pending = {primary, hedged}
+            try:
+                while True:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((task for task in done if task.exception() is None), None)
+                    if winner is not None:
+                        if winner is hedged:
+                            metrics.inc('provider_hedge_wins_total', {'endpoint': endpoint}, help_text='Hedged requests that answered first')
+                        return winner.result()
+                    # A failed copy does not decide the result while the other may still succeed
+                    if not pending:
+                        return done.pop().result()
+            finally:
+                hedged.cancel()
+        finally:
+            primary.cancel()
+
+    def _delay_samples(self):
+        for endpoint in list(self._latency):
+            delay = self.hedge_delay(endpoint)
+            if delay is not None:
+                yield {'endpoint': endpoint}, delay
+
+
+# Shared instance: latencies and the hedge budget are process-wide
+provider_client = ProviderClient()
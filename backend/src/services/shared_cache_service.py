@@ -0,0 +1,40 @@
+from config.app_config import APP_CONFIG
+from utils.lifecycle import on_shutdown, on_startup
+from utils.shared_cache import CacheBackend, LocalCacheBackend, SQLiteCacheBackend, SharedCache
+
+# Events every worker reacts to
+USER_DATA_CHANGED = 'user_data_changed'  # payload: user_id
+MAILBOX_CHANGED = 'mailbox_changed'  # payload: account_id
+ACCOUNTS_CHANGED = 'accounts_changed'  # payload: user_id, account_ids
+
+
+def _build_backend() -> CacheBackend:
+    backend = APP_CONFIG['CACHE_BACKEND']
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(APP_CONFIG['CACHE_SQLITE_PATH'], poll_interval=APP_CONFIG['CACHE_EVENT_POLL_INTERVAL'])
+    if backend != 'local':
+        print(f"Unknown CACHE_BACKEND {backend!r}, falling back to the in-process cache")
+    return LocalCacheBackend()
+
+
+# Shared instance; all workers of a host meet in its backend
+shared_cache = SharedCache(_build_backend())
+
+
+async def invalidate_accounts(user_id: int, *account_ids: int) -> None:
+    """
+    Drop cached accounts of a user in every worker, e.g. after a token
+    refresh. Only account entries go; the user's listing pages and
+    prefetches stay.
+    """
+    await shared_cache.publish(ACCOUNTS_CHANGED, user_id=user_id, account_ids=list(account_ids))
+
+
+@on_startup
+async def start_shared_cache() -> None:
+    await shared_cache.backend.start()
+
+
+@on_shutdown
+async def close_shared_cache() -> None:
+    await shared_cache.backend.close()
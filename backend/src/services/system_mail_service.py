@@ -4,10 +4,6 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from models.system_mail import SystemMail
 from repositories.system_mail_repository import SystemMailRepository
 from config.oauth_config import (
@@ -51,8 +47,10 @@ class SystemMailService:
         """Sistem mail hesabını sil"""
         return await self.system_mail_repository.delete_system_mail(id)
 
-    def generate_auth_url(self) -> str:
-        """Google OAuth2 yetkilendirme URL'sini oluştur"""
+    def _build_flow(self):
+        # Google istemci kütüphaneleri ağır; yalnızca sistem maili yetkilendirilirken yüklenir
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
         flow = InstalledAppFlow.from_client_config(
             {
                 "installed": {
@@ -66,6 +64,11 @@ class SystemMailService:
             self.SCOPES
         )
         flow.redirect_uri = self.GOOGLE_REDIRECT_URI
+        return flow
+
+    def generate_auth_url(self) -> str:
+        """Google OAuth2 yetkilendirme URL'sini oluştur"""
+        flow = self._build_flow()
         auth_url, _ = flow.authorization_url(
             access_type='offline',
             prompt='consent',
@@ -84,19 +87,7 @@ class SystemMailService:
         """Google OAuth2 callback'i işle ve sistem mail hesabı oluştur/güncelle"""
         print(f"SystemMail: handle_google_callback başladı, code: {code[:10]}..., email: {email}")
         
-        flow = InstalledAppFlow.from_client_config(
-            {
-                "installed": {
-                    "client_id": self.GOOGLE_CLIENT_ID,
-                    "client_secret": self.GOOGLE_CLIENT_SECRET,
-                    "redirect_uris": [self.GOOGLE_REDIRECT_URI],
-                    "auth_uri": GOOGLE_AUTH_URI,
-                    "token_uri": GOOGLE_TOKEN_URI
-                }
-            },
-            self.SCOPES
-        )
-        flow.redirect_uri = self.GOOGLE_REDIRECT_URI
+        flow = self._build_flow()
         
         try:
             # Token'ları değişim koduyla al
@@ -205,6 +196,9 @@ class SystemMailService:
         raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
         
         try:
+            from google.oauth2.credentials import Credentials
+            from googleapiclient.discovery import build
+
             # Kimlik bilgilerini oluştur
             credentials = Credentials(
                 token=system_mail.access_token,
@@ -1,7 +1,6 @@
 import bcrypt
 import jwt
 import pyotp
-import qrcode
 import base64
 import io
 import random
@@ -10,6 +9,7 @@ import secrets
 import uuid
 from datetime import datetime, timedelta
 from models.user import User
+from config.database import transaction
 from repositories.user_repository import UserRepository
 from services.system_mail_service import SystemMailService
 from config.oauth_config import FRONTEND_URL  # Frontend URL'i config'den import et
@@ -84,10 +84,11 @@ class UserService:
         if user.otp_enabled and recovery_code:
             recovery_valid = await self._verify_recovery_code(user.user_id, recovery_code, request_info)
             if recovery_valid:
-                # Log successful login
-                await self._log_login_attempt(user.user_id, True, request_info)
-                # Update last activity time
-                await self.user_repository.update_last_activity(user.user_id)
+                async with transaction():
+                    # Log successful login
+                    await self._log_login_attempt(user.user_id, True, request_info)
+                    # Update last activity time
+                    await self.user_repository.update_last_activity(user.user_id)
                 return self._generate_auth_response(user)
             else:
                 # Log failed recovery code attempt
@@ -115,14 +116,16 @@ class UserService:
             # Log this error state
             print(f"ERROR: User {user.user_id} has OTP enabled but no secret key")
             # Disable OTP for this user to prevent login issues
-            await self.user_repository.enable_otp(user.user_id, False)
-            await self._log_otp_activity(user.user_id, "otp_disabled_auto", True, request_info)
+            async with transaction():
+                await self.user_repository.enable_otp(user.user_id, False)
+                await self._log_otp_activity(user.user_id, "otp_disabled_auto", True, request_info)
             # Continue login process
 
-        # Log successful login
-        await self._log_login_attempt(user.user_id, True, request_info)
-        # Update last activity time
-        await self.user_repository.update_last_activity(user.user_id)
+        async with transaction():
+            # Log successful login
+            await self._log_login_attempt(user.user_id, True, request_info)
+            # Update last activity time
+            await self.user_repository.update_last_activity(user.user_id)
 
         return self._generate_auth_response(user)
         
@@ -173,7 +176,9 @@ class UserService:
             totp = pyotp.TOTP(user.otp_secret)
             uri = totp.provisioning_uri(name=user.email, issuer_name="EmailManager")
         
-        # QR kod oluştur
+        # QR kod oluştur (qrcode/PIL yalnızca burada gerekiyor)
+        import qrcode
+
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
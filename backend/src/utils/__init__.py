@@ -0,0 +1,2 @@
+# Utils package
+# Shared helpers used by services and controllers
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import aiohttp
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Numeric values for the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    True for errors that say the provider is unhealthy: timeouts, connection
+    errors, 429 and 5xx. Client errors such as a revoked token (401) or a
+    missing message (404) are about the request, not the provider.
+    """
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over the last `window` calls.
+
+    Closed: calls go through and outcomes are recorded. When at least
+    `min_calls` outcomes are known and the failure rate reaches
+    `failure_rate`, the breaker opens and rejects calls for `open_seconds`.
+    Then it is half-open: one trial call is let through, and its outcome
+    closes or re-opens the breaker. A trial that never reports back frees
+    its slot after another `open_seconds`.
+    """
+
+    __slots__ = ('failure_rate', 'min_calls', 'open_seconds', 'state', 'on_transition',
+                 '_outcomes', '_opened_at', '_trial_started_at')
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        open_seconds: float = 30,
+        on_transition: Optional[Callable[[str, str], None]] = None
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+
+    def _transition(self, state: str) -> None:
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._trial_started_at = None
+        if state == CLOSED:
+            self._outcomes.clear()
+        if self.on_transition and previous != state:
+            self.on_transition(previous, state)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state this claims the trial slot"""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._trial_started_at is not None and now - self._trial_started_at < self.open_seconds:
+                return False
+            self._trial_started_at = now
+        return True
+
+    def release(self) -> None:
+        """Give back a trial slot claimed by `allow` when the call did not go out after all"""
+        if self.state == HALF_OPEN:
+            self._trial_started_at = None
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._outcomes.append(False)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # Optional; the json module is used instead
+    orjson = None
+
+# Dataclass models pass through to json_default so only to_dict() fields are written
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+BinaryLike = Union[str, bytes, bytearray]
+
+
+def decode_base64url(data: BinaryLike) -> bytes:
+    """
+    Decode URL-safe base64 (Gmail API payloads) straight to bytes.
+
+    str and bytes input is handed to the decoder as is; only unpadded
+    payloads are copied once to append the missing '=' padding.
+    """
+    if not data:
+        return b''
+    remainder = len(data) % 4
+    if remainder == 1:
+        # A single trailing character carries no full byte; ignore it like lenient decoders do
+        data = data[:-1]
+    elif remainder:
+        data = data + ('=' if isinstance(data, str) else b'=') * (4 - remainder)
+    return base64.urlsafe_b64decode(data)
+
+
+def decode_base64url_text(data: BinaryLike, encoding: str = 'utf-8') -> str:
+    """Decode a URL-safe base64 message body to text, dropping undecodable bytes"""
+    try:
+        return decode_base64url(data).decode(encoding, errors='ignore')
+    except (binascii.Error, ValueError) as e:
+        print(f"Error decoding body: {str(e)}")
+        return ''
+
+
+def encode_base64(data: Union[bytes, bytearray, memoryview]) -> str:
+    """Standard base64 text for binary payloads, used when a response is written"""
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def json_default(obj: Any) -> Any:
+    """
+    `default` hook for response serialization: binary payloads become standard
+    base64, models go through their to_dict(), dates become ISO 8601 strings.
+    """
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return encode_base64(obj)
+    to_dict = getattr(obj, 'to_dict', None)
+    if callable(to_dict):
+        # Models are dataclasses; to_dict() decides which fields are public
+        return to_dict()
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj: Any, **kwargs: Dict[str, Any]) -> str:
+    kwargs.setdefault('default', json_default)
+    kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(obj, **kwargs)
+
+
+def json_dumps(obj: Any, **kwargs: Dict[str, Any]) -> Union[bytes, str]:
+    """
+    Response encoder used by every Sanic response. orjson writes datetimes
+    natively and returns bytes, which Sanic sends without re-encoding;
+    attachment bytes stay untouched until here. Falls back to the json module
+    when orjson is not installed, for json.dumps-specific keyword arguments,
+    and for values orjson rejects (e.g. integers beyond 64 bits).
+    """
+    if orjson is None or kwargs:
+        return _stdlib_dumps(obj, **kwargs)
+    try:
+        return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+    except TypeError:
+        return _stdlib_dumps(obj)
+
+
+def ndjson_line(obj: Any) -> bytes:
+    """One newline-delimited JSON record, as written by streaming endpoints"""
+    line = json_dumps(obj)
+    if isinstance(line, str):
+        line = line.encode('utf-8')
+    return line + b'\n'
@@ -0,0 +1,48 @@
+import gzip
+from typing import Optional
+
+from config.app_config import APP_CONFIG
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Content types worth compressing; images and attachments are already compressed
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript')
+
+
+def supported_encodings() -> tuple:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the best encoding the client accepts, preferring brotli.
+    Encodings listed with q=0 are treated as refused.
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=APP_CONFIG['COMPRESSION_BROTLI_QUALITY'])
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=APP_CONFIG['COMPRESSION_GZIP_LEVEL'], mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
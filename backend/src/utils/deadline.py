@@ -0,0 +1,49 @@
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+import aiohttp
+
+T = TypeVar('T')
+
+# aiohttp treats a zero timeout as "no timeout", so an expired deadline still gets a tiny one
+MIN_CLIENT_TIMEOUT = 0.001
+
+
+class Deadline:
+    """
+    Point in time by which a request's upstream work has to be done.
+
+    Set once at the controller and passed down to token refreshes, list and
+    detail calls; each step uses whatever time is left, so a hung account
+    runs out of time instead of holding the whole response. A deadline
+    without seconds never expires.
+    """
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when there is no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def client_timeout(self) -> aiohttp.ClientTimeout:
+        """Timeout for a single aiohttp request made under this deadline"""
+        remaining = self.remaining()
+        return aiohttp.ClientTimeout(total=None if remaining is None else max(remaining, MIN_CLIENT_TIMEOUT))
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await within the remaining time; raises asyncio.TimeoutError and cancels the work when it runs out"""
+        return await asyncio.wait_for(awaitable, self.remaining())
+
+
+# Used when a caller does not set one; upstream calls then wait as long as they take
+NO_DEADLINE = Deadline()
@@ -0,0 +1,111 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable, Tuple
+
+
+class FairScheduler:
+    """
+    Deficit round robin over a fixed number of concurrent slots.
+
+    Callers queue under a key (the user id) and are granted slots one key
+    at a time. Each visit adds `quantum` to a key's deficit and the key is
+    served while its deficit covers the cost of its next call. A user with
+    hundreds of queued calls therefore gets the same share of slots as a
+    user with two, instead of the whole pool. Without contention, slots are
+    granted right away.
+    """
+
+    def __init__(self, concurrency: int, quantum: float = 1):
+        self.concurrency = max(int(concurrency), 1)
+        self.quantum = quantum
+        self.in_flight = 0
+        self._queues: Dict[Hashable, Deque[Tuple[asyncio.Future, float]]] = {}
+        self._deficits: Dict[Hashable, float] = {}
+        self._active: Deque[Hashable] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def waiting_keys(self) -> int:
+        return len(self._active)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, cost: float = 1):
+        await self.acquire(key, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, key: Hashable, cost: float = 1) -> None:
+        if self.in_flight < self.concurrency and not self._active:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, cost)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._deficits[key] = 0
+            self._active.append(key)
+        queue.append(entry)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just before the cancellation; hand it on
+                self.release()
+            else:
+                self._discard(key, entry)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _discard(self, key: Hashable, entry) -> None:
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(entry)
+        except ValueError:
+            pass
+        if not queue:
+            self._drop(key)
+
+    def _drop(self, key: Hashable) -> None:
+        del self._queues[key]
+        del self._deficits[key]
+        try:
+            self._active.remove(key)
+        except ValueError:
+            pass
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.concurrency and self._active:
+            key = self._active[0]
+            queue = self._queues[key]
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if not queue:
+                self._drop(key)
+                continue
+
+            waiter, cost = queue[0]
+            if self._deficits[key] < cost:
+                # Out of credit for this round: top up and move on to the next user
+                self._deficits[key] += self.quantum
+                self._active.rotate(-1)
+                continue
+
+            self._deficits[key] -= cost
+            queue.popleft()
+            self.in_flight += 1
+            waiter.set_result(None)
+            if not queue:
+                self._drop(key)
@@ -0,0 +1,28 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Iterable, TypeVar
+
+T = TypeVar('T')
+
+
+async def as_finished(awaitables: Iterable[Awaitable[T]], return_exceptions: bool = False) -> AsyncIterator[T]:
+    """
+    Run the awaitables concurrently and yield each result as soon as it is
+    ready. Unlike gather(), a merge can consume one account's batch and let
+    it go before the slower accounts finish, instead of holding every
+    batch at once. With `return_exceptions`, a failure is yielded in place
+    of its result; otherwise it is raised. Work still running when the
+    consumer stops or is cancelled is cancelled.
+    """
+    pending = {asyncio.ensure_future(awaitable) for awaitable in awaitables}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            while done:
+                task = done.pop()
+                error = task.exception()
+                if error is not None and not return_exceptions:
+                    raise error
+                yield error if error is not None else task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,48 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+
+class FieldSelection:
+    """
+    Fields requested through a `fields=` query parameter.
+
+    Services ask `wants(...)` before doing expensive work (body decoding,
+    sanitizing, attachment downloads) and call `project` on the final items,
+    so the projection saves upstream work as well as response bytes. An empty
+    selection means every field.
+    """
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.fields: Optional[FrozenSet[str]] = frozenset(fields) if fields else None
+
+    @classmethod
+    def parse(cls, raw: Optional[str]) -> 'FieldSelection':
+        """Build a selection from a comma separated `fields` parameter"""
+        if not raw:
+            return cls()
+        return cls(name.strip() for name in raw.split(',') if name.strip())
+
+    @property
+    def is_all(self) -> bool:
+        return self.fields is None
+
+    def wants(self, *names: str) -> bool:
+        """True if any of the given fields is selected"""
+        if self.fields is None:
+            return True
+        return any(name in self.fields for name in names)
+
+    def project(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return item
+        return {key: value for key, value in item.items() if key in self.fields}
+
+    def project_all(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.fields is None:
+            return items
+        return [self.project(item) for item in items]
+
+
+# Default selection: every field
+ALL_FIELDS = FieldSelection()
@@ -0,0 +1,247 @@
+import hashlib
+from html import escape, unescape
+from html.parser import HTMLParser
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from utils.lru_cache import LRUCache
+
+PREVIEW_LENGTH = 200
+
+# Tags removed together with everything inside them
+UNSAFE_TAGS = frozenset({'script', 'iframe', 'object', 'embed'})
+# Unsafe tags that never have a closing tag
+VOID_UNSAFE_TAGS = frozenset({'embed'})
+# Tags whose text never belongs in a preview
+NON_TEXT_TAGS = frozenset({'style', 'title'})
+# Tags that separate words in the preview text
+BLOCK_TAGS = frozenset({
+    'br', 'p', 'div', 'li', 'tr', 'td', 'th', 'table',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'hr'
+})
+URL_ATTRIBUTES = frozenset({'href', 'src', 'action', 'formaction'})
+
+
+class SanitizedHtml(NamedTuple):
+    html: str
+    preview: str
+
+
+class _SanitizingParser(HTMLParser):
+    """Single-pass tokenizer that writes sanitized HTML and collects preview text"""
+
+    def __init__(
+        self,
+        preview_length: int,
+        base_url: Optional[str] = None,
+        cid_resolver: Optional[Callable[[str], Optional[str]]] = None
+    ):
+        super().__init__(convert_charrefs=False)
+        self.preview_length = preview_length
+        self.base_url = base_url
+        self.cid_resolver = cid_resolver
+        self.output: List[str] = []
+        self._preview_parts: List[str] = []
+        self._preview_len = 0
+        self._pending_space = False
+        self._skip_depth = 0
+        self._non_text_depth = 0
+
+    # --- Preview text ---
+
+    def _add_preview_text(self, text: str) -> None:
+        if self._non_text_depth or self._preview_len >= self.preview_length or not text:
+            return
+        if text[0].isspace():
+            self._pending_space = True
+        words = text.split()
+        if not words:
+            return
+        chunk = ' '.join(words)
+        if self._pending_space and self._preview_parts:
+            chunk = ' ' + chunk
+        self._pending_space = text[-1].isspace()
+        self._preview_parts.append(chunk)
+        self._preview_len += len(chunk)
+
+    def preview(self) -> str:
+        return ''.join(self._preview_parts)[:self.preview_length]
+
+    # --- Attribute rewriting ---
+
+    def _rewrite_src(self, src: str) -> str:
+        if src.startswith('cid:') and self.cid_resolver:
+            return self.cid_resolver(src[4:]) or src
+        if src.startswith('//'):
+            return 'https:' + src
+        if src.startswith('/') and self.base_url:
+            return self.base_url + src
+        return src
+
+    def _clean_attrs(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> Tuple[List[Tuple[str, Optional[str]]], bool]:
+        """Drop event handlers and javascript: URLs, rewrite image sources"""
+        cleaned = []
+        changed = False
+        for name, value in attrs:
+            if name.startswith('on'):
+                changed = True
+                continue
+            if value is not None and name in URL_ATTRIBUTES:
+                if value.strip().lower().startswith('javascript:'):
+                    changed = True
+                    continue
+                if tag == 'img' and name == 'src':
+                    new_value = self._rewrite_src(value)
+                    if new_value != value:
+                        value = new_value
+                        changed = True
+            cleaned.append((name, value))
+        return cleaned, changed
+
+    def _emit_tag(self, tag: str, attrs, self_closing: bool) -> None:
+        cleaned, changed = self._clean_attrs(tag, attrs)
+        if not changed:
+            self.output.append(self.get_starttag_text())
+            return
+        parts = [f'<{tag}']
+        for name, value in cleaned:
+            if value is None:
+                parts.append(f' {name}')
+            else:
+                parts.append(f' {name}="{escape(value, quote=True)}"')
+        parts.append(' />' if self_closing else '>')
+        self.output.append(''.join(parts))
+
+    # --- HTMLParser callbacks ---
+
+    def handle_starttag(self, tag, attrs):
+        if tag in UNSAFE_TAGS:
+            if tag not in VOID_UNSAFE_TAGS:
+                self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag in NON_TEXT_TAGS:
+            self._non_text_depth += 1
+        if tag in BLOCK_TAGS:
+            self._pending_space = True
+        self._emit_tag(tag, attrs, self_closing=False)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in UNSAFE_TAGS or self._skip_depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._pending_space = True
+        self._emit_tag(tag, attrs, self_closing=True)
+
+    def handle_endtag(self, tag):
+        if tag in UNSAFE_TAGS:
+            if self._skip_depth and tag not in VOID_UNSAFE_TAGS:
+                self._skip_depth -= 1
+            return
+        if self._skip_depth:
+            return
+        if tag in NON_TEXT_TAGS and self._non_text_depth:
+            self._non_text_depth -= 1
+        if tag in BLOCK_TAGS:
+            self._pending_space = True
+        self.output.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self.output.append(data)
+        self._add_preview_text(data)
+
+    def handle_entityref(self, name):
+        if self._skip_depth:
+            return
+        ref = f'&{name};'
+        self.output.append(ref)
+        self._add_preview_text(unescape(ref))
+
+    def handle_charref(self, name):
+        if self._skip_depth:
+            return
+        ref = f'&#{name};'
+        self.output.append(ref)
+        self._add_preview_text(unescape(ref))
+
+    def handle_comment(self, data):
+        if not self._skip_depth:
+            self.output.append(f'<!--{data}-->')
+
+    def handle_decl(self, decl):
+        if not self._skip_depth:
+            self.output.append(f'<!{decl}>')
+
+    def unknown_decl(self, data):
+        if not self._skip_depth:
+            self.output.append(f'<![{data}]>')
+
+    def handle_pi(self, data):
+        if not self._skip_depth:
+            self.output.append(f'<?{data}>')
+
+
+class HtmlSanitizer:
+    """
+    Strips unsafe tags from e-mail HTML and extracts a plain-text preview
+    in a single tokenizer pass. Results are cached by message id and
+    content hash so re-rendering the same message costs a hash lookup.
+    """
+
+    def __init__(self, cache_size: int = 2048, preview_length: int = PREVIEW_LENGTH):
+        self.preview_length = preview_length
+        self._cache = LRUCache(max_entries=cache_size)
+
+    @staticmethod
+    def content_hash(html: str) -> str:
+        return hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+    def sanitize(
+        self,
+        html: str,
+        message_id: Optional[str] = None,
+        base_url: Optional[str] = None,
+        cid_resolver: Optional[Callable[[str], Optional[str]]] = None,
+        cache_tag: Optional[str] = None
+    ) -> SanitizedHtml:
+        """
+        Sanitize the given HTML and build its preview.
+
+        Args:
+            html: Raw HTML body
+            message_id: Provider message id, enables result caching
+            base_url: Prefix for root-relative image sources
+            cid_resolver: Maps a Content-ID to the URL that should replace `cid:` sources
+            cache_tag: Extra cache key part for inputs the resolver depends on (e.g. a signed token)
+        """
+        if not html:
+            return SanitizedHtml('', '')
+
+        cache_key = None
+        if message_id:
+            cache_key = (message_id, base_url, cache_tag, self.content_hash(html))
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        parser = _SanitizingParser(self.preview_length, base_url=base_url, cid_resolver=cid_resolver)
+        try:
+            parser.feed(html)
+            parser.close()
+            result = SanitizedHtml(''.join(parser.output), parser.preview())
+        except Exception as e:
+            print(f"Error sanitizing HTML for message {message_id}: {str(e)}")
+            result = SanitizedHtml(escape(html), '')
+
+        if cache_key is not None:
+            self._cache.set(cache_key, result)
+        return result
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+
+# Shared instance so every service hits the same result cache
+html_sanitizer = HtmlSanitizer()
@@ -0,0 +1,37 @@
+import traceback
+from typing import Awaitable, Callable, List
+
+Hook = Callable[[], Awaitable[None]]
+
+_startup_hooks: List[Hook] = []
+_shutdown_hooks: List[Hook] = []
+
+
+def on_startup(hook: Hook) -> Hook:
+    """Run `hook` in every worker before it accepts requests (pools, clients, warm-up)"""
+    _startup_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    """Run `hook` in every worker after it stopped serving; hooks run in reverse registration order"""
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+async def run_startup() -> None:
+    # A failing hook is logged, not fatal: the resource is then created lazily on first use
+    for hook in _startup_hooks:
+        try:
+            await hook()
+        except Exception as e:
+            print(f"Startup hook {hook.__qualname__} failed: {str(e)}")
+            print(traceback.format_exc())
+
+
+async def run_shutdown() -> None:
+    for hook in reversed(_shutdown_hooks):
+        try:
+            await hook()
+        except Exception as e:
+            print(f"Shutdown hook {hook.__qualname__} failed: {str(e)}")
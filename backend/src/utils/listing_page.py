@@ -0,0 +1,9 @@
+from typing import Any, Dict
+
+# Listing fields naming the accounts whose messages are missing or incomplete
+DEGRADED_PAGE_FIELDS = ('partialAccounts', 'timedOutAccounts', 'unavailableAccounts')
+
+
+def is_complete_page(page: Dict[str, Any]) -> bool:
+    """False for error fallbacks and for pages some accounts are missing from; those must not be cached"""
+    return not page.get('error') and not any(page.get(field) for field in DEGRADED_PAGE_FIELDS)
@@ -0,0 +1,84 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+GaugeCallback = Callable[[], Iterable[Tuple[Dict[str, object], float]]]
+
+
+def _labels(labels: Optional[Dict[str, object]]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class MetricsRegistry:
+    """
+    In-process counters and gauges, rendered in the Prometheus text format
+    by the metrics endpoint. Gauges that reflect live state (breaker states,
+    queue depths, pool sizes) are registered as callbacks and read when the
+    metrics are scraped, so their owners never have to push updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Labels, float]] = {}
+        self._callbacks: Dict[str, GaugeCallback] = {}
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._help:
+            self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, labels: Optional[Dict[str, object]] = None, value: float = 1, help_text: str = '') -> None:
+        """Add to a counter"""
+        self._declare(name, 'counter', help_text)
+        key = _labels(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, object]] = None, help_text: str = '') -> None:
+        """Set a gauge"""
+        self._declare(name, 'gauge', help_text)
+        with self._lock:
+            self._values.setdefault(name, {})[_labels(labels)] = value
+
+    def register_gauge(self, name: str, callback: GaugeCallback, help_text: str = '') -> None:
+        """Gauge read from `callback` on every scrape; it yields (labels, value) pairs"""
+        self._declare(name, 'gauge', help_text)
+        self._callbacks[name] = callback
+
+    def value(self, name: str, labels: Optional[Dict[str, object]] = None) -> float:
+        return self._values.get(name, {}).get(_labels(labels), 0)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            values = {name: dict(series) for name, series in self._values.items()}
+        for name, callback in self._callbacks.items():
+            try:
+                values[name] = {_labels(labels): value for labels, value in callback()}
+            except Exception as e:
+                print(f"Error reading gauge {name}: {str(e)}")
+
+        lines: List[str] = []
+        for name in sorted(values):
+            kind, help_text = self._help.get(name, ('untyped', ''))
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(values[name].items()):
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
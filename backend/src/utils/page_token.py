@@ -0,0 +1,28 @@
+import base64
+import binascii
+from typing import Optional
+
+# Provider cursors are only followed when they point back at the provider API
+GRAPH_API_PREFIX = 'https://graph.microsoft.com/'
+
+
+def encode_cursor(cursor: str) -> str:
+    """Wrap a provider cursor (e.g. a Graph @odata.nextLink) in an opaque, ':'-free page token part"""
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token: Optional[str], allowed_prefix: str = GRAPH_API_PREFIX) -> Optional[str]:
+    """
+    Unwrap a page token part made by encode_cursor. Returns None for anything
+    malformed or pointing outside `allowed_prefix`, so a crafted token cannot
+    make the server send an account's bearer token to another host.
+    """
+    if not token:
+        return None
+    try:
+        cursor = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+    except (binascii.Error, ValueError):
+        return None
+    if not cursor.startswith(allowed_prefix):
+        return None
+    return cursor
@@ -0,0 +1,6 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# User the current request acts for; set by request_context_middleware and
+# inherited by every task the request spawns (fan-out, prefetch)
+current_user_id: ContextVar[Optional[int]] = ContextVar('current_user_id', default=None)
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.lru_cache import LRUCache
+
+EventHandler = Callable[[Dict[str, Any]], None]
+
+
+class CacheBackend(ABC):
+    """
+    Storage and messaging behind the shared cache. A backend keeps values
+    that every worker can read and delivers invalidation events to every
+    worker (its own included, through `dispatch`).
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[EventHandler]] = {}
+
+    def subscribe(self, topic: str, handler: EventHandler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def dispatch(self, topic: str, payload: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Error handling cache event {topic}: {str(e)}")
+                print(traceback.format_exc())
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, topic: str, payload: Dict[str, Any]) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU; events only reach this worker. The default for a single worker."""
+
+    def __init__(self, max_entries: int = 4096):
+        super().__init__()
+        self._entries = LRUCache(max_entries=max_entries)
+
+    async def get(self, key: str) -> Any:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.delete(key)
+
+    async def publish(self, topic: str, payload: Dict[str, Any]) -> None:
+        self.dispatch(topic, payload)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache shared by the workers of one host through a SQLite file in WAL
+    mode. Values and event payloads must be JSON serializable; the file is
+    created readable by its owner only and must never hold credentials.
+    Events are rows in an append-only table that every worker polls, so an
+    invalidation reaches the other workers within `poll_interval` seconds.
+    All SQLite calls run on one background thread per worker.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.25, event_retention: float = 300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.event_retention = event_retention
+        self.origin = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shared-cache')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_event_id = 0
+        self._poller: Optional[asyncio.Task] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Owner only; SQLite gives the -wal and -shm files the same permissions
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            os.chmod(self.path, 0o600)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_events '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, topic TEXT NOT NULL, '
+                'payload TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get(self, key: str) -> Any:
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: str, ttl: float) -> None:
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl)
+        )
+
+    def _delete(self, keys) -> None:
+        self._connection().executemany('DELETE FROM cache_entries WHERE key = ?', [(key,) for key in keys])
+
+    def _append_event(self, topic: str, payload: str) -> None:
+        self._connection().execute(
+            'INSERT INTO cache_events (origin, topic, payload, created_at) VALUES (?, ?, ?, ?)',
+            (self.origin, topic, payload, time.time())
+        )
+
+    def _read_events(self, after_id: int):
+        return self._connection().execute(
+            'SELECT id, origin, topic, payload FROM cache_events WHERE id > ? ORDER BY id', (after_id,)
+        ).fetchall()
+
+    def _last_id(self) -> int:
+        row = self._connection().execute('SELECT MAX(id) FROM cache_events').fetchone()
+        return row[0] or 0
+
+    def _purge(self) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute('DELETE FROM cache_entries WHERE expires_at < ?', (now,))
+        conn.execute('DELETE FROM cache_events WHERE created_at < ?', (now - self.event_retention,))
+
+    async def get(self, key: str) -> Any:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._run(self._set, key, json.dumps(value), ttl)
+
+    async def delete(self, *keys: str) -> None:
+        await self._run(self._delete, keys)
+
+    async def publish(self, topic: str, payload: Dict[str, Any]) -> None:
+        # Handled here right away; the other workers pick it up from the table
+        self.dispatch(topic, payload)
+        await self._run(self._append_event, topic, json.dumps(payload))
+
+    async def start(self) -> None:
+        if self._poller is None:
+            self._last_event_id = await self._run(self._last_id)
+            self._poller = asyncio.ensure_future(self._poll())
+
+    async def _poll(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            try:
+                await asyncio.sleep(self.poll_interval)
+                for event_id, origin, topic, payload in await self._run(self._read_events, self._last_event_id):
+                    self._last_event_id = event_id
+                    if origin != self.origin:
+                        self.dispatch(topic, json.loads(payload))
+                if time.monotonic() - last_purge > 60:
+                    last_purge = time.monotonic()
+                    await self._run(self._purge)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Shared cache event poll failed: {str(e)}")
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+
+class SharedCache:
+    """
+    Two-level cache: a small per-worker LRU in front of the backend. An
+    `invalidate` removes keys from the backend and, through an event, from
+    every worker's LRU. Backend errors degrade to cache misses; the cache
+    never fails a request.
+    """
+
+    INVALIDATE_TOPIC = 'cache_invalidate'
+
+    def __init__(self, backend: CacheBackend, local_ttl: float = 5, local_entries: int = 2048):
+        self.backend = backend
+        self.local_ttl = local_ttl
+        # A local backend is already in-process, a second level would only duplicate it
+        self._local = None if isinstance(backend, LocalCacheBackend) else LRUCache(max_entries=local_entries, ttl=local_ttl)
+        backend.subscribe(self.INVALIDATE_TOPIC, self._drop_local)
+
+    def _drop_local(self, payload: Dict[str, Any]) -> None:
+        if self._local is not None:
+            for key in payload.get('keys', ()):
+                self._local.delete(key)
+
+    def subscribe(self, topic: str, handler: EventHandler) -> None:
+        """Call `handler(payload)` in every worker whenever `topic` is published"""
+        self.backend.subscribe(topic, handler)
+
+    async def get(self, key: str) -> Any:
+        if self._local is not None:
+            value = self._local.get(key)
+            if value is not None:
+                return value
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            print(f"Shared cache read failed for {key}: {str(e)}")
+            return None
+        if value is not None and self._local is not None:
+            self._local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        if self._local is not None:
+            self._local.set(key, value, ttl=min(ttl, self.local_ttl))
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            print(f"Shared cache write failed for {key}: {str(e)}")
+
+    async def invalidate(self, *keys: str) -> None:
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            print(f"Shared cache delete failed for {keys}: {str(e)}")
+        await self.publish(self.INVALIDATE_TOPIC, keys=list(keys))
+
+    async def publish(self, topic: str, **payload) -> None:
+        try:
+            await self.backend.publish(topic, payload)
+        except Exception as e:
+            print(f"Shared cache event {topic} could not be published: {str(e)}")
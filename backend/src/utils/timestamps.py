@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+
+def epoch_ms_from_internal_date(value: Any) -> int:
+    """Gmail `internalDate` (epoch milliseconds as a string) to int; 0 if missing"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def epoch_ms_from_iso(value: Optional[str]) -> int:
+    """Graph date-time values (e.g. `receivedDateTime`, always UTC) to epoch milliseconds; 0 if unparseable"""
+    if not value:
+        return 0
+    try:
+        # Graph sends a trailing 'Z', which fromisoformat only accepts from Python 3.11
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def epoch_ms_from_header(value: Optional[str]) -> int:
+    """RFC 2822 Date header to epoch milliseconds; only for messages without internalDate"""
+    if not value:
+        return 0
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
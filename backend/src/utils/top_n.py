@@ -0,0 +1,53 @@
+import heapq
+from itertools import count
+from typing import Any, Callable, Generic, Iterable, List, TypeVar
+
+T = TypeVar('T')
+
+
+class TopN(Generic[T]):
+    """
+    Bounded selector for the `limit` items with the largest key.
+
+    Messages are pushed as they arrive from each account and only the best
+    `limit` (offset + page size) are kept on a min-heap, so a page is cut
+    from a merge without holding or sorting everything that was fetched.
+    Items with equal keys keep their arrival order, like a stable
+    descending sort. `seen` counts every pushed item for totals and
+    next-page decisions.
+    """
+
+    __slots__ = ('limit', 'key', 'seen', '_heap', '_sequence')
+
+    def __init__(self, limit: int, key: Callable[[T], Any]):
+        self.limit = max(int(limit), 0)
+        self.key = key
+        self.seen = 0
+        self._heap: List[tuple] = []
+        self._sequence = count()
+
+    def push(self, item: T) -> None:
+        self.seen += 1
+        if not self.limit:
+            return
+        # Later arrivals rank lower among equal keys, so they are evicted first
+        entry = (self.key(item), -next(self._sequence), item)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.push(item)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def results(self) -> List[T]:
+        """Kept items, largest key first"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def page(self, offset: int) -> List[T]:
+        """The kept items after skipping `offset`, i.e. the requested page"""
+        return self.results()[offset:]
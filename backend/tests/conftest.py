@@ -0,0 +1,10 @@
+"""
+Unit tests for the concurrency and database helpers. They use no network
+or MySQL server; async code runs under asyncio.run().
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
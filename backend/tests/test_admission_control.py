@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from middlewares.admission_control import AdmissionLimiter, AdmissionRejected
+
+
+def limiter(**overrides) -> AdmissionLimiter:
+    options = {'concurrency': 1, 'queue_depth': 2, 'per_user': 2, 'queue_timeout': 0.05}
+    options.update(overrides)
+    return AdmissionLimiter('test', **options)
+
+
+def test_queued_request_times_out_with_503():
+    async def main():
+        limits = limiter()
+        await limits.acquire(1)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limits.acquire(2)
+        assert rejected.value.status == 503
+        assert rejected.value.reason == 'queue_timeout'
+        assert limits.queued == 0
+        # The timed-out request no longer counts against its user
+        assert 2 not in limits._per_user
+        limits.release(1, 0.01)
+        assert limits.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_release_hands_the_slot_to_the_next_in_line():
+    async def main():
+        limits = limiter(queue_timeout=1)
+        await limits.acquire(1)
+        waiter = asyncio.ensure_future(limits.acquire(2))
+        await asyncio.sleep(0)
+        assert limits.queued == 1
+        limits.release(1, 0.01)
+        await waiter
+        assert limits.in_flight == 1
+        assert limits.queued == 0
+
+    asyncio.run(main())
+
+
+def test_slot_granted_at_timeout_is_passed_on():
+    async def main():
+        limits = limiter(queue_timeout=1)
+        await limits.acquire(1)
+        loop = asyncio.get_running_loop()
+        first, second = loop.create_future(), loop.create_future()
+        limits._waiters.extend([first, second])
+
+        # release() grants the first waiter just as its wait times out
+        limits._release_slot()
+        assert first.done()
+        limits._abandon(first)
+        assert second.done() and not second.cancelled()
+        assert limits.in_flight == 1
+        assert limits.queued == 0
+
+    asyncio.run(main())
+
+
+def test_full_queue_is_refused():
+    async def main():
+        limits = limiter(queue_depth=1, queue_timeout=1)
+        await limits.acquire(1)
+        waiter = asyncio.ensure_future(limits.acquire(2))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limits.acquire(3)
+        assert rejected.value.reason == 'queue_full'
+        assert 3 not in limits._per_user
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_queued_requests_count_against_the_user():
+    async def main():
+        limits = limiter(per_user=2, queue_depth=4, queue_timeout=1)
+        await limits.acquire(1)
+        waiters = [asyncio.ensure_future(limits.acquire(2)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limits.acquire(2)
+        assert rejected.value.status == 429
+        assert rejected.value.reason == 'per_user'
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert 2 not in limits._per_user
+
+    asyncio.run(main())
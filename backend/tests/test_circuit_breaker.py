@@ -0,0 +1,125 @@
+import pytest
+
+from utils import circuit_breaker
+from services.provider_breaker_service import PROVIDER, ProviderBreakerService
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+
+def open_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10, open_seconds=30)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_at_failure_rate_once_min_calls_are_known(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10, open_seconds=30)
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_exactly_one_trial_through(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_trial_success_closes(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_trial_failure_reopens(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_released_trial_can_be_claimed_again(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_stale_trial_frees_its_slot(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_transitions_are_reported(clock):
+    transitions = []
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=1, open_seconds=30, on_transition=lambda old, new: transitions.append((old, new)))
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+def provider_breakers() -> ProviderBreakerService:
+    return ProviderBreakerService({
+        'CIRCUIT_FAILURE_RATE': 0.5,
+        'CIRCUIT_MIN_CALLS': 1,
+        'CIRCUIT_WINDOW': 10,
+        'CIRCUIT_OPEN_SECONDS': 30,
+    })
+
+
+def test_call_that_never_went_out_gives_back_the_trials(clock):
+    breakers = provider_breakers()
+    breakers.record_status('gmail', 1, 503)
+    clock.now += 30
+    assert breakers.allow('gmail', 1)
+    assert not breakers.allow('gmail', 1)
+    # e.g. the account had no valid token
+    breakers.release('gmail', 1)
+    assert breakers.allow('gmail', 1)
+
+
+def test_client_error_releases_instead_of_counting(clock):
+    breakers = provider_breakers()
+    breakers.record_status('gmail', 1, 503)
+    clock.now += 30
+    assert breakers.allow('gmail', 1)
+    breakers.record_failure('gmail', 1, ValueError('token refresh failed'))
+    assert breakers.allow('gmail', 1)
+    breakers.record_success('gmail', 1)
+    assert breakers._breaker(PROVIDER, 'gmail').state == CLOSED
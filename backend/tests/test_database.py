@@ -0,0 +1,215 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import database
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = []
+
+    async def begin(self):
+        self.calls.append('begin')
+
+    async def commit(self):
+        self.calls.append('commit')
+
+    async def rollback(self):
+        self.calls.append('rollback')
+
+
+class FakePool:
+    """Stands in for InstrumentedPool: acquire() is awaitable and an async context manager"""
+
+    def __init__(self, name):
+        self.name = name
+        self.healthy = True
+        self.handed_out = []
+        self.in_use = 0
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            def __await__(self):
+                return pool._acquire().__await__()
+
+            async def __aenter__(self):
+                self.conn = await pool._acquire()
+                return self.conn
+
+            async def __aexit__(self, *exc_info):
+                pool.release(self.conn)
+
+        return Acquire()
+
+    async def _acquire(self):
+        conn = FakeConnection(self)
+        self.handed_out.append(conn)
+        self.in_use += 1
+        return conn
+
+    def release(self, conn):
+        self.in_use -= 1
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    primary, replica = FakePool('primary'), FakePool('replica')
+
+    async def get_pool():
+        return primary
+
+    async def get_read_pool():
+        return replica
+
+    monkeypatch.setattr(database, 'get_pool', get_pool)
+    monkeypatch.setattr(database, 'get_read_pool', get_read_pool)
+    return primary, replica
+
+
+def run_in_request(coro_fn, **scope_options):
+    """Run coro_fn(scope) the way a request does: in its own context with a bound scope"""
+    async def main():
+        scope = database.bind_request_scope(**scope_options)
+        try:
+            return await coro_fn(scope)
+        finally:
+            scope.release()
+
+    return asyncio.run(main())
+
+
+def test_transaction_commits_at_the_end_of_the_block(pools):
+    primary, _ = pools
+
+    async def handler(scope):
+        async with database.transaction():
+            async with database.connection() as conn:
+                # Repository commits inside the block are deferred
+                await conn.commit()
+            async with database.connection() as conn:
+                await conn.commit()
+
+    run_in_request(handler)
+    assert len(primary.handed_out) == 1
+    assert primary.handed_out[0].calls == ['begin', 'commit']
+    assert primary.in_use == 0
+
+
+def test_transaction_rolls_back_when_the_block_raises(pools):
+    primary, _ = pools
+
+    async def handler(scope):
+        with pytest.raises(ValueError):
+            async with database.transaction():
+                async with database.connection() as conn:
+                    await conn.commit()
+                raise ValueError('second write failed')
+        assert not scope.primary.in_transaction
+
+    run_in_request(handler)
+    assert primary.handed_out[0].calls == ['begin', 'rollback']
+    assert primary.in_use == 0
+
+
+def test_nested_transaction_joins_the_outer_one(pools):
+    primary, _ = pools
+
+    async def handler(scope):
+        async with database.transaction():
+            async with database.transaction():
+                async with database.connection() as conn:
+                    await conn.commit()
+
+    run_in_request(handler)
+    assert len(primary.handed_out) == 1
+    assert primary.handed_out[0].calls == ['begin', 'commit']
+
+
+def test_transaction_outside_a_request_scope_releases_its_connection(pools):
+    primary, _ = pools
+
+    async def main():
+        async with database.transaction():
+            async with database.connection():
+                pass
+
+    asyncio.run(main())
+    assert primary.handed_out[0].calls == ['begin', 'commit']
+    assert primary.in_use == 0
+
+
+def test_queries_of_a_request_share_one_connection(pools):
+    primary, _ = pools
+
+    async def handler(scope):
+        for _ in range(3):
+            async with database.connection():
+                pass
+
+    run_in_request(handler)
+    assert len(primary.handed_out) == 1
+    assert primary.in_use == 0
+
+
+def test_unshared_request_takes_a_connection_per_block(pools):
+    primary, _ = pools
+
+    async def handler(scope):
+        for _ in range(2):
+            async with database.connection():
+                pass
+
+    run_in_request(handler, shared=False)
+    assert len(primary.handed_out) == 2
+    assert primary.in_use == 0
+
+
+def test_reads_follow_the_request_to_the_primary_after_a_write(pools):
+    primary, replica = pools
+
+    async def handler(scope):
+        async with database.connection(read_only=True) as conn:
+            assert conn.pool is replica
+        async with database.connection() as conn:
+            assert conn.pool is primary
+        async with database.connection(read_only=True) as conn:
+            assert conn.pool is primary
+        assert scope.wrote
+
+    run_in_request(handler)
+    # The shared scope acquired once per pool
+    assert len(primary.handed_out) == 1
+    assert len(replica.handed_out) == 1
+    assert primary.in_use == replica.in_use == 0
+
+
+def test_recent_writer_starts_on_the_primary(pools):
+    primary, replica = pools
+
+    async def handler(scope):
+        async with database.connection(read_only=True) as conn:
+            assert conn.pool is primary
+
+    run_in_request(handler, wrote=True)
+    assert not replica.handed_out
+
+
+def test_user_data_change_marks_the_user_as_a_recent_writer(pools, monkeypatch):
+    from middlewares import request_context_middleware
+    from utils.lru_cache import LRUCache
+
+    monkeypatch.setattr(request_context_middleware, '_recent_writers', LRUCache(max_entries=16, ttl=60))
+    request_context_middleware._mark_writer({'user_id': 7})
+
+    request = SimpleNamespace(path='/api/users/me', ctx=SimpleNamespace(user_id=7))
+    asyncio.run(request_context_middleware.request_context_middleware(request))
+    assert request.ctx.db_scope.wrote
+
+    request.ctx.user_id = 8
+    asyncio.run(request_context_middleware.request_context_middleware(request))
+    assert not request.ctx.db_scope.wrote
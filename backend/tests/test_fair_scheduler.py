@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from config.app_config import APP_CONFIG
+from services.provider_client import ProviderClient
+from utils.fair_scheduler import FairScheduler
+from utils.request_context import current_user_id
+
+
+class FakeSession:
+    """session.get stand-in that records whose request reached the provider, in order"""
+
+    def __init__(self):
+        self.served = []
+
+    @asynccontextmanager
+    async def get(self, url, **kwargs):
+        self.served.append(current_user_id.get())
+        await asyncio.sleep(0)
+        yield SimpleNamespace(status=200)
+
+
+def test_grants_right_away_without_contention():
+    async def main():
+        scheduler = FairScheduler(concurrency=2)
+        await scheduler.acquire('a')
+        await scheduler.acquire('b')
+        assert scheduler.in_flight == 2
+        assert scheduler.queued == 0
+
+    asyncio.run(main())
+
+
+def test_waiting_users_take_turns():
+    async def main():
+        scheduler = FairScheduler(concurrency=1)
+        await scheduler.acquire('holder')
+        order = []
+
+        async def call(key, n):
+            async with scheduler.slot(key):
+                order.append((key, n))
+
+        tasks = [asyncio.ensure_future(call('a', n)) for n in range(3)]
+        tasks.append(asyncio.ensure_future(call('b', 0)))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 4
+        assert scheduler.waiting_keys == 2
+
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        # 'b' is served after one of 'a's calls, not after all three
+        assert order == [('a', 0), ('b', 0), ('a', 1), ('a', 2)]
+        assert scheduler.in_flight == 0
+        assert scheduler.waiting_keys == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = FairScheduler(concurrency=1)
+        await scheduler.acquire('holder')
+        waiter = asyncio.ensure_future(scheduler.acquire('a'))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.queued == 0
+        assert scheduler.waiting_keys == 0
+        scheduler.release()
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_slot_granted_before_cancellation_is_handed_on():
+    async def main():
+        scheduler = FairScheduler(concurrency=1)
+        await scheduler.acquire('holder')
+        first = asyncio.ensure_future(scheduler.acquire('a'))
+        second = asyncio.ensure_future(scheduler.acquire('b'))
+        await asyncio.sleep(0)
+
+        # The release grants 'a' its slot, but 'a' is cancelled before it resumes
+        scheduler.release()
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await second
+        assert scheduler.in_flight == 1
+
+    asyncio.run(main())
+
+
+def test_listing_flood_does_not_starve_other_users():
+    async def main():
+        client = ProviderClient({**APP_CONFIG, 'UPSTREAM_CONCURRENCY': 2})
+        session = FakeSession()
+
+        async def list_messages(user_id, page):
+            current_user_id.set(user_id)
+            async with client.get(session, f'https://graph.microsoft.com/v1.0/me/mailFolders/sentItems/messages?page={page}'):
+                await asyncio.sleep(0)
+
+        # User 1 pages through 50 listings before user 2 asks for two
+        flood = [asyncio.ensure_future(list_messages(1, page)) for page in range(50)]
+        await asyncio.sleep(0)
+        assert client.scheduler.queued == 48
+        others = [asyncio.ensure_future(list_messages(2, page)) for page in range(2)]
+
+        await asyncio.gather(*flood, *others)
+        assert len(session.served) == 52
+        # User 2 alternates with user 1 instead of waiting for the whole flood
+        assert [i for i, user in enumerate(session.served) if user == 2] == [3, 5]
+        assert client.scheduler.in_flight == 0
+
+    asyncio.run(main())